@@ -0,0 +1,468 @@
+"""
+PDF智能解析工具 - 命令行批处理
+
+不依赖Streamlit，适合在服务器上无人值守地处理整个目录的PDF：
+输出目录结构与Web界面一致（pdf/、slice-pics/、summaries/、manifest.json），
+所有文档的待处理页面进入同一个解析队列，运行中定期输出吞吐统计，结束时写出JSON运行报告。
+中途中断后重新运行同一命令，会按各文档的任务清单从断点继续。
+
+用法：
+    python batch_runner.py 输入目录 -o 输出目录 --preset 设计方案分析
+    python batch_runner.py 输入目录 --prompt-file prompt.txt --concurrency 64 --report report.json
+
+退出码：0 全部页面解析成功；1 存在失败的页面或文档；2 参数或环境错误；130 被中断。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from config import (
+    ARK_API_CONFIG, CONCURRENCY_CONFIG, FILE_CONFIG, OUTPUT_CONFIG, PRESET_PROMPTS,
+    RENDER_CONFIG, ADAPTIVE_CONFIG, SCHEDULE_POLICIES, RESOLUTION_CONFIG, UPLOAD_CONFIG, UPLOAD_FORMATS,
+    PAGE_FILTER_CONFIG, TEXT_LAYER_CONFIG, TEXT_LAYER_MODES, PACK_CONFIG,
+    PROMPT_LAYOUT_CONFIG, PROMPT_LAYOUTS, METRICS_CONFIG, STREAM_CONFIG,
+    VALIDATION_CONFIG, RESULT_STORE_CONFIG, RESULT_STORE_FORMATS
+)
+from job_manifest import JobManifest, hash_file
+from metrics import start_metrics_server, summarize
+from pdf_processor import PDFProcessor
+from result_store import ResultStore, stored_pages
+from utils import AIParser, DocumentJob, FileManager, validate_api_key, resolution_pixel_budget
+
+EXIT_OK = 0
+EXIT_FAILED_PAGES = 1
+EXIT_SETUP_ERROR = 2
+EXIT_INTERRUPTED = 130
+
+
+def log(message: str):
+    """进度与统计输出到stderr，stdout只留给运行报告"""
+    print(f"[{datetime.now():%H:%M:%S}] {message}", file=sys.stderr, flush=True)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="无界面批量解析目录下的PDF文件")
+    parser.add_argument("input_dir", type=Path, help="PDF所在目录")
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path(OUTPUT_CONFIG["default_output_dir"]),
+                        help="解析结果输出目录（默认同Web界面）")
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归查找子目录中的PDF")
+
+    prompt_group = parser.add_mutually_exclusive_group()
+    prompt_group.add_argument("--preset", choices=list(PRESET_PROMPTS), help="使用预设提示词（默认第一个预设）")
+    prompt_group.add_argument("--prompt", help="直接指定提示词")
+    prompt_group.add_argument("--prompt-file", type=Path, help="从UTF-8文本文件读取提示词")
+
+    parser.add_argument("--api-key", default=os.environ.get("ARK_API_KEY") or ARK_API_CONFIG["default_api_key"],
+                        help="ARK API密钥（默认读取环境变量 ARK_API_KEY）")
+    parser.add_argument("--base-url", default=ARK_API_CONFIG["base_url"], help="OpenAI兼容接口地址")
+    parser.add_argument("--model", default=ARK_API_CONFIG["model"], help="模型或推理接入点ID")
+    parser.add_argument("--timeout", type=int, default=CONCURRENCY_CONFIG["default_timeout"], help="单次请求超时（秒）")
+    parser.add_argument("--dpi", type=int, default=FILE_CONFIG["default_dpi"], help="PDF转图片DPI（auto模式下为最高DPI）")
+    parser.add_argument("--resolution", choices=["fixed", "auto"], default=RESOLUTION_CONFIG["mode"],
+                        help="分辨率模式：fixed 所有页面同一DPI；auto 按页面尺寸计算每页DPI")
+    parser.add_argument("--max-pixels", type=int, default=RESOLUTION_CONFIG["max_pixels"],
+                        help="auto模式下每页最多像素数")
+    parser.add_argument("--text-layer", choices=list(TEXT_LAYER_MODES), default=TEXT_LAYER_CONFIG["mode"],
+                        help="PDF文字层：image 仅发送图片；auto 文字页只发文字、图文页发低DPI图片+文字")
+    parser.add_argument("--max-image-tokens", type=int, default=RESOLUTION_CONFIG["max_image_tokens"],
+                        help="auto模式下每页图像token上限（0表示只按像素限制）")
+
+    parser.add_argument("--engine", choices=["async", "thread"], default="async",
+                        help="解析引擎（默认async，在途请求数不受线程数限制）")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="在途请求数/线程数（默认 async 为 %d，thread 为 %d）" % (
+                            CONCURRENCY_CONFIG["default_async_concurrency"], CONCURRENCY_CONFIG["max_workers"]))
+    parser.add_argument("--adaptive", action="store_true", default=ADAPTIVE_CONFIG["enabled"],
+                        help="启用AIMD自适应并发（以 --concurrency 为上限）")
+    parser.add_argument("--policy", choices=list(SCHEDULE_POLICIES), default=CONCURRENCY_CONFIG["schedule_policy"],
+                        help="各文档页面的入队顺序")
+    parser.add_argument("--queue-size", type=int, default=CONCURRENCY_CONFIG["pipeline_queue_size"] or None,
+                        help="渲染→解析队列容量（默认并发数×2）")
+    parser.add_argument("--render-workers", type=int, default=CONCURRENCY_CONFIG["default_render_workers"],
+                        help="PDF渲染进程数")
+    parser.add_argument("--fast-png", action="store_true", help="快速PNG编码（文件略大）")
+    parser.add_argument("--upload-format", choices=list(UPLOAD_FORMATS), default=UPLOAD_CONFIG["format"],
+                        help="发送给模型的图片格式（auto：线稿无损、照片有损）")
+    parser.add_argument("--upload-quality", type=int, default=UPLOAD_CONFIG["quality"], help="JPEG/WebP编码质量（1-100）")
+    parser.add_argument("--in-memory", action="store_true", default=RENDER_CONFIG["in_memory"],
+                        help="内存直传：渲染结果不经磁盘直接送往解析")
+    parser.add_argument("--no-persist-slices", action="store_true",
+                        help="内存直传时不保存切片图片（断点续传将无法沿用切片）")
+    parser.add_argument("--bypass-cache", action="store_true", help="不读取解析结果缓存")
+    parser.add_argument("--page-filter", dest="page_filter", action="store_true", default=PAGE_FILTER_CONFIG["enabled"],
+                        help="跳过空白页（不生成单页结果），重复页沿用首次出现页面的结果；判定记入 page_filter.json（默认关闭）")
+    parser.add_argument("--no-page-filter", dest="page_filter", action="store_false",
+                        help="逐页都调用模型（PAGE_FILTER_CONFIG 中开启过滤时用于关闭）")
+    parser.add_argument("--pack-size", type=int, default=PACK_CONFIG["pack_size"],
+                        help="每个请求合并的页数（提示词只发送一次），1表示逐页请求")
+    parser.add_argument("--prompt-layout", choices=list(PROMPT_LAYOUTS), default=PROMPT_LAYOUT_CONFIG["layout"],
+                        help="消息布局：system 提示词作为固定的系统消息在前（利于前缀缓存）；inline 原布局")
+    parser.add_argument("--stream", action="store_true", default=STREAM_CONFIG["enabled"],
+                        help="流式接收：完整的JSON到达即断开，输出失控时提前截断，并记录首字延迟")
+    parser.add_argument("--no-validate", action="store_true", default=not VALIDATION_CONFIG["enabled"],
+                        help="不校验结果（默认按预设键结构校验JSON，本地修复不了的页面单独重新请求）")
+    parser.add_argument("--result-store", choices=list(RESULT_STORE_FORMATS), default=RESULT_STORE_CONFIG["format"],
+                        help="结果存储：files 逐页文件；jsonl 每个文档一个 results.jsonl 加偏移索引（页数多或网络存储时）")
+    parser.add_argument("--export-pages", action="store_true",
+                        help="处理结束后把合并存储导出为逐页文件（{页码}.json / {页码}_error.txt），兼容原有的下游流程")
+
+    parser.add_argument("--metrics-port", type=int, default=METRICS_CONFIG["http_port"],
+                        help="在本地该端口以Prometheus文本格式暴露 /metrics，0表示不启动")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="吞吐统计输出间隔（秒），0表示不输出")
+    parser.add_argument("--report", type=Path, default=None,
+                        help="运行报告路径（默认 输出目录/batch_report_时间戳.json）")
+    return parser.parse_args(argv)
+
+
+def resolve_prompt(args: argparse.Namespace) -> str:
+    if args.prompt:
+        return args.prompt
+    if args.prompt_file:
+        return args.prompt_file.read_text(encoding="utf-8")
+    return PRESET_PROMPTS[args.preset or next(iter(PRESET_PROMPTS))]
+
+
+def find_pdfs(input_dir: Path, recursive: bool) -> List[Path]:
+    """按路径排序的PDF列表；不同子目录下的同名文件会写入同一输出目录，只保留第一个"""
+    candidates = input_dir.rglob("*") if recursive else input_dir.iterdir()
+    pdfs, seen = [], {}
+    for path in sorted(candidates):
+        if not (path.is_file() and path.suffix.lower() == ".pdf"):
+            continue
+        if path.name in seen:
+            log(f"⚠️ 跳过同名文件 {path}（与 {seen[path.name]} 输出目录冲突）")
+            continue
+        seen[path.name] = path
+        pdfs.append(path)
+    return pdfs
+
+
+def copy_source_pdf(pdf_path: Path, dirs: Dict[str, Path]) -> Tuple[Path, str]:
+    """将原始PDF复制到输出目录的 pdf/ 下（与上次处理的文件相同时沿用），返回 (副本路径, PDF哈希)"""
+    target = dirs['pdf'] / pdf_path.name
+    pdf_hash = hash_file(pdf_path)
+    previous = JobManifest.load(dirs['base'])
+    if not (target.exists() and previous is not None and previous.pdf_hash == pdf_hash):
+        shutil.copy2(pdf_path, target)
+    return target, pdf_hash
+
+
+def prepare_documents(pdfs: List[Path], args: argparse.Namespace, pdf_processor: PDFProcessor,
+                      ai_parser: AIParser, prompt: str):
+    """为每个PDF打开任务清单并构建解析任务，返回 (任务列表, 文档条目列表)"""
+    jobs, documents = [], []
+    for pdf_path in pdfs:
+        entry = {'name': pdf_path.name, 'source': str(pdf_path)}
+        documents.append(entry)
+        try:
+            dirs = FileManager.create_directory_structure(args.output_dir, pdf_path.name)
+            entry['output_dir'] = str(dirs['base'])
+            pdf_copy, pdf_hash = copy_source_pdf(pdf_path, dirs)
+        except OSError as e:
+            entry['error'] = f"保存原始PDF失败: {str(e)}"
+            log(f"❌ {pdf_path.name}: {entry['error']}")
+            continue
+
+        info = pdf_processor.get_pdf_info(pdf_copy)
+        if 'error' in info or info['pages'] == 0:
+            entry['error'] = info.get('error', "PDF没有页面")
+            log(f"❌ {pdf_path.name}: {entry['error']}")
+            continue
+
+        manifest = JobManifest.open(
+            dirs['base'], pdf_path.name, pdf_hash, prompt, ai_parser.model, pdf_processor.dpi, info['pages'],
+            max_pixels=pdf_processor.max_pixels, text_layer=pdf_processor.text_layer
+        )
+        if args.result_store == "jsonl":
+            manifest.forget_missing(stored_pages(dirs['summaries']))
+        pages = manifest.pending_pages()
+        entry.update({'manifest': manifest, 'pages': pages, 'job': None})
+        if not pages:
+            log(f"⏩ {pdf_path.name}: 全部 {info['pages']} 页此前已解析完成")
+            continue
+
+        page_source = pdf_processor.iter_pdf_images(
+            pdf_copy,
+            dirs['images'],
+            in_memory=args.in_memory,
+            pages=pages,
+            reuse_pages=manifest.reusable_slices(dirs['images'], pages),
+            with_fingerprint=ai_parser.page_filter
+        )
+        entry['job'] = DocumentJob(
+            pdf_path.name,
+            manifest.track_rendered(page_source),
+            pages,
+            dirs['summaries'],
+            manifest=manifest,
+            persist_dir=dirs['images'] if args.in_memory and not args.no_persist_slices else None,
+            on_complete=lambda result, name=pdf_path.name: log(
+                f"✅ {name}: 成功 {result['successful']}/{result['total_pages']} 页，失败 {result['failed']} 页"
+            )
+        )
+        jobs.append(entry['job'])
+        skipped = info['pages'] - len(pages)
+        log(f"📄 {pdf_path.name}: 共 {info['pages']} 页，本次处理 {len(pages)} 页"
+            + (f"（沿用已完成的 {skipped} 页）" if skipped else ""))
+    return jobs, documents
+
+
+def export_result_pages(documents: List[Dict]) -> int:
+    """把各文档的合并存储导出为逐页文件（写在 summaries/ 下），返回导出的页数"""
+    exported = 0
+    for entry in documents:
+        if not entry.get('output_dir'):
+            continue
+        summaries_dir = Path(entry['output_dir']) / OUTPUT_CONFIG["summaries_subdir"]
+        if not ResultStore.exists(summaries_dir):
+            continue
+        store = ResultStore(summaries_dir, writable=False)
+        exported += store.export_pages()
+        store.close()
+    return exported
+
+
+class ThroughputReporter:
+    """后台线程定期输出全局吞吐：已完成页数、累计/最近速率、失败数与预计剩余时间"""
+
+    def __init__(self, jobs: List[DocumentJob], interval: float):
+        self.jobs = jobs
+        self.interval = interval
+        self.total = sum(job.total_pages for job in jobs)
+        self.started = time.perf_counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="throughput-reporter", daemon=True)
+
+    def snapshot(self) -> Dict:
+        done = sum(job.completed for job in self.jobs)
+        failed = sum(job.failed for job in self.jobs)
+        elapsed = time.perf_counter() - self.started
+        return {'done': done, 'failed': failed, 'elapsed': elapsed}
+
+    def _run(self):
+        last_done, last_time = 0, self.started
+        while not self.stop_event.wait(self.interval):
+            snap = self.snapshot()
+            now = time.perf_counter()
+            overall = snap['done'] / snap['elapsed'] if snap['elapsed'] > 0 else 0
+            recent = (snap['done'] - last_done) / (now - last_time) if now > last_time else 0
+            remaining = self.total - snap['done']
+            eta = f"{remaining / recent:.0f}s" if recent > 0 else "-"
+            rendered = sum(job.rendered for job in self.jobs)
+            log(f"⏱️ {snap['done']}/{self.total} 页 | 失败 {snap['failed']} | 已渲染 {rendered} | "
+                f"{overall:.2f} 页/秒（最近 {recent:.2f}） | 预计剩余 {eta}")
+            last_done, last_time = snap['done'], now
+
+    def start(self):
+        if self.interval > 0 and self.total:
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+def build_report(args: argparse.Namespace, concurrency: int, documents: List[Dict], started_at: datetime,
+                 elapsed: float) -> Dict:
+    """机器可读的运行报告：运行参数、总计、逐文档结果与流水线/重试/自适应统计"""
+    docs, results = [], []
+    for entry in documents:
+        doc = {k: entry[k] for k in ('name', 'source', 'output_dir', 'error') if k in entry}
+        manifest = entry.get('manifest')
+        if manifest is not None:
+            counts = manifest.counts()
+            doc.update({
+                'total_pages': manifest.total_pages,
+                'processed': len(entry['pages']),
+                'skipped': manifest.total_pages - len(entry['pages']),
+                'successful': counts['success'],
+                'failed': manifest.total_pages - counts['success']
+            })
+        job = entry.get('job')
+        if job is not None and job.result is not None:
+            doc['processed_failed'] = job.result['failed']
+            doc['retry_stats'] = job.result['retry_stats']
+            doc['upload_stats'] = job.result['upload_stats']
+            if job.result['filter_stats'] is not None:
+                doc['filter_stats'] = job.result['filter_stats']
+            if job.result['text_layer_stats'] is not None:
+                doc['text_layer_stats'] = job.result['text_layer_stats']
+            if job.result['pack_stats'] is not None:
+                doc['pack_stats'] = job.result['pack_stats']
+            doc['usage_stats'] = job.result['usage_stats']
+            if job.result['validation_stats'] is not None:
+                doc['validation_stats'] = job.result['validation_stats']
+            if job.result['metrics_summary'] is not None:
+                doc['metrics_summary'] = job.result['metrics_summary']
+            if job.render_error:
+                doc['render_error'] = job.render_error
+            if job.errors:
+                doc['errors'] = job.errors
+            results.append(job.result)
+        docs.append(doc)
+
+    processed = sum(doc.get('processed', 0) for doc in docs)
+    first = results[0] if results else {}
+    # 全部文档的逐页指标合并汇总
+    page_metrics = [
+        record for entry in documents if entry.get('job') is not None and entry['job'].metrics is not None
+        for record in entry['job'].metrics.records
+    ]
+    return {
+        'started_at': started_at.isoformat(timespec="seconds"),
+        'finished_at': datetime.now().isoformat(timespec="seconds"),
+        'elapsed_seconds': round(elapsed, 2),
+        'settings': {
+            'input_dir': str(args.input_dir),
+            'output_dir': str(args.output_dir),
+            'model': args.model,
+            'dpi': args.dpi,
+            'resolution': args.resolution,
+            'max_pixels': resolution_pixel_budget(args.max_pixels, args.max_image_tokens) if args.resolution == "auto" else None,
+            'text_layer': args.text_layer,
+            'engine': args.engine,
+            'concurrency': concurrency,
+            'adaptive': args.adaptive,
+            'policy': args.policy,
+            'render_workers': args.render_workers,
+            'in_memory': args.in_memory,
+            'upload_format': args.upload_format,
+            'upload_quality': args.upload_quality,
+            'bypass_cache': args.bypass_cache,
+            'page_filter': args.page_filter,
+            'pack_size': args.pack_size,
+            'prompt_layout': args.prompt_layout,
+            'stream': args.stream,
+            'validate': not args.no_validate,
+            'result_store': args.result_store
+        },
+        'totals': {
+            'documents': len(docs),
+            'document_errors': sum(1 for doc in docs if 'error' in doc),
+            'pages': sum(doc.get('total_pages', 0) for doc in docs),
+            'processed_pages': processed,
+            'skipped_pages': sum(doc.get('skipped', 0) for doc in docs),
+            'successful_pages': sum(doc.get('successful', 0) for doc in docs),
+            'failed_pages': sum(doc.get('failed', 0) for doc in docs),
+            'pages_per_second': round(processed / elapsed, 3) if elapsed > 0 else 0,
+            'prompt_tokens': sum(doc.get('usage_stats', {}).get('输入token', 0) for doc in docs),
+            'cached_prompt_tokens': sum(doc.get('usage_stats', {}).get('其中缓存命中token', 0) for doc in docs),
+            'completion_tokens': sum(doc.get('usage_stats', {}).get('输出token', 0) for doc in docs),
+            # 已调用API但未返回用量的页数（token合计不含这些页面）
+            'pages_without_usage': sum(doc.get('usage_stats', {}).get('未返回用量页数', 0) for doc in docs)
+        },
+        'documents': docs,
+        'metrics_summary': summarize(page_metrics, elapsed) if page_metrics else None,
+        'pipeline_stats': first.get('pipeline_stats'),
+        'adaptive_stats': first.get('adaptive_stats')
+    }
+
+
+def write_report(report: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.input_dir.is_dir():
+        log(f"❌ 输入目录不存在: {args.input_dir}")
+        return EXIT_SETUP_ERROR
+    if not validate_api_key(args.api_key):
+        log("❌ API密钥无效：请通过 --api-key 或环境变量 ARK_API_KEY 提供")
+        return EXIT_SETUP_ERROR
+    try:
+        prompt = resolve_prompt(args)
+    except OSError as e:
+        log(f"❌ 读取提示词失败: {str(e)}")
+        return EXIT_SETUP_ERROR
+
+    pdfs = find_pdfs(args.input_dir, args.recursive)
+    if not pdfs:
+        log(f"❌ {args.input_dir} 下没有PDF文件")
+        return EXIT_SETUP_ERROR
+
+    try:
+        pdf_processor = PDFProcessor(
+            dpi=args.dpi,
+            render_workers=args.render_workers,
+            compress_level=RENDER_CONFIG["fast_png_compress_level"] if args.fast_png else None,
+            max_pixels=resolution_pixel_budget(args.max_pixels, args.max_image_tokens) if args.resolution == "auto" else None,
+            text_layer=args.text_layer
+        )
+    except ImportError as e:
+        log(f"❌ {str(e)}")
+        return EXIT_SETUP_ERROR
+    ai_parser = AIParser(
+        args.api_key, timeout=args.timeout, bypass_cache=args.bypass_cache,
+        upload_format=args.upload_format, upload_quality=args.upload_quality,
+        page_filter=args.page_filter, pack_size=args.pack_size, prompt_layout=args.prompt_layout,
+        stream=args.stream, validate=not args.no_validate, result_store=args.result_store
+    )
+    ai_parser.base_url = args.base_url
+    ai_parser.model = args.model
+
+    concurrency = args.concurrency or (
+        CONCURRENCY_CONFIG["default_async_concurrency"] if args.engine == "async" else CONCURRENCY_CONFIG["max_workers"]
+    )
+    started_at = datetime.now()
+    start = time.perf_counter()
+    log(f"🚀 共 {len(pdfs)} 个PDF，引擎 {args.engine}，并发 {concurrency}"
+        + ("（自适应）" if args.adaptive else "") + f"，调度 {SCHEDULE_POLICIES[args.policy]}")
+
+    if args.metrics_port:
+        if start_metrics_server(args.metrics_port):
+            log(f"📈 指标端点: http://{METRICS_CONFIG['http_host']}:{args.metrics_port}/metrics")
+        else:
+            log(f"⚠️ 指标端点启动失败（端口 {args.metrics_port} 不可用），继续处理")
+
+    jobs, documents = prepare_documents(pdfs, args, pdf_processor, ai_parser, prompt)
+    reporter = ThroughputReporter(jobs, args.stats_interval)
+    interrupted = False
+    if jobs:
+        reporter.start()
+        try:
+            ai_parser.parse_documents(
+                jobs, prompt, concurrency, policy=args.policy, queue_size=args.queue_size,
+                engine=args.engine, adaptive=args.adaptive
+            )
+        except KeyboardInterrupt:
+            interrupted = True
+            log("⛔ 已中断：已完成的页面已写入任务清单，重新运行同一命令即可继续")
+        finally:
+            reporter.stop()
+            ai_parser.close_result_stores()
+
+    if args.export_pages:
+        log(f"📤 已导出 {export_result_pages(documents)} 页为逐页文件")
+
+    report = build_report(args, concurrency, documents, started_at, time.perf_counter() - start)
+    report['interrupted'] = interrupted
+    report_path = args.report or args.output_dir / f"batch_report_{started_at:%Y%m%d_%H%M%S}.json"
+    write_report(report, report_path)
+
+    totals = report['totals']
+    log(f"📊 完成：成功 {totals['successful_pages']}/{totals['pages']} 页，失败 {totals['failed_pages']} 页，"
+        f"本次处理 {totals['processed_pages']} 页，{totals['pages_per_second']} 页/秒，用时 {report['elapsed_seconds']}s")
+    log(f"📝 运行报告: {report_path}")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if interrupted:
+        return EXIT_INTERRUPTED
+    if totals['failed_pages'] or totals['document_errors']:
+        return EXIT_FAILED_PAGES
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+PDF智能解析工具 - 性能基准测试
+
+在项目根目录下以模块方式运行，例如：
+    python -m benchmarks.bench_render_encode
+"""
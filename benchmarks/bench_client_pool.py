@@ -0,0 +1,99 @@
+"""
+连接复用基准：对比“每个请求新建客户端”（旧行为）与共享连接池客户端的单请求延迟
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_client_pool
+    python -m benchmarks.bench_client_pool --requests 500 --concurrency 1 8 32
+
+说明：本地模拟服务走明文HTTP，只能体现TCP建连的开销；
+真实ARK接口为HTTPS，冷连接还需额外的TLS握手，池化收益更大。
+"""
+
+import sys
+import time
+import base64
+import argparse
+import concurrent.futures
+from statistics import mean
+
+from openai import OpenAI
+
+from utils import get_shared_client, close_shared_clients
+from benchmarks.mock_server import MockOpenAIServer
+
+# 模拟一张小尺寸页面图片的请求体
+PAYLOAD_IMAGE = base64.b64encode(b"\x89PNG" + bytes(32 * 1024)).decode("utf-8")
+
+
+def send_request(client: OpenAI):
+    client.chat.completions.create(
+        model="mock-model",
+        messages=[{
+            "role": "user",
+            "content": [
+                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{PAYLOAD_IMAGE}"}},
+                {"type": "text", "text": "这是第1页的内容。请解析。"}
+            ]
+        }],
+        max_tokens=64
+    )
+
+
+def run_mode(mode: str, base_url: str, requests: int, concurrency: int) -> dict:
+    """按指定模式发送请求，返回单请求延迟统计"""
+    def one_request(_):
+        start = time.perf_counter()
+        if mode == "cold":
+            # 旧行为：每页创建一个新客户端（新连接池、新TCP连接）
+            client = OpenAI(base_url=base_url, api_key="mock-key", timeout=30)
+            try:
+                send_request(client)
+            finally:
+                client.close()
+        else:
+            send_request(get_shared_client(base_url, "mock-key", 30))
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "mean_ms": mean(ordered),
+        "p50_ms": ordered[int(0.50 * (len(ordered) - 1))],
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))],
+        "req_per_s": requests / elapsed,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="连接复用基准测试")
+    parser.add_argument("--requests", type=int, default=300, help="每种模式的请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="并发线程数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务的固定响应延迟（秒）")
+    args = parser.parse_args(argv)
+
+    print(f"{'模式':<8}{'并发':>6}{'平均ms':>10}{'p50ms':>10}{'p95ms':>10}{'请求/秒':>10}{'新建连接':>10}")
+    print("-" * 64)
+    with MockOpenAIServer(latency=args.latency) as server:
+        for concurrency in args.concurrency:
+            for mode in ("cold", "pooled"):
+                server.reset_stats()
+                # 预热一次，排除首次导入等一次性开销
+                run_mode(mode, server.base_url, concurrency, concurrency)
+                server.reset_stats()
+                result = run_mode(mode, server.base_url, args.requests, concurrency)
+                print(
+                    f"{mode:<8}{concurrency:>6}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}"
+                    f"{result['p95_ms']:>10.2f}{result['req_per_s']:>10.1f}{server.stats['connections']:>10}"
+                )
+    close_shared_clients()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+端到端基准：在本地模拟服务上跑完整的 渲染 → 编码 → 解析 流水线，扫描并发数、DPI、上传编码与解析引擎
+
+每组参数在独立子进程中运行（峰值内存互不影响），经由 PDFProcessor 与 AIParser.parse_documents
+处理固定样例PDF，输出 每分钟页数、API延迟p95、峰值RSS、上传字节数 等指标。
+模拟服务可设置延迟分布、错误率、429限流、逐片段生成耗时与JSON之后的冗余输出（配合 --stream 对比流式提前断开），结果可另存为JSON，并用 --compare 与之前提交的结果对比。
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --workers 4 16 --engines thread async --latency 0.8 --latency-dist lognormal
+    python -m benchmarks.bench_pipeline --error-rate 0.05 --rate-limit 20 --json after.json --compare before.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import itertools
+import subprocess
+import tempfile
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from config import FILE_CONFIG, UPLOAD_FORMATS, CONCURRENCY_CONFIG
+from metrics import percentile
+from benchmarks.corpus import build_corpus
+from benchmarks.mock_server import MockOpenAIServer, LATENCY_DISTRIBUTIONS
+
+# 对比结果时用于匹配同一组参数的字段
+CONFIG_KEYS = ("engine", "workers", "dpi", "format")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程（含已回收的渲染子进程）的峰值常驻内存（MB）；不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux 以KB为单位，macOS 以字节为单位
+    return round(peak_kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_config(config: Dict, base_url: str, pdf_paths: List[str], repeat: int) -> Dict:
+    """（子进程中）按一组参数处理全部样例PDF，返回吞吐、延迟与内存指标"""
+    from parse_cache import ParseCache
+    from pdf_processor import PDFProcessor
+    from tag_index import TagIndex
+    from utils import AIParser, DocumentJob, close_shared_clients
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 临时缓存并跳过读取：每页都真实发出请求，且模拟结果不会写入用户的解析缓存与标签索引
+        cache = ParseCache(Path(work_dir) / "bench.sqlite3")
+        tag_index = TagIndex(Path(work_dir) / "bench_tags.sqlite3")
+        parser = AIParser("mock-key-for-benchmark", cache=cache, bypass_cache=True, upload_format=config['format'],
+                          stream=config['stream'], tag_index=tag_index)
+        parser.base_url = base_url
+        processor = PDFProcessor(dpi=config['dpi'], render_workers=config['render_workers'])
+
+        jobs = []
+        for copy, pdf_path in itertools.product(range(repeat), map(Path, pdf_paths)):
+            output_dir = Path(work_dir) / f"{pdf_path.stem}_{copy}"
+            output_dir.mkdir()
+            page_count = processor.get_pdf_info(pdf_path)['pages']
+            pages = list(range(1, page_count + 1))
+            source = processor.iter_pdf_images(pdf_path, output_dir, in_memory=True, pages=pages,
+                                              with_fingerprint=parser.page_filter)
+            jobs.append(DocumentJob(pdf_path.name, source, pages, output_dir))
+
+        start = time.perf_counter()
+        parser.parse_documents(jobs, "基准测试", config['workers'], engine=config['engine'], adaptive=config['adaptive'])
+        elapsed = time.perf_counter() - start
+        records = [record for job in jobs if job.metrics for record in job.metrics.records]
+        cache.conn.close()
+        tag_index.close()
+    close_shared_clients()
+
+    latencies = [record['api_latency_s'] for record in records if record.get('api_latency_s') is not None]
+    page_times = [record['parse_s'] for record in records if record.get('parse_s') is not None]
+    return {
+        'pages': len(records),
+        'failed': sum(1 for record in records if record['outcome'] == "failed"),
+        'retries': sum(record['retries'] for record in records),
+        'elapsed_s': round(elapsed, 3),
+        'pages_per_min': round(len(records) / elapsed * 60, 1) if elapsed > 0 else 0,
+        'p50_latency_s': round(percentile(latencies, 50) or 0, 3),
+        'p95_latency_s': round(percentile(latencies, 95) or 0, 3),
+        'p95_page_s': round(percentile(page_times, 95) or 0, 3),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_in_subprocess(config: Dict, base_url: str, pdf_paths: List[str], repeat: int) -> Dict:
+    """在新的子进程中运行一组参数（spawn，避免继承父进程的内存峰值与连接池）"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_config, (config, base_url, pdf_paths, repeat))
+
+
+def git_commit() -> Optional[str]:
+    """当前提交（用于跨提交对比），不在git仓库中时返回None"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def config_key(result: Dict) -> tuple:
+    return tuple(result[key] for key in CONFIG_KEYS)
+
+
+def print_table(results: List[Dict], baseline: Optional[Dict] = None):
+    """打印结果表；指定基线时附上相对基线的变化"""
+    header = (f"{'引擎':<8}{'并发':>5}{'DPI':>6}{'编码':>7}{'页数':>6}{'页/分钟':>10}{'p95延迟s':>10}"
+              f"{'p95单页s':>10}{'峰值RSS MB':>11}{'上传MB':>9}{'请求':>6}{'429':>5}{'5xx':>5}{'失败':>5}")
+    print(header)
+    print("-" * (len(header) + 12))
+    previous = {config_key(result): result for result in (baseline or {}).get('results', [])}
+    for result in results:
+        rss = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else "-"
+        print(
+            f"{result['engine']:<8}{result['workers']:>5}{result['dpi']:>6}{result['format']:>7}{result['pages']:>6}"
+            f"{result['pages_per_min']:>10.1f}{result['p95_latency_s']:>10.3f}{result['p95_page_s']:>10.3f}"
+            f"{rss:>11}{result['bytes_sent'] / 1024 / 1024:>9.2f}{result['requests']:>6}"
+            f"{result['throttled']:>5}{result['server_errors']:>5}{result['failed']:>5}"
+        )
+        old = previous.get(config_key(result))
+        if old:
+            changes = []
+            for label, key in (("页/分钟", 'pages_per_min'), ("p95延迟", 'p95_latency_s'),
+                               ("峰值RSS", 'peak_rss_mb'), ("上传", 'bytes_sent')):
+                if old.get(key) and result.get(key) is not None:
+                    changes.append(f"{label} {(result[key] - old[key]) / old[key]:+.1%}")
+            print(f"{'':<8}相对 {baseline.get('commit') or '基线'}: " + "，".join(changes))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="端到端流水线基准测试（本地模拟服务）")
+    parser.add_argument("pdfs", nargs="*", type=Path, help="待测试的PDF，缺省时使用内置样例")
+    parser.add_argument("--repeat", type=int, default=2, help="样例重复的份数（每份作为独立文档）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16], help="并发数（线程数/在途请求数）")
+    parser.add_argument("--dpi", type=int, nargs="+", default=[FILE_CONFIG["default_dpi"]], help="渲染DPI")
+    parser.add_argument("--formats", nargs="+", choices=list(UPLOAD_FORMATS), default=["png"], help="上传编码")
+    parser.add_argument("--engines", nargs="+", choices=["thread", "async"], default=["thread", "async"],
+                        help="解析引擎")
+    parser.add_argument("--adaptive", action="store_true", help="启用AIMD自适应并发")
+    parser.add_argument("--stream", action="store_true", help="流式接收（完整JSON到达即断开）")
+    parser.add_argument("--render-workers", type=int, default=CONCURRENCY_CONFIG["default_render_workers"],
+                        help="PDF渲染进程数")
+
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟服务的平均响应延迟（秒）")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="响应延迟分布")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回500的比例")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="令牌桶限速（请求/秒），超出返回429，0表示不限")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="在途请求上限，超出返回429，0表示不限")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="模拟上行带宽（MB/s），0表示不限")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="模拟服务每个输出片段（8字）的生成耗时（秒）")
+    parser.add_argument("--ramble-chars", type=int, default=0, help="模拟服务在JSON之后追加的多余文字字数")
+    parser.add_argument("--seed", type=int, default=0, help="模拟服务的随机种子")
+
+    parser.add_argument("--json", type=Path, help="将结果另存为JSON（用于跨提交对比）")
+    parser.add_argument("--compare", type=Path, help="与之前保存的JSON结果对比")
+    args = parser.parse_args(argv)
+
+    pdf_paths = [str(path) for path in (args.pdfs or build_corpus())]
+    baseline = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    configs = [
+        {'engine': engine, 'workers': workers, 'dpi': dpi, 'format': fmt,
+         'adaptive': args.adaptive, 'stream': args.stream, 'render_workers': args.render_workers}
+        for engine, workers, dpi, fmt in itertools.product(args.engines, args.workers, args.dpi, args.formats)
+    ]
+    settings = {
+        'pdfs': [Path(path).name for path in pdf_paths], 'repeat': args.repeat, 'adaptive': args.adaptive,
+        'render_workers': args.render_workers, 'latency': args.latency, 'latency_dist': args.latency_dist,
+        'error_rate': args.error_rate, 'rate_limit': args.rate_limit, 'max_in_flight': args.max_in_flight,
+        'bandwidth': args.bandwidth, 'stream': args.stream, 'token_interval': args.token_interval,
+        'ramble_chars': args.ramble_chars, 'seed': args.seed
+    }
+    print(f"样例 {len(pdf_paths)} 个 × {args.repeat} 份 | 延迟 {args.latency}s（{args.latency_dist}）| "
+          f"错误率 {args.error_rate:.0%} | 限速 {args.rate_limit or '不限'} 请求/秒 | {len(configs)} 组参数\n")
+
+    results = []
+    for config in configs:
+        # 每组参数使用新的模拟服务，随机序列与前缀缓存状态相同
+        with MockOpenAIServer(latency=args.latency, latency_dist=args.latency_dist, error_rate=args.error_rate,
+                              rate_limit=args.rate_limit, max_in_flight=args.max_in_flight,
+                              upload_bandwidth=args.bandwidth * 1024 * 1024, token_interval=args.token_interval,
+                              ramble_chars=args.ramble_chars, seed=args.seed) as server:
+            outcome = run_in_subprocess(config, server.base_url, pdf_paths, args.repeat)
+            stats = dict(server.stats)
+        results.append({
+            **{key: config[key] for key in CONFIG_KEYS}, **outcome,
+            'requests': stats['requests'], 'bytes_sent': stats['bytes_received'],
+            'throttled': stats['throttled'], 'server_errors': stats['errors']
+        })
+        print(f"  完成 {config['engine']} / 并发 {config['workers']} / DPI {config['dpi']} / {config['format']}："
+              f"{outcome['pages_per_min']:.1f} 页/分钟")
+    print()
+    print_table(results, baseline)
+
+    if args.json:
+        report = {
+            'commit': git_commit(), 'created': datetime.now().isoformat(timespec="seconds"),
+            'settings': settings, 'results': results
+        }
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+页面渲染编码基准：对比旧的 PNG编码→解码→optimize重编码 路径与pixmap直接编码路径
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_render_encode
+    python -m benchmarks.bench_render_encode --dpi 300 样例1.pdf 样例2.pdf
+"""
+
+import io
+import sys
+import time
+import json
+import argparse
+from pathlib import Path
+from statistics import mean
+
+import fitz
+from PIL import Image
+
+from config import FILE_CONFIG, RENDER_CONFIG
+from utils import encode_pixmap
+from benchmarks.corpus import build_corpus
+
+
+def encode_legacy(pix) -> bytes:
+    """旧路径：pix.tobytes("png") → Image.open → optimize=True 重新编码"""
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", optimize=True, compress_level=6)
+    img.close()
+    return buffer.getvalue()
+
+
+def benchmark_pdf(pdf_path: Path, dpi: int) -> dict:
+    """逐页测量渲染时间以及各编码路径的耗时和输出大小"""
+    encoders = {
+        "legacy": encode_legacy,
+        "direct": lambda pix: encode_pixmap(pix, RENDER_CONFIG["png_compress_level"]),
+        "fast": lambda pix: encode_pixmap(pix, RENDER_CONFIG["fast_png_compress_level"]),
+    }
+    zoom = dpi / 72.0
+    matrix = fitz.Matrix(zoom, zoom)
+    pages = []
+    
+    document = fitz.open(str(pdf_path))
+    for page_index in range(len(document)):
+        start = time.perf_counter()
+        pix = document[page_index].get_pixmap(matrix=matrix)
+        record = {
+            "page": page_index + 1,
+            "size": f"{pix.width}x{pix.height}",
+            "render_ms": (time.perf_counter() - start) * 1000,
+        }
+        for name, encoder in encoders.items():
+            start = time.perf_counter()
+            data = encoder(pix)
+            record[f"{name}_ms"] = (time.perf_counter() - start) * 1000
+            record[f"{name}_bytes"] = len(data)
+        pages.append(record)
+    document.close()
+    
+    return {"file": pdf_path.name, "dpi": dpi, "pages": pages}
+
+
+def print_report(reports: list):
+    """打印每页明细和按文件汇总的对比表"""
+    header = (
+        f"{'文件':<16}{'页':>4}{'尺寸':>12}{'渲染ms':>9}"
+        f"{'旧路径ms':>10}{'旧KB':>9}{'直接ms':>9}{'直接KB':>9}{'快速ms':>9}{'快速KB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        for page in report["pages"]:
+            print(
+                f"{report['file'][:15]:<16}{page['page']:>4}{page['size']:>12}{page['render_ms']:>9.1f}"
+                f"{page['legacy_ms']:>10.1f}{page['legacy_bytes'] / 1024:>9.1f}"
+                f"{page['direct_ms']:>9.1f}{page['direct_bytes'] / 1024:>9.1f}"
+                f"{page['fast_ms']:>9.1f}{page['fast_bytes'] / 1024:>9.1f}"
+            )
+    
+    print("\n汇总（每页平均）")
+    print("-" * len(header))
+    for report in reports:
+        pages = report["pages"]
+        legacy = mean(p["legacy_ms"] for p in pages)
+        direct = mean(p["direct_ms"] for p in pages)
+        fast = mean(p["fast_ms"] for p in pages)
+        print(
+            f"{report['file']}: 渲染 {mean(p['render_ms'] for p in pages):.1f}ms | "
+            f"旧路径 {legacy:.1f}ms/{mean(p['legacy_bytes'] for p in pages) / 1024:.0f}KB | "
+            f"直接编码 {direct:.1f}ms/{mean(p['direct_bytes'] for p in pages) / 1024:.0f}KB "
+            f"({legacy / direct:.1f}x) | "
+            f"快速模式 {fast:.1f}ms/{mean(p['fast_bytes'] for p in pages) / 1024:.0f}KB "
+            f"({legacy / fast:.1f}x)"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="页面渲染编码基准测试")
+    parser.add_argument("pdfs", nargs="*", type=Path, help="待测试的PDF，缺省时使用内置样例")
+    parser.add_argument("--dpi", type=int, default=FILE_CONFIG["default_dpi"], help="渲染DPI")
+    parser.add_argument("--json", type=Path, help="将原始结果另存为JSON")
+    args = parser.parse_args(argv)
+    
+    pdfs = args.pdfs or build_corpus()
+    reports = [benchmark_pdf(pdf_path, args.dpi) for pdf_path in pdfs]
+    print_report(reports)
+    
+    if args.json:
+        args.json.write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
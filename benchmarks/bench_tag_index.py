@@ -0,0 +1,96 @@
+"""
+标签索引基准：向临时索引写入大量合成页面（标签频次按Zipf分布），测量写入速度与 AND/OR 检索延迟
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_tag_index
+    python -m benchmarks.bench_tag_index --pages 1000000 --documents 5000 --tags 20000
+
+说明：写入走 index_document（每个文档一个事务，与 rebuild 相同）；解析过程中的逐页写入每页一个事务，
+单页开销另行测量。检索延迟包含命中总数统计与前 --limit 个命中页的详情。
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean
+
+from metrics import percentile
+from tag_index import TagIndex
+
+
+def synthetic_page(rng: random.Random, tag_weights: list, tags_per_page: int) -> str:
+    """一页合成结果：按权重抽取若干个不重复的标签"""
+    tags = set()
+    while len(tags) < tags_per_page:
+        tags.add(rng.choices(range(len(tag_weights)), cum_weights=tag_weights)[0])
+    return json.dumps({"Page_type": "内容页", "page_name": "合成页面", "tag": [f"标签{tag}" for tag in tags],
+                       "page_content": "", "project_name": ""}, ensure_ascii=False)
+
+
+def time_queries(index: TagIndex, queries: list, mode: str, limit: int) -> dict:
+    latencies, totals = [], []
+    for tags in queries:
+        start = time.perf_counter()
+        result = index.search(tags, mode, limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+        totals.append(result['total'])
+    return {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95), 'max': max(latencies),
+            'hits': mean(totals)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="标签倒排索引基准（合成数据）")
+    parser.add_argument("--pages", type=int, default=200000, help="合成页面总数")
+    parser.add_argument("--documents", type=int, default=1000, help="文档数（页面平均分配）")
+    parser.add_argument("--tags", type=int, default=5000, help="不同标签数")
+    parser.add_argument("--tags-per-page", type=int, default=5, help="每页标签数")
+    parser.add_argument("--queries", type=int, default=200, help="每种检索的次数")
+    parser.add_argument("--limit", type=int, default=50, help="每次检索返回的命中页数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    weights, total = [], 0.0
+    for rank in range(1, args.tags + 1):
+        total += 1 / rank
+        weights.append(total)
+    pages_per_document = max(1, args.pages // args.documents)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        index = TagIndex(Path(work_dir) / "bench_tags.sqlite3")
+        start = time.perf_counter()
+        for document in range(args.documents):
+            pages = {page: synthetic_page(rng, weights, args.tags_per_page) for page in range(1, pages_per_document + 1)}
+            index.index_document(Path(work_dir) / f"文档{document}" / "summaries", pages)
+        elapsed = time.perf_counter() - start
+        stats = index.stats()
+        print(f"写入 {stats['pages']} 页 / {stats['documents']} 个文档 / {stats['tags']} 个标签："
+              f"{elapsed:.1f} 秒（{stats['pages'] / elapsed:,.0f} 页/秒）")
+
+        start = time.perf_counter()
+        for page in range(1, 201):
+            index.index_page(Path(work_dir) / "文档0" / "summaries", page, synthetic_page(rng, weights, args.tags_per_page))
+        print(f"逐页更新：平均 {(time.perf_counter() - start) / 200 * 1000:.2f} ms/页")
+
+        def pick(count):
+            # 偏向常见标签（同写入时的分布），使检索覆盖大列表
+            return [f"标签{rng.choices(range(args.tags), cum_weights=weights)[0]}" for _ in range(count)]
+
+        print(f"\n{'检索':<16}{'p50 ms':>10}{'p95 ms':>10}{'最大 ms':>10}{'平均命中页':>12}")
+        for label, mode, count in (("单标签", "and", 1), ("AND 2个标签", "and", 2), ("AND 3个标签", "and", 3),
+                                   ("OR 2个标签", "or", 2), ("OR 3个标签", "or", 3)):
+            result = time_queries(index, [pick(count) for _ in range(args.queries)], mode, args.limit)
+            print(f"{label:<16}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['max']:>10.2f}{result['hits']:>12.0f}")
+        start = time.perf_counter()
+        index.top_tags()
+        print(f"\n标签频次统计：{(time.perf_counter() - start) * 1000:.2f} ms")
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
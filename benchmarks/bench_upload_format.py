@@ -0,0 +1,121 @@
+"""
+上传编码基准：对比 PNG / JPEG / WebP / 自动 四种上传格式的载荷大小、编码耗时与端到端延迟
+
+端到端延迟经由 AIParser.parse_page 发往本地模拟服务测得（含编码、base64与上传），
+模拟服务按 --bandwidth 限制上行带宽，用于体现载荷大小对上传时间的影响。
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_upload_format
+    python -m benchmarks.bench_upload_format --dpi 300 --bandwidth 1 --quality 80 样例.pdf
+"""
+
+import sys
+import time
+import json
+import base64
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean
+
+import fitz
+
+from config import FILE_CONFIG, RENDER_CONFIG, UPLOAD_CONFIG, UPLOAD_FORMATS
+from parse_cache import ParseCache
+from utils import AIParser, encode_pixmap, encode_for_upload, close_shared_clients
+from benchmarks.corpus import build_corpus
+from benchmarks.mock_server import MockOpenAIServer
+
+
+def render_pages(pdf_path: Path, dpi: int) -> list:
+    """按切片的方式渲染每页为PNG字节"""
+    zoom = dpi / 72.0
+    matrix = fitz.Matrix(zoom, zoom)
+    document = fitz.open(str(pdf_path))
+    pages = [
+        encode_pixmap(document[page_index].get_pixmap(matrix=matrix), RENDER_CONFIG["png_compress_level"])
+        for page_index in range(len(document))
+    ]
+    document.close()
+    return pages
+
+
+def benchmark_pdf(pdf_path: Path, dpi: int, quality: int, parsers: dict) -> dict:
+    """逐页测量各上传格式的编码耗时、载荷大小与端到端延迟"""
+    pages = []
+    for page_num, png_bytes in enumerate(render_pages(pdf_path, dpi), 1):
+        record = {"page": page_num, "png_bytes": len(png_bytes)}
+        for fmt, parser in parsers.items():
+            start = time.perf_counter()
+            data, mime = encode_for_upload(png_bytes, fmt, quality)
+            record[f"{fmt}_encode_ms"] = (time.perf_counter() - start) * 1000
+            record[f"{fmt}_payload"] = len(base64.b64encode(data))
+            record[f"{fmt}_mime"] = mime
+
+            start = time.perf_counter()
+            outcome = parser.parse_page(png_bytes, "基准测试", page_num)
+            record[f"{fmt}_e2e_ms"] = (time.perf_counter() - start) * 1000
+            if not outcome['success']:
+                raise RuntimeError(f"{pdf_path.name} 第{page_num}页 {fmt} 请求失败: {outcome['content']}")
+        pages.append(record)
+    return {"file": pdf_path.name, "dpi": dpi, "pages": pages}
+
+
+def print_report(reports: list, formats: list):
+    """按文件打印各格式的每页平均值（载荷为base64后的请求体图片大小）"""
+    header = f"{'文件':<16}{'格式':<8}{'载荷KB':>10}{'相对PNG':>9}{'编码ms':>9}{'端到端ms':>10}  实际格式"
+    print(header)
+    print("-" * (len(header) + 8))
+    for report in reports + [{"file": "全部", "pages": [p for r in reports for p in r["pages"]]}]:
+        pages = report["pages"]
+        png_payload = mean(p["png_payload"] for p in pages)
+        for fmt in formats:
+            payload = mean(p[f"{fmt}_payload"] for p in pages)
+            mimes = sorted({p[f"{fmt}_mime"].split("/")[-1] for p in pages})
+            print(
+                f"{report['file'][:15]:<16}{fmt:<8}{payload / 1024:>10.1f}{payload / png_payload:>9.2f}"
+                f"{mean(p[f'{fmt}_encode_ms'] for p in pages):>9.1f}{mean(p[f'{fmt}_e2e_ms'] for p in pages):>10.1f}"
+                f"  {'/'.join(mimes)}"
+            )
+        print()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="上传编码基准测试")
+    parser.add_argument("pdfs", nargs="*", type=Path, help="待测试的PDF，缺省时使用内置样例")
+    parser.add_argument("--dpi", type=int, default=FILE_CONFIG["default_dpi"], help="渲染DPI")
+    parser.add_argument("--quality", type=int, default=UPLOAD_CONFIG["quality"], help="JPEG/WebP编码质量")
+    parser.add_argument("--formats", nargs="+", choices=list(UPLOAD_FORMATS), default=list(UPLOAD_FORMATS),
+                        help="参与对比的上传格式")
+    parser.add_argument("--bandwidth", type=float, default=2.0, help="模拟上行带宽（MB/s），0表示不限")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务的固定响应延迟（秒）")
+    parser.add_argument("--json", type=Path, help="将原始结果另存为JSON")
+    args = parser.parse_args(argv)
+
+    formats = ["png"] + [fmt for fmt in args.formats if fmt != "png"]
+    pdfs = args.pdfs or build_corpus()
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            MockOpenAIServer(latency=args.latency, upload_bandwidth=args.bandwidth * 1024 * 1024) as server:
+        # 使用临时缓存并跳过读取：每次都真实发出请求，且模拟结果不会写入用户的解析缓存
+        cache = ParseCache(Path(cache_dir) / "bench.sqlite3")
+        parsers = {}
+        for fmt in formats:
+            parsers[fmt] = AIParser("mock-key-for-benchmark", cache=cache, bypass_cache=True,
+                                    upload_format=fmt, upload_quality=args.quality)
+            parsers[fmt].base_url = server.base_url
+        # 预热连接
+        parsers["png"].parse_page(render_pages(pdfs[0], 72)[0], "预热", 1)
+        reports = [benchmark_pdf(pdf_path, args.dpi, args.quality, parsers) for pdf_path in pdfs]
+        cache.conn.close()
+    close_shared_clients()
+
+    print(f"DPI {args.dpi} | 质量 {args.quality} | 模拟上行带宽 {args.bandwidth} MB/s\n")
+    print_report(reports, formats)
+
+    if args.json:
+        args.json.write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
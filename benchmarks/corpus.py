@@ -0,0 +1,101 @@
+"""
+基准测试用的固定样例PDF
+
+所有样例均由代码确定性生成（固定随机种子），保证不同提交之间的测试结果可比。
+"""
+
+import io
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import fitz
+from PIL import Image
+
+# 默认样例输出目录
+DEFAULT_CORPUS_DIR = Path(__file__).parent / ".corpus"
+
+LOREM = (
+    "景观设计项目文档样例，包含场地分析、雨洪管理、铺装做法、植物配置与节点详图等内容。"
+    "Landscape design sample text for benchmarking the render and encode pipeline. "
+)
+
+
+def _text_page(page: "fitz.Page", rng: random.Random):
+    """文字为主的页面"""
+    y = 60
+    while y < page.rect.height - 60:
+        words = LOREM[rng.randint(0, 20):]
+        page.insert_text((50, y), words[:60], fontsize=10, fontname="china-s")
+        y += 16
+
+
+def _drawing_page(page: "fitz.Page", rng: random.Random):
+    """矢量线稿（图集/施工图）页面"""
+    width, height = page.rect.width, page.rect.height
+    for _ in range(400):
+        x0, y0 = rng.uniform(20, width - 20), rng.uniform(20, height - 20)
+        x1, y1 = x0 + rng.uniform(-120, 120), y0 + rng.uniform(-120, 120)
+        page.draw_line((x0, y0), (x1, y1), width=rng.choice([0.3, 0.6, 1.2]))
+    for _ in range(40):
+        x, y = rng.uniform(40, width - 140), rng.uniform(40, height - 80)
+        page.draw_rect(fitz.Rect(x, y, x + rng.uniform(20, 100), y + rng.uniform(10, 40)), width=0.8)
+    page.insert_text((40, 40), "节点详图 1:20", fontsize=14, fontname="china-s")
+
+
+def _photo_page(page: "fitz.Page", rng: random.Random):
+    """整页照片/效果图页面（嵌入有噪声的渐变位图）"""
+    width, height = 600, 420
+    pixels = bytearray()
+    for y in range(height):
+        for x in range(width):
+            noise = rng.randint(-25, 25)
+            pixels += bytes((
+                max(0, min(255, (x * 255) // width + noise)),
+                max(0, min(255, (y * 255) // height + noise)),
+                max(0, min(255, 128 + noise * 2)),
+            ))
+    image = Image.frombytes("RGB", (width, height), bytes(pixels))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    page.insert_image(fitz.Rect(30, 80, page.rect.width - 30, page.rect.height - 80), stream=buffer.getvalue())
+    page.insert_text((40, 50), "效果图", fontsize=16, fontname="china-s")
+
+
+def _blank_page(page: "fitz.Page", rng: random.Random):
+    """空白分隔页"""
+
+
+PAGE_BUILDERS = {
+    "text": _text_page,
+    "drawing": _drawing_page,
+    "photo": _photo_page,
+    "blank": _blank_page,
+}
+
+# 样例文档：名称 -> (页面尺寸, 各页类型)
+CORPUS_SPEC: Dict[str, tuple] = {
+    "text_a4": (fitz.paper_rect("a4"), ["text"] * 4),
+    "drawing_a3": (fitz.paper_rect("a3-l"), ["drawing"] * 4),
+    "photo_a4": (fitz.paper_rect("a4-l"), ["photo"] * 3),
+    "mixed_deck": (fitz.paper_rect("a4-l"), ["text", "blank", "drawing", "photo", "blank", "text"]),
+}
+
+
+def build_corpus(output_dir: Path = DEFAULT_CORPUS_DIR, names: List[str] = None) -> List[Path]:
+    """生成（或复用已生成的）样例PDF，返回文件路径列表"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in names or list(CORPUS_SPEC):
+        pdf_path = output_dir / f"{name}.pdf"
+        if not pdf_path.exists():
+            rect, kinds = CORPUS_SPEC[name]
+            rng = random.Random(name)
+            document = fitz.open()
+            for kind in kinds:
+                page = document.new_page(width=rect.width, height=rect.height)
+                PAGE_BUILDERS[kind](page, rng)
+            document.save(str(pdf_path))
+            document.close()
+        paths.append(pdf_path)
+    return paths
@@ -0,0 +1,295 @@
+"""
+本地OpenAI兼容模拟服务
+
+只实现 POST .../chat/completions，返回固定的一行JSON解析结果，
+用于在不访问真实ARK接口的情况下测量客户端侧的性能。
+设置 max_in_flight 后，超出该在途请求数的请求返回429，模拟服务端限流；
+设置 rate_limit（请求/秒）后按令牌桶限速，超出的请求返回429并附带 Retry-After；
+latency 为平均响应延迟，latency_dist 选择其分布（fixed / uniform / exponential / lognormal），
+error_rate 为随机返回500的比例；随机数使用固定种子，同样的参数每次产生同样的序列。
+设置 upload_bandwidth（字节/秒）后按请求体大小额外等待，模拟上行带宽受限时的上传耗时。
+多页合并请求（消息中带有多个【第k张】页面标记）返回由各页结果组成的JSON数组。
+返回的 usage 按文字字数与图片数估算输入token；请求以曾出现过的系统消息开头时，
+该系统消息部分计为 cached_tokens，模拟服务端的提示词前缀缓存。
+token_interval 为每个输出片段的生成耗时（模拟逐token生成）；ramble_chars 在JSON之后追加多余的说明文字，
+模拟输出冗长的模型。请求带 stream=true 时以SSE分块逐片段返回，客户端提前断开时停止生成。
+"""
+
+import json
+import math
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+MOCK_CONTENT = json.dumps({
+    "Page_type": "内容页",
+    "page_name": "模拟页面",
+    "tag": ["模拟标签", "基准测试"],
+    "page_content": "本地模拟服务返回的固定解析结果。",
+    "project_name": ""
+}, ensure_ascii=False)
+
+# 模拟用量中每张图片计入的输入token
+IMAGE_TOKENS = 1000
+
+# 响应延迟分布（均值均为 latency）
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+# 对数正态分布的形状参数（越大长尾越明显）
+LOGNORMAL_SIGMA = 0.6
+# 流式返回时每个片段的字符数
+STREAM_PIECE_CHARS = 8
+# ramble_chars 追加的冗余文字（循环截取）
+RAMBLE_TEXT = "\n\n说明：以上为本页的解析结果，下面逐项解释各字段的提取依据与判断过程。"
+
+
+def mock_content(request: Dict) -> str:
+    """单页请求返回固定结果；合并请求按页面标记数返回等长的结果数组"""
+    pages = sum(
+        1 for message in request.get("messages", []) if isinstance(message.get("content"), list)
+        for part in message["content"] if part.get("type") == "text" and part.get("text", "").startswith("【第")
+    )
+    if pages <= 1:
+        return MOCK_CONTENT
+    return json.dumps([json.loads(MOCK_CONTENT)] * pages, ensure_ascii=False)
+
+
+def mock_usage(request: Dict, content: str, seen_prefixes: set) -> Dict:
+    """估算token用量：每个文字字符1个token、每张图片 IMAGE_TOKENS 个；已出现过的系统消息计为缓存命中"""
+    prompt_tokens, cached_tokens = 0, 0
+    for position, message in enumerate(request.get("messages", [])):
+        parts = message.get("content")
+        if isinstance(parts, str):
+            prompt_tokens += len(parts)
+            if position == 0 and message.get("role") == "system":
+                if parts in seen_prefixes:
+                    cached_tokens = len(parts)
+                seen_prefixes.add(parts)
+            continue
+        for part in parts or []:
+            prompt_tokens += len(part.get("text", "")) if part.get("type") == "text" else IMAGE_TOKENS
+    completion_tokens = len(content)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens}
+    }
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """模拟 chat.completions 接口（HTTP/1.1，支持长连接）"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，关闭Nagle避免与延迟ACK叠加出约40ms的假延迟
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # 每个TCP连接对应一个handler实例，借此统计新建连接数
+        self.server.mock.count("connections")
+
+    def handle(self):
+        # 客户端提前断开流式响应后可能直接重置连接
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass
+
+    def do_POST(self):
+        mock = self.server.mock
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        mock.count("requests")
+        mock.count("bytes_received", len(body))
+        if mock.upload_bandwidth:
+            time.sleep(len(body) / mock.upload_bandwidth)
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        retry_after = mock.take_token()
+        if retry_after is not None or not mock.enter():
+            mock.count("throttled")
+            self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                            headers={"Retry-After": str(math.ceil(retry_after or 0))})
+            return
+        try:
+            latency, failed = mock.sample()
+            if latency:
+                time.sleep(latency)
+        finally:
+            mock.leave()
+        if failed:
+            mock.count("errors")
+            self._send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+        request = json.loads(body or b"{}")
+        content = mock_content(request)
+        if mock.ramble_chars:
+            content += (RAMBLE_TEXT * (mock.ramble_chars // len(RAMBLE_TEXT) + 1))[:mock.ramble_chars]
+        with mock.lock:
+            usage = mock_usage(request, content, mock.seen_prefixes)
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        if request.get("stream"):
+            self._send_stream(request, pieces, usage)
+            return
+        if mock.token_interval:
+            time.sleep(len(pieces) * mock.token_interval)
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _send_stream(self, request: Dict, pieces: list, usage: Dict):
+        """以SSE分块逐片段返回，最后附带用量；客户端提前断开时停止生成"""
+        mock = self.server.mock
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "mock")}
+        events = [{**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                  for piece in pieces]
+        events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "choices": [], "usage": usage})
+        try:
+            for index, event in enumerate(events):
+                if 0 < index < len(pieces) and mock.token_interval:
+                    time.sleep(mock.token_interval)
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            mock.count("aborted")
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        """写出一个HTTP分块（空数据为结束块）"""
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict, headers: Dict = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """静默访问日志"""
+
+
+class MockOpenAIServer:
+    """在后台线程运行的本地模拟服务，可作为上下文管理器使用"""
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 max_in_flight: int = 0, upload_bandwidth: float = 0, latency_dist: str = "fixed",
+                 error_rate: float = 0.0, rate_limit: float = 0.0, seed: int = 0,
+                 token_interval: float = 0.0, ramble_chars: int = 0):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"未知的延迟分布: {latency_dist}")
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.error_rate = error_rate
+        self.token_interval = token_interval
+        self.ramble_chars = ramble_chars
+        self.max_in_flight = max_in_flight
+        self.upload_bandwidth = upload_bandwidth
+        self.rate_limit = rate_limit
+        self.tokens = rate_limit
+        self.token_time = time.monotonic()
+        self.rng = random.Random(seed)
+        self.in_flight = 0
+        self.seen_prefixes = set()
+        self.stats = {"connections": 0, "requests": 0, "bytes_received": 0, "throttled": 0, "errors": 0,
+                      "aborted": 0, "peak_in_flight": 0}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def enter(self) -> bool:
+        """占用一个在途名额；超过 max_in_flight 时返回False（0表示不限）"""
+        with self.lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return False
+            self.in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def take_token(self):
+        """令牌桶限速：有令牌时返回None，否则返回距下一个令牌的秒数（rate_limit 为0表示不限）"""
+        if not self.rate_limit:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            # 桶容量为1秒的请求数，允许短时突发
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.token_time) * self.rate_limit)
+            self.token_time = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate_limit
+
+    def sample(self):
+        """抽取本次请求的响应延迟与是否返回500"""
+        with self.lock:
+            failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+            if not self.latency or self.latency_dist == "fixed":
+                return self.latency, failed
+            if self.latency_dist == "uniform":
+                return self.rng.uniform(0, 2 * self.latency), failed
+            if self.latency_dist == "exponential":
+                return self.rng.expovariate(1 / self.latency), failed
+            mu = math.log(self.latency) - LOGNORMAL_SIGMA ** 2 / 2
+            return self.rng.lognormvariate(mu, LOGNORMAL_SIGMA), failed
+
+    def reset_stats(self):
+        with self.lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def start(self) -> "MockOpenAIServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-openai", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -12,6 +12,49 @@ ARK_API_CONFIG = {
     "default_api_key": ""
 }
 
+# HTTP连接池配置（所有页面、文件与会话共享同一组客户端）
+HTTP_CONFIG = {
+    "max_connections": 100,           # 每个客户端的最大连接数
+    "max_keepalive_connections": 20,  # 保持空闲的长连接数
+    "keepalive_expiry": 60,           # 空闲连接保持时间（秒）
+    "sdk_max_retries": 0              # openai SDK内部的自动重试次数（重试统一由 RETRY_CONFIG 控制）
+}
+
+# 单页请求重试（指数退避 + 随机抖动，每个解析任务共享重试预算）
+RETRY_CONFIG = {
+    "enabled": True,
+    "max_attempts": 4,            # 每页最多请求次数（含首次）
+    "base_delay": 1.0,            # 首次重试前的退避上限（秒），之后每次翻倍
+    "max_delay": 30.0,            # 单次退避的最长等待（秒）
+    "budget_ratio": 0.2,          # 每个任务可用的重试次数 = 页数 × 该比例
+    "min_budget": 5               # 页数较少时的最低重试次数
+}
+
+# 自适应并发控制（AIMD：健康时线性增加在途请求，过载时成倍回退）
+ADAPTIVE_CONFIG = {
+    "enabled": False,
+    "initial_fraction": 0.25,     # 初始并发 = 并发上限 × 该比例
+    "increase_step": 1,           # 每个健康窗口增加的并发数
+    "decrease_factor": 0.5,       # 429/5xx/超时或p95延迟升高时的回退系数
+    "latency_window": 50,         # 计算p95延迟的最近请求数
+    "latency_tolerance": 2.0,     # p95超过基线的倍数即视为延迟升高
+    "decrease_cooldown": 2.0      # 两次回退之间的最短间隔（秒），避免同一波错误连续回退
+}
+
+# 模型生成参数（同时参与解析缓存键的计算）
+GENERATION_CONFIG = {
+    "max_tokens": 4096,
+    "temperature": 0.7,
+    "top_p": 0.9
+}
+
+# 解析结果缓存配置
+CACHE_CONFIG = {
+    "enabled": True,
+    "path": str(Path.home() / ".pdf_parser_cache" / "parse_cache.sqlite3"),
+    "max_size_mb": 512            # 超出后按最久未访问（LRU）淘汰
+}
+
 # 文件处理配置
 FILE_CONFIG = {
     "max_files": 20,
@@ -21,12 +64,175 @@ FILE_CONFIG = {
     "min_dpi": 100
 }
 
+# 页面渲染配置
+RENDER_CONFIG = {
+    "png_compress_level": 6,       # PNG压缩级别（0-9），从pixmap原始像素一次编码
+    "fast_png_compress_level": 1,  # 快速模式：编码更快，文件略大
+    "in_memory": False,            # 内存直传：渲染结果不落盘，直接送往AI解析
+    "persist_slices": True         # 内存直传时，请求发出后异步保存切片图片
+}
+
+# 页面分辨率配置（视觉模型会把过大的输入缩小，超出预算的像素只会浪费带宽和上传时间）
+RESOLUTION_CONFIG = {
+    "mode": "fixed",              # fixed：所有页面使用同一DPI；auto：按页面尺寸为每页计算DPI
+    "max_pixels": 2_500_000,      # auto模式下每页最多像素数
+    "max_image_tokens": 0,        # auto模式下每页图像token上限（0表示只按像素限制）
+    "token_patch_size": 28,       # 估算图像token：每 28×28 像素约1个token
+    "min_dpi": 36                 # auto模式下的最低DPI，避免超大图纸缩得无法辨认
+}
+
+# 上传编码配置（发送给模型的图片格式；切片文件始终保存为PNG）
+UPLOAD_CONFIG = {
+    "format": "png",              # png / jpeg / webp / auto（线稿文字保持无损，照片与扫描件有损压缩）
+    "quality": 85,                # JPEG/WebP 质量（1-100）
+    "auto_lossy_format": "jpeg",  # auto模式下照片类页面使用的格式（JPEG编码远快于WebP）
+    "photo_color_ratio": 0.1,     # 缩略图中颜色种类数/像素数超过该比例即视为照片类页面
+    "classify_size": 256          # 内容分类所用缩略图的最长边（像素）
+}
+
+# 空白页/重复页过滤（解析前为每页计算墨迹覆盖率与感知哈希，空白页跳过，重复页沿用同一文档中先前页面的结果）
+PAGE_FILTER_CONFIG = {
+    "enabled": False,             # 默认关闭：开启后空白页不生成单页结果、重复页复制源页结果，输出页数随之变化
+    "ink_threshold": 24,          # 与页面底色的灰度差超过该值的像素视为墨迹
+    "blank_max_ink": 0.0005,      # 墨迹覆盖率低于该比例即视为空白页
+    "blank_margin": 0.02,         # 计算墨迹时忽略的页边比例（出血、裁切线与纯色页的抗锯齿边缘）
+    "hash_size": 8,               # dHash边长（hash_size² 位）
+    "max_hash_distance": 4,       # 感知哈希的汉明距离不超过该值才进一步逐块比对
+    "block_size": 64,             # 逐块比对的小块边长（像素）
+    "max_diff_ratio": 0.002,      # 内容不同的小块占比不超过该值即视为重复页（A4@200DPI约2块，容许页码不同）
+    "record_file": "page_filter.json"  # 结果目录中记录逐页过滤判定的文件（单页JSON不含过滤标记）
+}
+
+# PDF文字层快速通道（原生电子PDF可直接提取文字，无需整页渲染后再识别）
+TEXT_LAYER_CONFIG = {
+    "mode": "image",              # image：仅发送图片（原有方式）；auto：按页自动选择 文字 / 图文 / 图片
+    "min_chars": 30,              # 文字层少于该字数视为扫描件或纯图页，按图片发送
+    "max_garbled_ratio": 0.1,     # 无法识别字符（字体缺少映射时的乱码）占比超过该值时不信任文字层
+    "mixed_image_coverage": 0.15, # 位图覆盖页面面积超过该比例即视为图文混排
+    "mixed_drawings": 200,        # 矢量图形路径数超过该值即视为图文混排（图纸、图表）
+    "mixed_dpi": 120,             # 图文混排页随文字一起发送的图片DPI（不高于设定DPI）
+    "max_text_chars": 8000        # 单页随请求发送的文字上限，超出部分截断
+}
+
+TEXT_LAYER_MODES = {
+    "image": "仅图片",
+    "auto": "自动（文字页只发文字，图文页低DPI图片+文字）"
+}
+
+# 文字层页面的发送方式
+TEXT_LAYER_ROUTES = {
+    "text": "仅文字",
+    "mixed": "低DPI图片+文字",
+    "image": "仅图片"
+}
+
+UPLOAD_FORMATS = {
+    "png": "PNG（无损）",
+    "jpeg": "JPEG",
+    "webp": "WebP",
+    "auto": "自动（线稿无损/照片有损）"
+}
+
+# 请求消息布局：system 时较长的提示词作为固定的系统消息放在最前，逐页变化的图片与页码放在其后，
+# 各页请求前缀相同，可命中服务端的提示词（前缀）缓存；inline 为原布局（图片在前，页码与提示词在后）
+PROMPT_LAYOUT_CONFIG = {
+    "layout": "system"
+}
+
+PROMPT_LAYOUTS = {
+    "system": "系统消息（提示词在前，利于前缀缓存）",
+    "inline": "逐页内联（图片在前，原布局）"
+}
+
+# 多页合并请求（多个页面放进同一个请求，较长的提示词只发送一次，模型按顺序返回各页结果组成的JSON数组）
+PACK_CONFIG = {
+    "pack_size": 1,               # 每个请求合并的页数，1 表示不合并（逐页请求）
+    "max_pack_size": 8,           # 界面可选的最大合并页数
+    "max_wait": 1.0               # 凑满一组前最多等待后续页面的秒数，超时则按已取到的页面发送
+}
+
+# 流式接收（stream=True）：边接收边检查JSON，顶层JSON值完整到达即断开连接，不再等待模型后续的多余文字；
+# 迟迟不出现JSON或输出超长（失控）时提前截断并按失败重试
+STREAM_CONFIG = {
+    "enabled": False,
+    "include_usage": True,        # 请求在流末尾附带token用量（提前断开的请求拿不到用量）
+    "max_lead_chars": 500,        # JSON开始前的多余文字超过该字数视为失控
+    "max_chars": 12000            # 每页输出超过该字数仍未得到完整JSON视为失控（合并请求按页数放大）
+}
+
+# 解析结果校验：按预设的键结构（PRESET_SCHEMAS）校验每页JSON，先在本地做廉价修复
+# （去除代码块标记与前后多余文字、转义值中的双引号、去除多余逗号、调整键顺序与值类型），
+# 无法修复的页面单独重新请求；仍不合格的页面记为失败，不写入 {页码}.json，续传时只重跑这些页面
+VALIDATION_CONFIG = {
+    "enabled": True,
+    "max_reasks": 1,              # 本地无法修复时重新请求的次数（附上未通过的原因），0 表示不重新请求
+    "list_separators": "[,，、;；]"  # 数组字段被写成字符串时的拆分符
+}
+
+# 结果存储：files 为逐页文件（summaries/{页码}.json、{页码}_error.txt）；jsonl 为每个文档一个
+# results.jsonl（追加写入）加定长偏移索引 results.idx，由后台线程批量写入，按页码O(1)读取，适合页数极多或网络存储
+RESULT_STORE_CONFIG = {
+    "format": "files",
+    "data_file": "results.jsonl",
+    "index_file": "results.idx"
+}
+
+RESULT_STORE_FORMATS = {
+    "files": "逐页文件（{页码}.json）",
+    "jsonl": "合并存储（results.jsonl + 偏移索引）"
+}
+
+# 标签倒排索引：解析结果写入时按 tag 数组增量更新 标签 → (文档, 页码) 的索引（SQLite），
+# 跨全部已解析文档按标签检索（AND/OR）并统计标签频次，不再逐个打开 summaries/*.json
+TAG_INDEX_CONFIG = {
+    "enabled": True,
+    "path": str(Path.home() / ".pdf_parser_cache" / "tag_index.sqlite3"),
+    "max_results": 200,           # 单次检索返回的命中页数上限
+    "count_limit": 10000,         # 命中页数精确统计的上限，超出时只给出下限（避免为统计总数扫描数十万页）
+    "top_tags": 50                # 标签频次统计显示的标签数
+}
+
+TAG_SEARCH_MODES = {
+    "and": "同时包含全部标签（AND）",
+    "or": "包含任一标签（OR）"
+}
+
+# 逐页性能指标（每个文档的结果目录下写入 metrics.jsonl，汇总报告给出延迟分位数与吞吐量）
+METRICS_CONFIG = {
+    "enabled": True,
+    "filename": "metrics.jsonl",
+    "percentiles": [50, 95, 99],
+    "http_port": 0,               # 本地Prometheus指标端点端口（/metrics），0表示不启动
+    "http_host": "127.0.0.1",
+    "latency_buckets": [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120]  # 直方图分桶（秒）
+}
+
 # 并发配置
 CONCURRENCY_CONFIG = {
     "max_workers": 5,
     "default_workers": 2,
     "default_timeout": 60,
-    "max_timeout": 300
+    "max_timeout": 300,
+    "engine": "thread",           # 解析引擎：thread（线程池）或 async（asyncio）
+    "default_async_concurrency": 32,  # 异步引擎的在途请求数
+    "max_async_concurrency": 256,
+    "pipeline_enabled": True,     # 流水线模式：边拆分边解析
+    "pipeline_queue_size": 0,     # 渲染→解析队列容量，0表示按并发数自动计算（并发数×2）
+    "default_render_workers": min(4, os.cpu_count() or 1),  # PDF渲染进程数
+    "max_render_workers": os.cpu_count() or 1,
+    "render_chunk_size": 4,       # 每个渲染任务负责的连续页数
+    "parallel_render_min_pages": 8,  # 页数少于此值时单进程渲染（避免进程启动开销）
+    "schedule_policy": "fifo",    # 多文件批处理时各文档页面的入队顺序（见 SCHEDULE_POLICIES）
+    "default_image_workers": 4,   # 图片批量解析的后台并发数
+    "max_image_workers": 16,
+    "image_poll_interval": 1.0    # 图片批量解析进行中，界面刷新进度的间隔（秒）
+}
+
+# 多文件调度策略：所有文档的页面共用一个解析队列，策略决定入队顺序
+SCHEDULE_POLICIES = {
+    "fifo": "按上传顺序",
+    "shortest_first": "短文档优先",
+    "round_robin": "各文档轮流"
 }
 
 # 输出配置
@@ -184,6 +390,15 @@ page_content 撰写要点
 请以JSON格式输出识别结果。"""
 }
 
+# 预设提示词要求的结果键结构（键 -> 值类型，{} 表示只要求是JSON对象），未列出的预设输出自由文本，不做校验；
+# 提示词经过修改（如填入项目名称）时，只要其中仍包含某个预设的全部键名，即按该预设校验
+PRESET_SCHEMAS = {
+    "设计方案分析": {"Page_type": str, "page_name": str, "tag": list, "page_content": str, "project_name": str},
+    "图集识别": {"Page_type": str, "page_name": str, "tag": list, "page_content": str},
+    "发票识别": {},
+    "证件识别": {}
+}
+
 # 错误消息
 ERROR_MESSAGES = {
     "no_api_key": "❌ 请先配置API Key！",
@@ -0,0 +1,245 @@
+"""
+PDF智能解析工具 - 任务清单（断点续传）
+
+每个文档的输出目录下维护一个 manifest.json，逐页记录渲染与解析状态，
+以及决定已有结果是否仍然有效的输入指纹（PDF哈希、DPI、文字层模式、提示词哈希、模型）。
+会话中断后重新处理同一文档时，只渲染和解析缺失或失败的页面。
+逐页状态变化按时间/页数间隔批量写回（避免大文档每页重写整个清单），文档结束或中断时由 flush() 写入其余变化；
+进程被强制结束时最多丢失最近一个间隔内的状态，这些页面续传时重新解析（通常命中解析缓存）。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# 逐页状态的批量写回间隔：距上次写入超过 SAVE_INTERVAL 秒或累计 SAVE_EVERY 页变化时写回
+SAVE_INTERVAL = 2.0
+SAVE_EVERY = 50
+
+
+def hash_bytes(data: bytes) -> str:
+    """计算字节内容的SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobManifest:
+    """单个文档的处理清单（线程安全，逐页状态批量原子写回磁盘）"""
+
+    def __init__(self, path: Path, data: Dict):
+        self.path = Path(path)
+        self.data = data
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.saved_at = time.monotonic()
+
+    @classmethod
+    def load(cls, base_dir: Path) -> Optional["JobManifest"]:
+        """读取已有清单；不存在或已损坏时返回None"""
+        path = Path(base_dir) / MANIFEST_NAME
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(path, data)
+
+    @classmethod
+    def open(cls, base_dir: Path, pdf_name: str, pdf_hash: str, prompt: str, model: str,
+             dpi: int, total_pages: int, max_pixels: Optional[int] = None,
+             text_layer: Optional[str] = None) -> "JobManifest":
+        """打开文档清单，按输入指纹决定沿用哪些已完成的工作
+
+        PDF与分辨率设置（DPI、自动模式的像素预算及文字层模式）不变时沿用已渲染的切片；
+        在此基础上提示词和模型也不变时沿用已成功的解析结果。
+        """
+        render_key = {"pdf_sha256": pdf_hash, "dpi": dpi, "total_pages": total_pages}
+        if max_pixels:
+            render_key["max_pixels"] = max_pixels
+        if text_layer and text_layer != "image":
+            render_key["text_layer"] = text_layer
+        parse_key = {"prompt_sha256": hash_bytes(prompt.encode("utf-8")), "model": model}
+
+        manifest = cls.load(base_dir)
+        if manifest is None:
+            manifest = cls(Path(base_dir) / MANIFEST_NAME, {"version": MANIFEST_VERSION, "created_at": time.time()})
+        data = manifest.data
+        same_render = data.get("render_key") == render_key
+        same_parse = same_render and data.get("parse_key") == parse_key
+
+        pages = {}
+        for page_num in range(1, total_pages + 1):
+            old = data.get("pages", {}).get(str(page_num), {}) if same_render else {}
+            page = {"rendered": old.get("rendered", False)}
+            if same_parse and "status" in old:
+                page.update({k: old[k] for k in ("status", "attempts", "error", "route", "filter", "updated_at") if k in old})
+            pages[str(page_num)] = page
+
+        data.update({
+            "pdf_name": pdf_name,
+            "prompt": prompt,
+            "render_key": render_key,
+            "parse_key": parse_key,
+            "pages": pages
+        })
+        manifest.save()
+        return manifest
+
+    @property
+    def pdf_name(self) -> str:
+        return self.data["pdf_name"]
+
+    @property
+    def pdf_hash(self) -> str:
+        return self.data["render_key"]["pdf_sha256"]
+
+    @property
+    def prompt(self) -> str:
+        return self.data["prompt"]
+
+    @property
+    def dpi(self) -> int:
+        return self.data["render_key"]["dpi"]
+
+    @property
+    def max_pixels(self) -> Optional[int]:
+        """自动分辨率模式的每页像素预算（固定DPI时为None）"""
+        return self.data["render_key"].get("max_pixels")
+
+    @property
+    def text_layer(self) -> str:
+        """文字层模式（未使用文字层时为 image）"""
+        return self.data["render_key"].get("text_layer", "image")
+
+    @property
+    def total_pages(self) -> int:
+        return self.data["render_key"]["total_pages"]
+
+    def save(self):
+        """原子写入：先写临时文件再替换，进程中途退出也不会留下半个清单"""
+        with self.lock:
+            self.data["updated_at"] = time.time()
+            tmp_path = self.path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            self.dirty = 0
+            self.saved_at = time.monotonic()
+
+    def _changed(self, pages: int = 1):
+        """记录逐页状态变化，到达写回间隔时写回"""
+        with self.lock:
+            self.dirty += pages
+            due = self.dirty >= SAVE_EVERY or time.monotonic() - self.saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def flush(self):
+        """写回尚未保存的状态变化（文档结束、取消或中断时调用）"""
+        if self.dirty:
+            self.save()
+
+    def is_rendered(self, page_num: int) -> bool:
+        return self.data["pages"][str(page_num)]["rendered"]
+
+    def mark_rendered(self, page_nums: Iterable[int]):
+        """记录这些页面的切片图片已写入磁盘"""
+        with self.lock:
+            page_nums = list(page_nums)
+            for page_num in page_nums:
+                self.data["pages"][str(page_num)]["rendered"] = True
+        self._changed(len(page_nums))
+
+    def reusable_slices(self, images_dir: Path, pages: Iterable[int]) -> Set[int]:
+        """已渲染且切片文件仍在的页面，可直接沿用而无需重新渲染"""
+        return {
+            page_num for page_num in pages
+            if self.is_rendered(page_num) and (Path(images_dir) / f"{page_num}.png").exists()
+        }
+
+    def track_rendered(self, page_source: Iterable[Tuple]):
+        """包装页面来源：切片写入磁盘的页面即时记入清单（文字层页面看其 image 属性；附带的页面指纹原样传递）"""
+        for page_num, item, *extra in page_source:
+            image = getattr(item, "image", item)
+            if isinstance(image, Path) and not self.is_rendered(page_num):
+                self.mark_rendered([page_num])
+            yield (page_num, item, *extra)
+
+    def mark_page(self, page_num: int, record: Dict):
+        """记录单页解析结果（record 为 AIParser._save_page_result 的返回值）"""
+        with self.lock:
+            page = self.data["pages"][str(page_num)]
+            page["status"] = "success" if record['success'] else "failed"
+            page["attempts"] = record.get('attempts', 0)
+            page["updated_at"] = time.time()
+            if record.get('text_layer'):
+                page["route"] = record['text_layer']['route']
+            # 空白页/重复页的过滤判定（单页结果中不含标记）
+            if record.get('page_filter'):
+                page["filter"] = record['page_filter']['action']
+            else:
+                page.pop("filter", None)
+            if record['success']:
+                page.pop("error", None)
+            else:
+                page["error"] = record.get('error', "")
+        self._changed()
+
+    def forget_missing(self, stored: Set[int]) -> int:
+        """标记为成功、但结果存储中找不到的页面（结果写入前进程中断）改回待解析，返回改回的页数（空白页本就没有结果）"""
+        with self.lock:
+            missing = [
+                page for page_num, page in self.data["pages"].items()
+                if page.get("status") == "success" and page.get("filter") != "blank" and int(page_num) not in stored
+            ]
+            for page in missing:
+                page.pop("status")
+        if missing:
+            self.save()
+        return len(missing)
+
+    def pending_pages(self) -> List[int]:
+        """尚未成功解析的页面（缺失或失败）"""
+        with self.lock:
+            return [
+                int(page_num) for page_num, page in self.data["pages"].items()
+                if page.get("status") != "success"
+            ]
+
+    def counts(self) -> Dict[str, int]:
+        """文档整体的页面状态计数"""
+        with self.lock:
+            statuses = [page.get("status") for page in self.data["pages"].values()]
+        return {
+            'success': statuses.count("success"),
+            'failed': statuses.count("failed"),
+            'pending': sum(1 for status in statuses if status is None)
+        }
+
+    def summary_section(self, processed: int) -> Dict:
+        """汇总报告中的断点续传信息（文档整体状态）"""
+        counts = self.counts()
+        return {
+            '文档总页数': self.total_pages,
+            '本次处理页数': processed,
+            '沿用已完成页数': self.total_pages - processed,
+            '文档累计成功': counts['success'],
+            '文档累计失败': counts['failed'],
+            '尚未处理': counts['pending']
+        }
@@ -4,117 +4,33 @@ PDF智能解析工具 - 主应用
 
 import streamlit as st
 import os
-import time
+import re
+import copy
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
-import base64
 from PIL import Image
-import io
-
-# 尝试导入PyMuPDF
-try:
-    import fitz  # PyMuPDF - 纯Python库，无需系统依赖
-except ImportError:
-    fitz = None
+import threading
 
 # 导入自定义模块
 from config import (
     UI_CONFIG, FILE_CONFIG, CONCURRENCY_CONFIG, OUTPUT_CONFIG, 
-    PRESET_PROMPTS, ERROR_MESSAGES, SUCCESS_MESSAGES, ARK_API_CONFIG
+    PRESET_PROMPTS, ERROR_MESSAGES, SUCCESS_MESSAGES, ARK_API_CONFIG, RENDER_CONFIG,
+    ADAPTIVE_CONFIG, SCHEDULE_POLICIES, RESOLUTION_CONFIG, UPLOAD_CONFIG, UPLOAD_FORMATS,
+    PAGE_FILTER_CONFIG, TEXT_LAYER_CONFIG, TEXT_LAYER_MODES, PACK_CONFIG,
+    PROMPT_LAYOUT_CONFIG, PROMPT_LAYOUTS, STREAM_CONFIG,
+    VALIDATION_CONFIG, RESULT_STORE_CONFIG, RESULT_STORE_FORMATS, TAG_SEARCH_MODES
+)
+from parse_cache import get_parse_cache
+from metrics import start_metrics_server
+from job_manifest import JobManifest, hash_bytes, hash_file
+from result_store import stored_pages, read_page
+from tag_index import get_tag_index, describe_total
+from pdf_processor import PDFProcessor
+from utils import (
+    AIParser, DocumentJob, FileManager, ImageBatchParser, ProgressTracker, normalize_image_bytes,
+    validate_api_key, format_file_size, resolution_pixel_budget
 )
-from utils import AIParser, FileManager, ProgressTracker, validate_api_key, format_file_size
-
-# 定义新的PDF处理器类（使用PyMuPDF，无需系统依赖）
-class PDFProcessor:
-    """PDF处理器 - 使用PyMuPDF（纯Python实现）"""
-    
-    def __init__(self, dpi: int = 200):
-        if fitz is None:
-            st.error("❌ 缺少PyMuPDF库！请确保requirements.txt包含PyMuPDF>=1.23.0")
-            st.stop()
-        self.dpi = dpi
-    
-    def split_pdf_to_images(self, pdf_path: Path, output_dir: Path, progress_callback=None, status_callback=None):
-        """将PDF拆分为图片，支持进度回调"""
-        try:
-            # 打开PDF文件
-            if status_callback:
-                status_callback("📊 正在打开PDF文件...")
-            
-            pdf_document = fitz.open(str(pdf_path))
-            total_pages = len(pdf_document)
-            
-            if status_callback:
-                status_callback(f"📄 PDF共有 {total_pages} 页，开始转换...")
-            
-            saved_images = []
-            
-            # 计算缩放比例（PyMuPDF默认是72 DPI）
-            zoom = self.dpi / 72.0
-            mat = fitz.Matrix(zoom, zoom)
-            
-            # 处理每一页
-            for page_num in range(total_pages):
-                if status_callback:
-                    status_callback(f"🔄 转换第 {page_num + 1}/{total_pages} 页...")
-                
-                # 获取页面
-                page = pdf_document[page_num]
-                
-                # 渲染页面为图片
-                pix = page.get_pixmap(matrix=mat)
-                
-                # 转换为PIL Image
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # 释放pixmap内存
-                pix = None
-                
-                # 保存图片
-                image_path = output_dir / f"{page_num + 1}.png"
-                img.save(image_path, "PNG", optimize=True, compress_level=6)
-                saved_images.append(image_path)
-                
-                # 释放图片内存
-                img.close()
-                
-                # 更新进度
-                if progress_callback:
-                    progress = (page_num + 1) / total_pages
-                    progress_callback(progress)
-                
-                if status_callback:
-                    status_callback(f"💾 已保存第 {page_num + 1}/{total_pages} 页")
-            
-            # 关闭PDF文档
-            pdf_document.close()
-            
-            if status_callback:
-                status_callback(f"✅ 完成！共转换 {len(saved_images)} 页")
-            
-            return saved_images
-            
-        except Exception as e:
-            if status_callback:
-                status_callback(f"❌ 转换失败: {str(e)}")
-            st.error(f"PDF拆分失败: {str(e)}")
-            return []
-    
-    def get_pdf_info(self, pdf_path: Path) -> dict:
-        """获取PDF信息"""
-        try:
-            pdf_document = fitz.open(str(pdf_path))
-            info = {
-                'pages': len(pdf_document),
-                'file_size': pdf_path.stat().st_size,
-                'created_time': datetime.fromtimestamp(pdf_path.stat().st_ctime)
-            }
-            pdf_document.close()
-            return info
-        except Exception as e:
-            return {'error': str(e)}
 
 # 图片处理工具类
 class ImageProcessor:
@@ -133,75 +49,14 @@ class ImageProcessor:
             tuple: (processed_image_bytes, file_info)
         """
         try:
-            # 获取原始文件信息
-            original_size = len(uploaded_file.getvalue())
-            original_size_mb = original_size / (1024 * 1024)
-            
-            # 打开图片
-            image = Image.open(uploaded_file)
-            
-            # 转换为RGB模式（确保兼容性）
-            if image.mode in ['RGBA', 'P']:
-                # 创建白色背景
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # 文件信息
-            file_info = {
-                'original_size_mb': round(original_size_mb, 2),
-                'original_dimensions': image.size,
-                'format': uploaded_file.name.split('.')[-1].upper(),
-                'compressed': False,
-                'compression_ratio': 1.0
-            }
-            
-            # 如果文件太大，进行压缩
-            if original_size_mb > max_size_mb:
-                st.warning(f"📦 文件大小 {original_size_mb:.1f}MB 超过限制，正在自动压缩...")
-                
-                # 计算压缩比例
-                target_ratio = max_size_mb / original_size_mb
-                scale_factor = min(0.8, target_ratio ** 0.5)  # 保守压缩
-                
-                # 调整尺寸
-                new_width = int(image.size[0] * scale_factor)
-                new_height = int(image.size[1] * scale_factor)
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                file_info.update({
-                    'compressed': True,
-                    'new_dimensions': image.size,
-                    'scale_factor': round(scale_factor, 3)
-                })
-            
-            # 转换为PNG字节流
-            img_byte_arr = io.BytesIO()
-            
-            # 根据压缩需求调整质量
-            if original_size_mb > max_size_mb:
-                # 使用更高压缩
-                image.save(img_byte_arr, format='PNG', optimize=True, compress_level=9)
-            else:
-                # 标准压缩
-                image.save(img_byte_arr, format='PNG', optimize=True, compress_level=6)
-            
-            processed_bytes = img_byte_arr.getvalue()
-            processed_size_mb = len(processed_bytes) / (1024 * 1024)
-            
-            # 更新文件信息
-            file_info.update({
-                'processed_size_mb': round(processed_size_mb, 2),
-                'compression_ratio': round(original_size_mb / processed_size_mb, 2) if processed_size_mb > 0 else 1.0
-            })
+            processed_bytes, file_info = normalize_image_bytes(uploaded_file.getvalue(), max_size_mb)
             
             # 显示压缩信息
             if file_info['compressed']:
-                st.success(f"✅ 压缩完成：{original_size_mb:.1f}MB → {processed_size_mb:.1f}MB (压缩率: {file_info['compression_ratio']:.1f}x)")
+                st.success(
+                    f"✅ 文件超过 {max_size_mb}MB，已自动压缩：{file_info['original_size_mb']:.1f}MB → "
+                    f"{file_info['processed_size_mb']:.1f}MB (压缩率: {file_info['compression_ratio']:.1f}x)"
+                )
             
             return processed_bytes, file_info
             
@@ -228,12 +83,7 @@ def init_session_state():
         'processing': False,
         # 图片解析相关状态
         'image_results': {},
-        'batch_parsing': False,
-        'batch_progress': 0,
-        'batch_status': '',
-        'batch_total': 0,
-        'batch_completed': 0,
-        'batch_current_file': ''
+        'image_batch': None     # 后台批量解析任务（ImageBatchParser）
     }
     
     for key, value in defaults.items():
@@ -396,23 +246,191 @@ def render_sidebar():
         
         # 性能设置
         st.subheader("⚡ 性能设置")
-        max_workers = st.slider(
-            "并发客户端数",
+        engine_options = {"thread": "线程池", "async": "异步（asyncio）"}
+        engine = st.radio(
+            "解析引擎",
+            options=list(engine_options),
+            index=list(engine_options).index(CONCURRENCY_CONFIG["engine"]),
+            format_func=engine_options.get,
+            horizontal=True,
+            help="异步引擎在单个事件循环中发起请求，在途请求数不受线程数限制"
+        )
+        
+        if engine == "async":
+            max_workers = st.slider(
+                "并发请求数",
+                min_value=1,
+                max_value=CONCURRENCY_CONFIG["max_async_concurrency"],
+                value=CONCURRENCY_CONFIG["default_async_concurrency"],
+                help="同时在途的API请求数量"
+            )
+        else:
+            max_workers = st.slider(
+                "并发客户端数",
+                min_value=1,
+                max_value=CONCURRENCY_CONFIG["max_workers"],
+                value=CONCURRENCY_CONFIG["default_workers"],
+                help="同时处理的页面数量"
+            )
+        
+        render_workers = st.slider(
+            "渲染进程数",
             min_value=1,
-            max_value=CONCURRENCY_CONFIG["max_workers"],
-            value=CONCURRENCY_CONFIG["default_workers"],
-            help="同时处理的页面数量"
+            max_value=CONCURRENCY_CONFIG["max_render_workers"],
+            value=min(CONCURRENCY_CONFIG["default_render_workers"], CONCURRENCY_CONFIG["max_render_workers"]),
+            help="PDF转图片时使用的进程数，多核机器上可显著加快高DPI渲染"
+        ) if CONCURRENCY_CONFIG["max_render_workers"] > 1 else 1
+        
+        pipeline = st.checkbox(
+            "流水线模式（边拆分边解析）",
+            value=CONCURRENCY_CONFIG["pipeline_enabled"],
+            help="每渲染完一页立即送入解析队列，总耗时接近渲染与解析中较慢的一方"
+        )
+        
+        in_memory = st.checkbox(
+            "内存直传（不读写切片文件）",
+            value=RENDER_CONFIG["in_memory"],
+            help="页面渲染后直接在内存中送往AI解析，省去切片图片的写入和回读；需配合流水线模式"
+        )
+        persist_slices = st.checkbox(
+            "解析后异步保存切片",
+            value=RENDER_CONFIG["persist_slices"],
+            disabled=not in_memory,
+            help="请求发出后由后台线程把图片写入slice-pics；不需要保留切片时可关闭"
+        )
+        
+        schedule_policy = st.selectbox(
+            "多文件调度",
+            options=list(SCHEDULE_POLICIES),
+            index=list(SCHEDULE_POLICIES).index(CONCURRENCY_CONFIG["schedule_policy"]),
+            format_func=SCHEDULE_POLICIES.get,
+            disabled=not (pipeline or in_memory),
+            help="流水线模式下所有文件的页面共用一个解析队列；短文档优先或轮流入队可让小文件尽早完成"
+        )
+        
+        adaptive = st.checkbox(
+            "自适应并发（AIMD）",
+            value=ADAPTIVE_CONFIG["enabled"],
+            help="以上述并发数为上限，遇到限流/超时自动减半在途请求数，请求顺畅时逐步增加"
+        )
+        
+        bypass_cache = st.checkbox(
+            "跳过缓存（强制重新解析）",
+            value=False,
+            help="不读取已缓存的解析结果，重新调用API（新结果仍会写入缓存）"
+        )
+        
+        page_filter = st.checkbox(
+            "跳过空白页与重复页",
+            value=PAGE_FILTER_CONFIG["enabled"],
+            help="默认关闭。开启后解析前检测空白分隔页（直接跳过，不生成单页结果）和同一文档中重复出现的页面"
+                 "（复制首次出现页面的结果），不再为它们调用API；判定记录在结果目录的 page_filter.json 中"
         )
         
         # 高级设置
         with st.expander("🔧 高级设置"):
+            resolution_mode = st.radio(
+                "分辨率模式",
+                options=["fixed", "auto"],
+                index=["fixed", "auto"].index(RESOLUTION_CONFIG["mode"]),
+                format_func=lambda mode: {"fixed": "固定DPI", "auto": "自动（按像素预算）"}[mode],
+                horizontal=True,
+                help="自动模式按页面尺寸为每页计算DPI：小页面保留细节（不超过下方DPI），"
+                     "大幅图纸缩小到像素预算以内，不再上传模型反正会缩小的超大图片"
+            )
+            
             dpi = st.slider(
                 "PDF转图片DPI",
                 min_value=FILE_CONFIG["min_dpi"],
                 max_value=FILE_CONFIG["max_dpi"],
                 value=FILE_CONFIG["default_dpi"],
                 step=50,
-                help="DPI越高，图片质量越好，但文件越大"
+                help="DPI越高，图片质量越好，但文件越大（自动模式下为最高DPI）"
+            )
+            
+            max_megapixels = st.number_input(
+                "每页最大像素（百万）",
+                min_value=0.5,
+                max_value=20.0,
+                value=RESOLUTION_CONFIG["max_pixels"] / 1_000_000,
+                step=0.5,
+                disabled=resolution_mode != "auto",
+                help="自动模式下每页渲染图片的像素上限；配置了图像token上限时取两者中较小的一个"
+            )
+            
+            text_layer = st.selectbox(
+                "PDF文字层",
+                options=list(TEXT_LAYER_MODES),
+                index=list(TEXT_LAYER_MODES).index(TEXT_LAYER_CONFIG["mode"]),
+                format_func=TEXT_LAYER_MODES.get,
+                help="原生电子PDF可直接提取文字：自动模式下文字为主的页面只发送文字（不渲染、请求更小更快），"
+                     "图文混排页面发送较低DPI的图片并附带文字，扫描件和纯图片页仍按图片发送"
+            )
+            
+            fast_png = st.checkbox(
+                "快速PNG编码",
+                value=False,
+                help="使用更低的PNG压缩级别，渲染更快但图片文件略大"
+            )
+            
+            upload_format = st.selectbox(
+                "上传编码",
+                options=list(UPLOAD_FORMATS.keys()),
+                index=list(UPLOAD_FORMATS.keys()).index(UPLOAD_CONFIG["format"]),
+                format_func=lambda fmt: UPLOAD_FORMATS[fmt],
+                help="发送给模型的图片格式（切片文件仍保存为PNG）。扫描件和照片页用JPEG/WebP可缩小数倍，"
+                     "自动模式只对照片类页面有损压缩，线稿和文字保持无损"
+            )
+            
+            upload_quality = st.slider(
+                "有损压缩质量",
+                min_value=50,
+                max_value=100,
+                value=UPLOAD_CONFIG["quality"],
+                step=5,
+                disabled=upload_format == "png",
+                help="JPEG/WebP编码质量，越高越清晰、文件越大"
+            )
+            
+            pack_size = st.slider(
+                "每个请求合并页数",
+                min_value=1,
+                max_value=PACK_CONFIG["max_pack_size"],
+                value=PACK_CONFIG["pack_size"],
+                help="多个页面放进同一个请求，较长的提示词只发送一次，节省提示词token与预填充时间；"
+                     "模型返回的结果无法按页拆分时，这些页面自动改为逐页请求。1 表示不合并"
+            )
+            
+            prompt_layout = st.selectbox(
+                "消息布局",
+                options=list(PROMPT_LAYOUTS),
+                index=list(PROMPT_LAYOUTS).index(PROMPT_LAYOUT_CONFIG["layout"]),
+                format_func=PROMPT_LAYOUTS.get,
+                help="系统消息布局把提示词固定放在每个请求的最前面，各页请求前缀相同，可命中服务端的提示词缓存，"
+                     "降低输入token费用与首字延迟；汇总报告“Token用量”记录命中缓存的token数"
+            )
+            
+            stream = st.checkbox(
+                "流式接收",
+                value=STREAM_CONFIG["enabled"],
+                help="边接收边检查JSON，完整的JSON到达即断开，不再等待模型后续的多余文字；"
+                     "迟迟不出现JSON或输出超长时提前截断并重试。汇总报告“性能指标”记录首字延迟"
+            )
+            
+            validate = st.checkbox(
+                "校验并修复JSON结果",
+                value=VALIDATION_CONFIG["enabled"],
+                help="按预设模板的键结构校验每页结果，代码块标记、多余文字、未转义引号等在本地修复；"
+                     "修复不了的页面单独重新请求，仍不合格的记为失败，不会写入无效的JSON文件"
+            )
+            
+            result_store = st.selectbox(
+                "结果存储",
+                options=list(RESULT_STORE_FORMATS),
+                index=list(RESULT_STORE_FORMATS).index(RESULT_STORE_CONFIG["format"]),
+                format_func=RESULT_STORE_FORMATS.get,
+                help="合并存储把每个文档的全部页面结果追加写入 summaries/results.jsonl（附偏移索引），"
+                     "不再产生成千上万个小文件，适合页数很多或结果目录位于网络存储的情况"
             )
             
             timeout = st.number_input(
@@ -423,6 +441,18 @@ def render_sidebar():
                 help="单个API调用的超时时间"
             )
             
+            # 解析缓存
+            parse_cache = get_parse_cache()
+            if parse_cache is not None:
+                cache_stats = parse_cache.stats()
+                st.caption(
+                    f"🗄️ 解析缓存: {cache_stats['entries']} 条 / {cache_stats['size_mb']}MB，"
+                    f"命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次（命中率 {cache_stats['hit_rate']}）"
+                )
+                if st.button("🧹 清空解析缓存"):
+                    parse_cache.clear()
+                    st.success("✅ 已清空解析缓存")
+            
             # 显示系统信息
             if st.button("🖥️ 系统信息"):
                 try:
@@ -432,7 +462,31 @@ def render_sidebar():
                 except Exception as e:
                     st.error(f"获取系统信息失败: {str(e)}")
     
-    return api_key, max_workers, dpi, timeout
+    # 性能选项（流水线等）
+    perf_options = {
+        'engine': engine,
+        'adaptive': adaptive,
+        'schedule_policy': schedule_policy,
+        'bypass_cache': bypass_cache,
+        'page_filter': page_filter,
+        'pipeline': pipeline or in_memory,
+        'in_memory': in_memory,
+        'persist_slices': persist_slices,
+        'render_workers': render_workers,
+        'compress_level': RENDER_CONFIG["fast_png_compress_level"] if fast_png else RENDER_CONFIG["png_compress_level"],
+        'queue_size': CONCURRENCY_CONFIG["pipeline_queue_size"] or None,
+        'max_pixels': resolution_pixel_budget(int(max_megapixels * 1_000_000)) if resolution_mode == "auto" else None,
+        'upload_format': upload_format,
+        'upload_quality': upload_quality,
+        'text_layer': text_layer,
+        'pack_size': pack_size,
+        'prompt_layout': prompt_layout,
+        'stream': stream,
+        'validate': validate,
+        'result_store': result_store
+    }
+    
+    return api_key, max_workers, dpi, timeout, perf_options
 
 # 文件上传区域
 def render_file_upload():
@@ -510,9 +564,424 @@ def render_ai_settings():
     
     return prompt
 
+# 创建AI解析器
+def create_ai_parser(api_key, timeout, perf_options):
+    """按性能选项创建AI解析器（缓存、上传编码、页面过滤、合并请求与消息布局设置）"""
+    return AIParser(
+        api_key=api_key,
+        timeout=timeout,
+        bypass_cache=perf_options.get('bypass_cache', False),
+        upload_format=perf_options.get('upload_format'),
+        upload_quality=perf_options.get('upload_quality'),
+        page_filter=perf_options.get('page_filter'),
+        pack_size=perf_options.get('pack_size'),
+        prompt_layout=perf_options.get('prompt_layout'),
+        stream=perf_options.get('stream'),
+        validate=perf_options.get('validate'),
+        result_store=perf_options.get('result_store')
+    )
+
+# 创建PDF处理器
+def create_pdf_processor(dpi, perf_options):
+    """按性能选项创建PDF处理器；缺少PyMuPDF时提示并停止运行"""
+    try:
+        return PDFProcessor(
+            dpi=dpi,
+            render_workers=perf_options.get('render_workers', 1),
+            compress_level=perf_options.get('compress_level'),
+            max_pixels=perf_options.get('max_pixels'),
+            text_layer=perf_options.get('text_layer')
+        )
+    except ImportError as e:
+        st.error(f"❌ {str(e)}")
+        st.stop()
+
+# 先拆分后解析（原有流程）
+def run_split_then_parse(pdf_processor, ai_parser, pdf_path, dirs, prompt, max_workers, engine="thread",
+                         adaptive=False, pages=None, manifest=None):
+    """拆分完成后再批量解析，拆分失败时返回None（pages 指定只处理其中的页码）"""
+    # 拆分PDF为图片
+    st.info("✂️ 拆分PDF页面...")
+    split_progress = st.progress(0)
+    split_status = st.empty()
+    
+    # 定义PDF拆分的回调函数
+    def split_progress_callback(progress):
+        split_progress.progress(progress)
+    
+    def split_status_callback(status):
+        split_status.text(status)
+    
+    images = pdf_processor.split_pdf_to_images(
+        pdf_path, 
+        dirs['images'],
+        progress_callback=split_progress_callback,
+        status_callback=split_status_callback,
+        pages=pages,
+        reuse_pages=manifest.reusable_slices(dirs['images'], pages) if manifest and pages else None
+    )
+    
+    split_progress.progress(1.0)
+    split_status.text("✅ PDF拆分完成")
+    
+    if not images:
+        return None
+    
+    page_numbers = sorted(pages) if pages else None
+    if manifest:
+        manifest.mark_rendered(page_numbers or range(1, len(images) + 1))
+    
+    st.success(f"✅ 拆分完成！共 {len(images)} 页")
+    
+    # AI解析
+    st.info("🤖 AI解析中...")
+    parse_progress = st.progress(0)
+    parse_status = st.empty()
+    
+    # 定义回调函数
+    def progress_callback(progress):
+        parse_progress.progress(progress)
+    
+    def status_callback(status):
+        parse_status.text(status)
+    
+    try:
+        # 执行AI解析
+        result = ai_parser.parse_images_batch(
+            images,
+            dirs['summaries'],
+            prompt,
+            max_workers,
+            progress_callback,
+            status_callback,
+            engine=engine,
+            adaptive=adaptive,
+            page_numbers=page_numbers,
+            manifest=manifest
+        )
+        
+        # 确保进度条显示完成
+        parse_progress.progress(1.0)
+        parse_status.text("✅ AI解析完成")
+        
+    except Exception as e:
+        parse_progress.progress(0.0)
+        parse_status.text(f"❌ AI解析失败: {str(e)}")
+        st.error(f"AI解析错误: {str(e)}")
+        
+        # 创建失败结果
+        result = {
+            'total_pages': len(images),
+            'successful': 0,
+            'failed': len(images),
+            'results': {}
+        }
+    
+    return result
+
+# 流水线：创建单个文档的解析任务
+def build_pipeline_job(pdf_processor, pdf_path, dirs, pages, manifest=None, in_memory=False, persist_slices=True,
+                       page_filter=False):
+    """创建文档的进度组件，以逐页渲染结果作为页面来源构建解析任务，返回 (任务, 进度组件)
+    
+    page_filter=True 时渲染时顺带计算页面过滤所需的指纹。
+    """
+    st.info(f"✂️🤖 流水线处理中（共 {len(pages)} 页，边拆分边解析）...")
+    widgets = {
+        'split_progress': st.progress(0),
+        'split_status': st.empty(),
+        'parse_progress': st.progress(0),
+        'parse_status': st.empty()
+    }
+    
+    def split_progress_callback(progress):
+        widgets['split_progress'].progress(progress)
+    
+    def split_status_callback(status):
+        widgets['split_status'].text(status)
+    
+    def progress_callback(progress):
+        widgets['parse_progress'].progress(progress)
+    
+    def status_callback(status):
+        widgets['parse_status'].text(status)
+    
+    page_source = pdf_processor.iter_pdf_images(
+        pdf_path,
+        dirs['images'],
+        progress_callback=split_progress_callback,
+        status_callback=split_status_callback,
+        in_memory=in_memory,
+        pages=pages,
+        reuse_pages=manifest.reusable_slices(dirs['images'], pages) if manifest else None,
+        with_fingerprint=page_filter
+    )
+    if manifest:
+        page_source = manifest.track_rendered(page_source)
+    
+    job = DocumentJob(
+        pdf_path.name,
+        page_source,
+        pages,
+        dirs['summaries'],
+        manifest=manifest,
+        persist_dir=dirs['images'] if in_memory and persist_slices else None,
+        progress_callback=progress_callback,
+        status_callback=status_callback
+    )
+    return job, widgets
+
+def show_pipeline_result(widgets, result):
+    """流水线结束后在进度组件中显示各阶段统计"""
+    widgets['split_progress'].progress(1.0)
+    widgets['parse_progress'].progress(1.0)
+    
+    stats = result['pipeline_stats']
+    widgets['split_status'].text(f"✅ PDF拆分完成（等待队列 {stats['渲染等待队列(秒)']}s）")
+    widgets['parse_status'].text(
+        f"✅ AI解析完成（线程平均空闲 {stats['解析线程平均空闲(秒)']}s，"
+        f"最大队列深度 {stats['最大队列深度']}/{stats['队列容量']}，瓶颈: {stats['瓶颈阶段']}）"
+    )
+
+def show_pipeline_error(widgets, error):
+    """流水线异常时在进度组件中显示错误"""
+    widgets['parse_progress'].progress(0.0)
+    widgets['parse_status'].text(f"❌ AI解析失败: {error}")
+    st.error(f"AI解析错误: {error}")
+
+# 流水线：边拆分边解析
+def run_pipeline(pdf_processor, ai_parser, pdf_path, dirs, prompt, max_workers, queue_size=None,
+                 in_memory=False, persist_slices=True, engine="thread", adaptive=False, pages=None, manifest=None):
+    """渲染与解析并行进行，拆分失败时返回None（pages 指定只处理其中的页码）"""
+    if pages is None:
+        info = pdf_processor.get_pdf_info(pdf_path)
+        if 'error' in info or info['pages'] == 0:
+            return None
+        pages = list(range(1, info['pages'] + 1))
+    total_pages = len(pages)
+    
+    job, widgets = build_pipeline_job(pdf_processor, pdf_path, dirs, pages, manifest, in_memory, persist_slices,
+                                      ai_parser.page_filter)
+    try:
+        result = ai_parser.parse_documents(
+            [job], prompt, max_workers, queue_size=queue_size, engine=engine, adaptive=adaptive
+        )[0]
+        show_pipeline_result(widgets, result)
+        
+    except Exception as e:
+        show_pipeline_error(widgets, str(e))
+        
+        result = {
+            'total_pages': total_pages,
+            'successful': 0,
+            'failed': total_pages,
+            'results': {}
+        }
+    
+    return result
+
+# 保存原始PDF
+def save_source_pdf(uploaded_file, dirs):
+    """保存上传的PDF（与上次处理的文件相同时沿用），返回 (PDF路径, PDF哈希)；保存失败时返回None"""
+    pdf_path = dirs['pdf'] / uploaded_file.name
+    pdf_hash = hash_bytes(uploaded_file.getvalue())
+    previous = JobManifest.load(dirs['base'])
+    if pdf_path.exists() and previous is not None and previous.pdf_hash == pdf_hash:
+        st.info("💾 原始PDF未变化，沿用已保存的文件")
+    else:
+        st.info("💾 保存原始PDF...")
+        if not FileManager.save_uploaded_file(uploaded_file, pdf_path):
+            return None
+    return pdf_path, pdf_hash
+
+# 断点续传：准备文档
+def prepare_document(pdf_processor, ai_parser, pdf_path, dirs, prompt, pdf_hash):
+    """打开文档的任务清单，返回 (清单, 待处理页码)；无法读取PDF时返回None"""
+    info = pdf_processor.get_pdf_info(pdf_path)
+    if 'error' in info or info['pages'] == 0:
+        return None
+    total_pages = info['pages']
+    
+    manifest = JobManifest.open(
+        dirs['base'], pdf_path.name, pdf_hash, prompt, ai_parser.model, pdf_processor.dpi, total_pages,
+        max_pixels=pdf_processor.max_pixels, text_layer=pdf_processor.text_layer
+    )
+    if ai_parser.result_store == "jsonl":
+        manifest.forget_missing(stored_pages(dirs['summaries']))
+    pages = manifest.pending_pages()
+    skipped = total_pages - len(pages)
+    
+    if not pages:
+        st.success(f"⏩ 全部 {total_pages} 页此前已解析完成，无需重新处理")
+    elif skipped:
+        st.info(f"⏩ 断点续传：沿用已完成的 {skipped} 页，本次处理 {len(pages)} 页")
+    return manifest, pages
+
+def document_result(manifest, pages):
+    """文档整体结果（含此前已完成的页面）"""
+    counts = manifest.counts()
+    return {
+        'total_pages': manifest.total_pages,
+        'successful': counts['success'],
+        'failed': manifest.total_pages - counts['success'],
+        'skipped': manifest.total_pages - len(pages)
+    }
+
+# 处理单个文档（断点续传）
+def process_document(pdf_processor, ai_parser, pdf_path, dirs, prompt, max_workers, perf_options, pdf_hash):
+    """按任务清单只渲染和解析缺失或失败的页面，返回文档整体结果；拆分失败时返回None"""
+    prepared = prepare_document(pdf_processor, ai_parser, pdf_path, dirs, prompt, pdf_hash)
+    if prepared is None:
+        return None
+    manifest, pages = prepared
+    
+    if pages:
+        if perf_options.get('pipeline'):
+            result = run_pipeline(
+                pdf_processor, ai_parser, pdf_path, dirs, prompt, max_workers,
+                queue_size=perf_options.get('queue_size'),
+                in_memory=perf_options.get('in_memory', False),
+                persist_slices=perf_options.get('persist_slices', True),
+                engine=perf_options.get('engine', "thread"),
+                adaptive=perf_options.get('adaptive', False),
+                pages=pages,
+                manifest=manifest
+            )
+        else:
+            result = run_split_then_parse(
+                pdf_processor, ai_parser, pdf_path, dirs, prompt, max_workers,
+                engine=perf_options.get('engine', "thread"),
+                adaptive=perf_options.get('adaptive', False),
+                pages=pages,
+                manifest=manifest
+            )
+        if result is None:
+            return None
+    
+    return document_result(manifest, pages)
+
+# 记录单个文件的处理结果
+def record_file_result(name, result, dirs, processed_files):
+    """写入处理历史并显示文件完成状态"""
+    file_info = {
+        'name': name,
+        'pages': result['total_pages'],
+        'successful': result['successful'],
+        'failed': result['failed'],
+        'skipped': result['skipped'],
+        'success_rate': f"{(result['successful']/result['total_pages']*100 if result['total_pages'] else 0):.1f}%",
+        'output_dir': str(dirs['base']),
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    processed_files.append(file_info)
+    st.session_state.processed_files.append(file_info)
+    
+    # 显示处理结果
+    if result['failed'] == 0:
+        st.success(f"🎉 {name} 处理完成！")
+    else:
+        st.warning(f"⚠️ {name} 处理完成，但有 {result['failed']} 页失败")
+
+# 多文件：全局页面调度
+def run_scheduled_batch(files, pdf_processor, ai_parser, prompt, max_workers, perf_options,
+                        detail_container, total_progress, overall_status, processed_files):
+    """所有文件的待处理页面进入同一个解析队列，解析线程在文件之间不留空档"""
+    policy = perf_options.get('schedule_policy', CONCURRENCY_CONFIG["schedule_policy"])
+    if policy == "round_robin" and pdf_processor.render_workers > 1:
+        # 轮流入队时多个文档同时处于渲染中，各开一个进程池会成倍占用CPU，改为每个文档单进程渲染
+        # 复制原处理器只改渲染进程数，其余选项（文字层、自动分辨率等）保持不变
+        pdf_processor = copy.copy(pdf_processor)
+        pdf_processor.render_workers = 1
+    
+    total_files = len(files)
+    entries = []
+    finished = {'count': 0}
+    finished_lock = threading.Lock()
+    
+    def mark_finished(name):
+        with finished_lock:
+            finished['count'] += 1
+            total_progress.progress(finished['count'] / total_files)
+            overall_status.text(f"已完成 {finished['count']}/{total_files} 个文件（最近完成: {name}）")
+    
+    # 第一阶段：逐个保存PDF、打开任务清单并创建进度组件
+    overall_status.text(f"准备中: 共 {total_files} 个文件（调度策略: {SCHEDULE_POLICIES.get(policy, policy)}）")
+    for uploaded_file in files:
+        with detail_container:
+            file_container = st.container()
+        
+        with file_container:
+            st.subheader(f"📄 处理文件: {uploaded_file.name}")
+            
+            try:
+                base_output_dir = Path(st.session_state.output_dir)
+                dirs = FileManager.create_directory_structure(base_output_dir, uploaded_file.name)
+                saved = save_source_pdf(uploaded_file, dirs)
+                if saved is None:
+                    continue
+                pdf_path, pdf_hash = saved
+                
+                prepared = prepare_document(pdf_processor, ai_parser, pdf_path, dirs, prompt, pdf_hash)
+                if prepared is None:
+                    st.error(f"❌ {uploaded_file.name} 拆分失败")
+                    continue
+                manifest, pages = prepared
+                
+                entry = {
+                    'name': uploaded_file.name, 'container': file_container, 'dirs': dirs,
+                    'manifest': manifest, 'pages': pages, 'job': None, 'widgets': None
+                }
+                if pages:
+                    entry['job'], entry['widgets'] = build_pipeline_job(
+                        pdf_processor, pdf_path, dirs, pages, manifest,
+                        in_memory=perf_options.get('in_memory', False),
+                        persist_slices=perf_options.get('persist_slices', True),
+                        page_filter=ai_parser.page_filter
+                    )
+                    entry['job'].on_complete = lambda result, name=uploaded_file.name: mark_finished(name)
+                else:
+                    mark_finished(uploaded_file.name)
+                entries.append(entry)
+                
+            except Exception as e:
+                st.error(f"❌ 处理 {uploaded_file.name} 时出错: {str(e)}")
+    
+    # 第二阶段：所有文档共用一个页面队列和一组解析线程
+    jobs = [entry['job'] for entry in entries if entry['job'] is not None]
+    batch_error = None
+    if jobs:
+        overall_status.text(
+            f"处理中: {len(jobs)} 个文件共 {sum(job.total_pages for job in jobs)} 页（调度策略: {SCHEDULE_POLICIES.get(policy, policy)}）"
+        )
+        try:
+            ai_parser.parse_documents(
+                jobs, prompt, max_workers,
+                policy=policy,
+                queue_size=perf_options.get('queue_size'),
+                engine=perf_options.get('engine', "thread"),
+                adaptive=perf_options.get('adaptive', False)
+            )
+        except Exception as e:
+            batch_error = str(e)
+    
+    # 第三阶段：逐个文件显示统计并记录结果
+    for entry in entries:
+        with entry['container']:
+            job = entry['job']
+            if job is not None:
+                if job.result is not None:
+                    show_pipeline_result(entry['widgets'], job.result)
+                else:
+                    show_pipeline_error(entry['widgets'], batch_error or "解析未完成")
+            record_file_result(entry['name'], document_result(entry['manifest'], entry['pages']), entry['dirs'], processed_files)
+            st.markdown("---")
+
 # 处理PDF文件
-def process_pdfs(files, prompt, api_key, max_workers, dpi, timeout):
+def process_pdfs(files, prompt, api_key, max_workers, dpi, timeout, perf_options=None):
     """处理PDF文件的主函数"""
+    perf_options = perf_options or {}
+    
     if not validate_api_key(api_key):
         st.error(ERROR_MESSAGES["no_api_key"])
         return
@@ -521,8 +990,8 @@ def process_pdfs(files, prompt, api_key, max_workers, dpi, timeout):
     st.session_state.processing = True
     
     # 创建处理器
-    pdf_processor = PDFProcessor(dpi=dpi)
-    ai_parser = AIParser(api_key=api_key, timeout=timeout)
+    pdf_processor = create_pdf_processor(dpi, perf_options)
+    ai_parser = create_ai_parser(api_key, timeout, perf_options)
     
     # 创建进度容器
     progress_container = st.container()
@@ -538,118 +1007,47 @@ def process_pdfs(files, prompt, api_key, max_workers, dpi, timeout):
         total_files = len(files)
         processed_files = []
         
-        for idx, uploaded_file in enumerate(files):
-            # 更新总体进度
-            file_progress = idx / total_files
-            total_progress.progress(file_progress)
-            overall_status.text(f"处理中: {uploaded_file.name} ({idx+1}/{total_files})")
-            
-            with detail_container:
-                st.subheader(f"📄 处理文件: {uploaded_file.name}")
+        if perf_options.get('pipeline') and total_files > 1:
+            # 流水线模式下多个文件共用一个页面队列
+            run_scheduled_batch(
+                files, pdf_processor, ai_parser, prompt, max_workers, perf_options,
+                detail_container, total_progress, overall_status, processed_files
+            )
+        else:
+            for idx, uploaded_file in enumerate(files):
+                # 更新总体进度
+                file_progress = idx / total_files
+                total_progress.progress(file_progress)
+                overall_status.text(f"处理中: {uploaded_file.name} ({idx+1}/{total_files})")
                 
-                try:
-                    # 创建输出目录结构
-                    base_output_dir = Path(st.session_state.output_dir)
-                    dirs = FileManager.create_directory_structure(base_output_dir, uploaded_file.name)
-                    
-                    # 保存原始PDF
-                    st.info("💾 保存原始PDF...")
-                    pdf_path = dirs['pdf'] / uploaded_file.name
-                    if not FileManager.save_uploaded_file(uploaded_file, pdf_path):
-                        continue
-                    
-                    # 拆分PDF为图片
-                    st.info("✂️ 拆分PDF页面...")
-                    split_progress = st.progress(0)
-                    split_status = st.empty()
-                    
-                    # 定义PDF拆分的回调函数
-                    def split_progress_callback(progress):
-                        split_progress.progress(progress)
-                    
-                    def split_status_callback(status):
-                        split_status.text(status)
-                    
-                    images = pdf_processor.split_pdf_to_images(
-                        pdf_path, 
-                        dirs['images'],
-                        progress_callback=split_progress_callback,
-                        status_callback=split_status_callback
-                    )
-                    
-                    split_progress.progress(1.0)
-                    split_status.text("✅ PDF拆分完成")
-                    
-                    if not images:
-                        st.error(f"❌ {uploaded_file.name} 拆分失败")
-                        continue
-                    
-                    st.success(f"✅ 拆分完成！共 {len(images)} 页")
-                    
-                    # AI解析
-                    st.info("🤖 AI解析中...")
-                    parse_progress = st.progress(0)
-                    parse_status = st.empty()
-                    
-                    # 定义回调函数
-                    def progress_callback(progress):
-                        parse_progress.progress(progress)
-                    
-                    def status_callback(status):
-                        parse_status.text(status)
+                with detail_container:
+                    st.subheader(f"📄 处理文件: {uploaded_file.name}")
                     
                     try:
-                        # 执行AI解析
-                        result = ai_parser.parse_images_batch(
-                            images,
-                            dirs['summaries'],
-                            prompt,
-                            max_workers,
-                            progress_callback,
-                            status_callback
+                        # 创建输出目录结构
+                        base_output_dir = Path(st.session_state.output_dir)
+                        dirs = FileManager.create_directory_structure(base_output_dir, uploaded_file.name)
+                        
+                        saved = save_source_pdf(uploaded_file, dirs)
+                        if saved is None:
+                            continue
+                        pdf_path, pdf_hash = saved
+                        
+                        result = process_document(
+                            pdf_processor, ai_parser, pdf_path, dirs, prompt, max_workers, perf_options, pdf_hash
                         )
                         
-                        # 确保进度条显示完成
-                        parse_progress.progress(1.0)
-                        parse_status.text("✅ AI解析完成")
+                        if result is None:
+                            st.error(f"❌ {uploaded_file.name} 拆分失败")
+                            continue
                         
-                    except Exception as e:
-                        parse_progress.progress(0.0)
-                        parse_status.text(f"❌ AI解析失败: {str(e)}")
-                        st.error(f"AI解析错误: {str(e)}")
+                        # 记录处理结果
+                        record_file_result(uploaded_file.name, result, dirs, processed_files)
                         
-                        # 创建失败结果
-                        result = {
-                            'total_pages': len(images),
-                            'successful': 0,
-                            'failed': len(images),
-                            'results': {}
-                        }
-                    
-                    # 记录处理结果
-                    file_info = {
-                        'name': uploaded_file.name,
-                        'pages': len(images),
-                        'successful': result['successful'],
-                        'failed': result['failed'],
-                        'success_rate': f"{(result['successful']/result['total_pages']*100):.1f}%",
-                        'output_dir': str(dirs['base']),
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    
-                    processed_files.append(file_info)
-                    st.session_state.processed_files.append(file_info)
-                    
-                    # 显示处理结果
-                    if result['failed'] == 0:
-                        st.success(f"🎉 {uploaded_file.name} 处理完成！")
-                    else:
-                        st.warning(f"⚠️ {uploaded_file.name} 处理完成，但有 {result['failed']} 页失败")
+                    except Exception as e:
+                        st.error(f"❌ 处理 {uploaded_file.name} 时出错: {str(e)}")
                     
-                except Exception as e:
-                    st.error(f"❌ 处理 {uploaded_file.name} 时出错: {str(e)}")
-                
-                st.markdown("---")
+                    st.markdown("---")
         
         # 完成处理
         total_progress.progress(1.0)
@@ -717,8 +1115,49 @@ def render_processing_summary(processed_files):
             df = pd.DataFrame(processed_files)
             st.dataframe(df, use_container_width=True)
 
+# 只重试失败页
+def retry_failed_pages(file_info, api_key, max_workers, timeout, perf_options):
+    """按任务清单重新处理文档中失败或缺失的页面，并更新历史记录"""
+    base_dir = Path(file_info['output_dir'])
+    manifest = JobManifest.load(base_dir)
+    if manifest is None:
+        st.error("❌ 未找到任务清单（manifest.json），无法只重试失败页")
+        return
+    if not validate_api_key(api_key):
+        st.error(ERROR_MESSAGES["no_api_key"])
+        return
+    
+    dirs = FileManager.create_directory_structure(base_dir.parent, manifest.pdf_name)
+    pdf_path = dirs['pdf'] / manifest.pdf_name
+    if not pdf_path.exists():
+        st.error(f"❌ 原始PDF不存在: {pdf_path}")
+        return
+    
+    # 沿用清单中的分辨率设置和提示词，保证已成功页面的结果仍然有效
+    pdf_processor = create_pdf_processor(manifest.dpi, {
+        **perf_options, 'max_pixels': manifest.max_pixels, 'text_layer': manifest.text_layer
+    })
+    ai_parser = create_ai_parser(api_key, timeout, perf_options)
+    result = process_document(
+        pdf_processor, ai_parser, pdf_path, dirs, manifest.prompt, max_workers, perf_options, hash_file(pdf_path)
+    )
+    if result is None:
+        st.error(f"❌ {manifest.pdf_name} 拆分失败")
+        return
+    
+    file_info.update({
+        'successful': result['successful'],
+        'failed': result['failed'],
+        'success_rate': f"{(result['successful']/result['total_pages']*100 if result['total_pages'] else 0):.1f}%",
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+    if result['failed'] == 0:
+        st.success(f"🎉 {manifest.pdf_name} 失败页已全部重新解析成功！")
+    else:
+        st.warning(f"⚠️ 重试完成，仍有 {result['failed']} 页失败")
+
 # 处理历史
-def render_processing_history():
+def render_processing_history(api_key, max_workers, timeout, perf_options):
     """渲染处理历史"""
     if not st.session_state.processed_files:
         return
@@ -756,10 +1195,17 @@ def render_processing_history():
                         os.system(f"open '{file_info['output_dir']}'")
                     except Exception as e:
                         st.error(f"打开文件夹失败: {str(e)}")
+            
+            # 只重试失败页（依据输出目录中的任务清单）
+            if file_info['failed'] > 0:
+                if st.button("🔁 仅重试失败页", key=f"retry_{idx}", disabled=st.session_state.processing):
+                    retry_failed_pages(file_info, api_key, max_workers, timeout, perf_options)
 
 # 图片解析功能
-def render_image_upload_and_parse():
+def render_image_upload_and_parse(perf_options=None):
     """渲染图片上传和解析功能"""
+    perf_options = perf_options or {}
+
     st.header("🖼️ 图片智能解析")
     
     # 图片上传
@@ -805,6 +1251,19 @@ def render_image_upload_and_parse():
             key="img_prompt"
         )
         
+        # 后台批量解析的并发数
+        image_workers = st.slider(
+            "并发解析数",
+            min_value=1,
+            max_value=CONCURRENCY_CONFIG["max_image_workers"],
+            value=CONCURRENCY_CONFIG["default_image_workers"],
+            help="批量解析时同时进行的请求数，图片在后台线程池中并发解析",
+            key="image_workers"
+        )
+        
+        batch = st.session_state.image_batch
+        batch_running = batch is not None and not batch.finished
+        
         # ==================== 顶部：控制区域 ====================
         st.markdown("---")
         st.markdown("### 🎛️ 解析控制")
@@ -812,17 +1271,16 @@ def render_image_upload_and_parse():
         # 解析控制按钮
         col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
         with col1:
-            if not st.session_state.batch_parsing:
+            if not batch_running:
                 parse_all = st.button("🚀 批量解析", key="parse_all", type="primary")
             else:
                 parse_all = False
                 st.button("🔄 解析中...", disabled=True, key="parsing_disabled")
         
         with col2:
-            if st.session_state.batch_parsing:
+            if batch_running:
                 if st.button("⏹️ 停止解析", key="stop_batch"):
-                    st.session_state.batch_parsing = False
-                    st.session_state.batch_status = "用户停止"
+                    batch.cancel()
                     st.rerun()
             else:
                 st.button("⏹️ 停止解析", disabled=True, key="stop_disabled")
@@ -833,47 +1291,27 @@ def render_image_upload_and_parse():
         
         with col4:
             if st.button("🗑️ 清空结果", key="clear_all_results"):
+                if batch is not None:
+                    batch.cancel()
                 st.session_state.image_results = {}
-                st.session_state.batch_parsing = False
-                st.session_state.batch_completed = 0
-                st.session_state.batch_progress = 0
+                st.session_state.image_batch = None
                 st.success("✅ 已清空所有解析结果")
                 st.rerun()
         
-        # ==================== 顶部：进度显示区域 ====================
-        if st.session_state.batch_parsing or st.session_state.batch_completed > 0:
-            st.markdown("### 📊 批量解析进度")
-            
-            # 进度条
-            progress_value = st.session_state.batch_progress
-            st.progress(progress_value)
-            
-            # 状态信息
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("进度", f"{st.session_state.batch_completed}/{st.session_state.batch_total}")
-            with col2:
-                completion_rate = (st.session_state.batch_completed / st.session_state.batch_total * 100) if st.session_state.batch_total > 0 else 0
-                st.metric("完成率", f"{completion_rate:.1f}%")
-            with col3:
-                if st.session_state.batch_parsing:
-                    st.metric("状态", "🔄 解析中")
-                elif st.session_state.batch_completed >= st.session_state.batch_total and st.session_state.batch_total > 0:
-                    st.metric("状态", "✅ 已完成")
-                else:
-                    st.metric("状态", "⏸️ 已停止")
-            
-            if st.session_state.batch_current_file:
-                st.info(f"当前处理: {st.session_state.batch_current_file}")
-        
-        # 启动批量解析
-        if parse_all and not st.session_state.batch_parsing:
-            start_batch_parsing(uploaded_images, prompt, api_key)
+        # 启动批量解析（后台线程池，立即返回）
+        if parse_all and not batch_running:
+            start_batch_parsing(uploaded_images, prompt, api_key, image_workers, perf_options)
             st.rerun()
         
-        # 继续批量解析（如果正在进行中）
-        if st.session_state.batch_parsing:
-            continue_batch_parsing(uploaded_images, prompt, api_key)
+        # ==================== 顶部：进度显示区域 ====================
+        # 解析进行中时只按间隔局部刷新进度区域，不再每张图片重跑整个页面
+        if batch is not None:
+            st.fragment(
+                render_batch_progress,
+                run_every=CONCURRENCY_CONFIG["image_poll_interval"] if batch_running else None
+            )(polling=batch_running)
+        
+        snapshot = batch.snapshot() if batch is not None else None
         
         # ==================== 底部：主要预览区域 ====================
         st.markdown("---")
@@ -882,18 +1320,10 @@ def render_image_upload_and_parse():
         # 图片导航器 - 使用滑块进行选择
         if len(uploaded_images) > 1:
             # 创建图片状态显示
-            status_text = ""
-            for i, img in enumerate(uploaded_images):
-                if img.name in st.session_state.image_results:
-                    status_icon = "✅"
-                elif st.session_state.batch_parsing and i == st.session_state.batch_completed:
-                    status_icon = "🔄"
-                else:
-                    status_icon = "⏳"
-                status_text += f"{status_icon} "
+            status_text = " ".join(image_status_icon(img.name, snapshot) for img in uploaded_images)
             
             st.markdown(f"**图片状态：** {status_text}")
-            st.markdown("*✅已完成 🔄解析中 ⏳待解析*")
+            st.markdown("*✅已完成 🔄解析中 ⏳待解析 ❌失败*")
             
             # 滑块选择器
             selected_idx = st.slider(
@@ -908,7 +1338,7 @@ def render_image_upload_and_parse():
             # 动态更新滑块标签
             if selected_idx < len(uploaded_images):
                 current_image = uploaded_images[selected_idx]
-                status_icon = "✅" if current_image.name in st.session_state.image_results else ("🔄" if st.session_state.batch_parsing and selected_idx == st.session_state.batch_completed else "⏳")
+                status_icon = image_status_icon(current_image.name, snapshot)
                 st.markdown(f"**当前选择：** {status_icon} 第 {selected_idx + 1} 张 - {current_image.name}")
         else:
             selected_idx = 0
@@ -941,10 +1371,10 @@ def render_image_upload_and_parse():
                             st.metric("格式", image.format or "未知")
                         
                         # 单张解析按钮
-                        if not st.session_state.batch_parsing:
+                        if not batch_running:
                             if st.button(f"🔍 单独解析此图片", key=f"parse_single_{selected_idx}", use_container_width=True):
                                 with st.spinner("解析中..."):
-                                    result = parse_single_image_display(selected_image, prompt, api_key, selected_idx + 1)
+                                    result = parse_single_image_display(selected_image, prompt, api_key, selected_idx + 1, perf_options)
                                     if result:
                                         st.session_state.image_results[selected_image.name] = result
                                         st.success("✅ 解析完成！")
@@ -988,23 +1418,18 @@ def render_image_upload_and_parse():
                             st.success("✅ 已删除此解析结果")
                             st.rerun()
                 
-                elif st.session_state.batch_parsing and selected_idx == st.session_state.batch_completed:
+                elif snapshot and selected_image.name in snapshot['in_flight']:
                     # 正在解析当前图片
-                    st.info("🔄 正在解析此图片...")
-                    with st.spinner("AI解析中，请稍候..."):
-                        st.empty()  # 占位符，显示加载动画
+                    st.info("🔄 后台正在解析此图片...")
                 
-                elif st.session_state.batch_parsing and selected_idx < st.session_state.batch_completed:
-                    # 应该已经解析但没有结果（可能失败了）
+                elif snapshot and selected_image.name in snapshot['errors']:
+                    # 批量解析失败
                     st.warning("⚠️ 此图片解析失败")
-                    st.markdown("**可能原因：**")
-                    st.markdown("- 图片格式不支持")
-                    st.markdown("- 网络连接问题") 
-                    st.markdown("- API调用失败")
+                    st.markdown(f"**错误信息：** {snapshot['errors'][selected_image.name]}")
                     
-                    if st.button("🔄 重新解析", key=f"retry_{selected_idx}"):
+                    if not batch_running and st.button("🔄 重新解析", key=f"retry_{selected_idx}"):
                         with st.spinner("重新解析中..."):
-                            result = parse_single_image_display(selected_image, prompt, api_key, selected_idx + 1)
+                            result = parse_single_image_display(selected_image, prompt, api_key, selected_idx + 1, perf_options)
                             if result:
                                 st.session_state.image_results[selected_image.name] = result
                                 st.success("✅ 重新解析完成！")
@@ -1017,67 +1442,82 @@ def render_image_upload_and_parse():
                     st.markdown("- 点击左侧'单独解析此图片'按钮")
                     st.markdown("- 或使用顶部'批量解析'功能")
                     
-                    # 显示在队列中的位置
-                    if st.session_state.batch_parsing:
-                        queue_position = selected_idx - st.session_state.batch_completed + 1
-                        if queue_position > 0:
-                            st.info(f"📍 排队中，还有 {queue_position} 张图片等待解析")
+                    # 批量解析进行中：等待后台处理
+                    if batch_running:
+                        st.info("📍 排队中，等待后台解析")
         
         # ==================== 底部：批量保存功能 ====================
         if save_results and st.session_state.image_results:
             save_batch_results(st.session_state.image_results)
 
-def start_batch_parsing(uploaded_files, prompt, api_key):
-    """启动批量解析"""
-    st.session_state.batch_parsing = True
-    st.session_state.batch_total = len(uploaded_files)
-    st.session_state.batch_completed = 0
-    st.session_state.batch_progress = 0
-    st.session_state.batch_status = "准备开始..."
-    st.session_state.batch_current_file = ""
-
-def continue_batch_parsing(uploaded_files, prompt, api_key):
-    """继续批量解析"""
-    if st.session_state.batch_completed >= st.session_state.batch_total:
-        # 解析完成
-        st.session_state.batch_parsing = False
-        st.session_state.batch_status = "✅ 批量解析完成！"
-        st.balloons()
+def start_batch_parsing(uploaded_files, prompt, api_key, max_workers, perf_options=None):
+    """在后台线程池中解析尚无结果的图片，立即返回"""
+    pending = [
+        (uploaded_file.name, uploaded_file.getvalue())
+        for uploaded_file in uploaded_files
+        if uploaded_file.name not in st.session_state.image_results
+    ]
+    if not pending:
+        st.session_state.image_batch = None
         return
     
-    # 获取当前要处理的文件
-    current_idx = st.session_state.batch_completed
-    current_file = uploaded_files[current_idx]
+    # 创建AI解析器（与PDF解析共用结果缓存）
+    ai_parser = create_ai_parser(api_key, 60, perf_options or {})
+    st.session_state.image_batch = ImageBatchParser(ai_parser, pending, prompt, max_workers).start()
+
+def render_batch_progress(polling=False):
+    """批量解析进度：合并后台新产生的结果并显示进度（polling=True 时由片段定时调用）"""
+    batch = st.session_state.image_batch
+    if batch is None:
+        return
+    st.session_state.image_results.update(batch.take_results())
+    snapshot = batch.snapshot()
+    done = snapshot['completed'] + snapshot['skipped']
     
-    # 更新状态
-    st.session_state.batch_current_file = current_file.name
-    st.session_state.batch_status = f"解析中: {current_file.name}"
+    st.markdown("### 📊 批量解析进度")
+    st.progress(done / snapshot['total'] if snapshot['total'] else 1.0)
     
-    # 检查是否已经解析过
-    if current_file.name not in st.session_state.image_results:
-        try:
-            # 解析当前图片
-            result = parse_single_image_display(current_file, prompt, api_key, current_idx + 1)
-            if result:
-                st.session_state.image_results[current_file.name] = result
-        except Exception as e:
-            st.error(f"解析 {current_file.name} 失败: {e}")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("进度", f"{snapshot['completed']}/{snapshot['total']}")
+    with col2:
+        st.metric("失败", snapshot['failed'])
+    with col3:
+        st.metric("速度", f"{snapshot['rate']:.2f} 张/秒")
+    with col4:
+        if not snapshot['finished']:
+            st.metric("状态", "🔄 解析中")
+        elif snapshot['cancelled']:
+            st.metric("状态", "⏸️ 已停止")
+        else:
+            st.metric("状态", "✅ 已完成")
     
-    # 更新进度
-    st.session_state.batch_completed += 1
-    st.session_state.batch_progress = st.session_state.batch_completed / st.session_state.batch_total
+    if snapshot['in_flight']:
+        names = snapshot['in_flight']
+        st.info(f"当前处理（{len(names)}）: " + ", ".join(names[:5]) + (" ..." if len(names) > 5 else ""))
+    elif snapshot['finished']:
+        st.success(
+            f"✅ 批量解析结束：成功 {snapshot['completed'] - snapshot['failed']} 张，失败 {snapshot['failed']} 张"
+            + (f"，命中缓存 {snapshot['cached']} 张" if snapshot['cached'] else "")
+            + (f"，未解析 {snapshot['skipped']} 张" if snapshot['skipped'] else "")
+            + f"，用时 {snapshot['elapsed']:.1f}s"
+        )
     
-    # 如果还有未完成的，继续下一个
-    if st.session_state.batch_completed < st.session_state.batch_total:
-        # 使用st.rerun()继续下一个文件
-        time.sleep(0.1)  # 短暂延迟避免过快刷新
+    # 解析结束后刷新整个页面，更新预览区的状态并停止定时刷新
+    if polling and snapshot['finished']:
         st.rerun()
-    else:
-        # 全部完成
-        st.session_state.batch_parsing = False
-        st.session_state.batch_status = "✅ 批量解析完成！"
 
-def parse_single_image_display(uploaded_file, prompt, api_key, page_num):
+def image_status_icon(name, snapshot):
+    """预览区中单张图片的状态图标"""
+    if name in st.session_state.image_results:
+        return "✅"
+    if snapshot and name in snapshot['errors']:
+        return "❌"
+    if snapshot and name in snapshot['in_flight']:
+        return "🔄"
+    return "⏳"
+
+def parse_single_image_display(uploaded_file, prompt, api_key, page_num, perf_options=None):
     """解析单张图片并显示结果"""
     with st.spinner("🔄 处理图片中..."):
         try:
@@ -1102,43 +1542,21 @@ def parse_single_image_display(uploaded_file, prompt, api_key, page_num):
                         st.metric("状态", "无需压缩", delta="✓")
             
             with st.spinner("🤖 AI解析中..."):
-                # 创建AI解析器
-                ai_parser = AIParser(api_key=api_key, timeout=60)
-                
-                # 转换为base64
-                base64_image = base64.b64encode(processed_bytes).decode('utf-8')
+                # 创建AI解析器（与PDF解析共用结果缓存）
+                ai_parser = create_ai_parser(api_key, 60, perf_options or {})
                 
-                # 构建消息（统一使用PNG格式）
-                messages = [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
-                                },
-                            },
-                            {
-                                "type": "text", 
-                                "text": f"这是第{page_num}张图片。{prompt}"
-                            },
-                        ],
-                    }
-                ]
-                
-                # 调用API
-                client = ai_parser.create_client()
-                response = client.chat.completions.create(
-                    model=ai_parser.model,
-                    messages=messages,
-                    max_tokens=4096,
-                    temperature=0.7,
-                    top_p=0.9
+                # 调用API（按上传编码设置重新编码）
+                outcome = ai_parser.parse_page(
+                    processed_bytes, prompt, page_num,
+                    intro=f"这是第{page_num}张图片。"
                 )
                 
-                result = response.choices[0].message.content
-                st.success("✅ 解析完成！")
+                if not outcome['success']:
+                    st.error(f"❌ 解析失败: {outcome['content']}")
+                    return None
+                
+                result = outcome['content']
+                st.success("⚡ 命中缓存，解析完成！" if outcome['cached'] else "✅ 解析完成！")
                 return result
                 
         except Exception as e:
@@ -1192,6 +1610,85 @@ def save_batch_results(results_dict):
         st.error(f"保存失败: {e}")
 
 # 页脚
+# 标签检索
+def render_tag_search():
+    """按标签检索全部已解析文档的页面（标签倒排索引，见 tag_index.py）"""
+    st.markdown("### 🏷️ 按标签检索页面")
+    tag_index = get_tag_index()
+    if tag_index is None:
+        st.info("标签索引未启用（config.py 中的 TAG_INDEX_CONFIG）")
+        return
+    
+    stats = tag_index.stats()
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
+    col1.metric("文档", stats['documents'])
+    col2.metric("带标签的页面", stats['pages'])
+    col3.metric("标签", stats['tags'])
+    with col4:
+        # 索引随解析增量更新；更新本功能之前解析的结果、或手动删改过结果文件时需重建
+        if st.button("🔄 按输出目录重建索引", help=f"扫描 {st.session_state.output_dir} 下已保存的结果"):
+            with st.spinner("正在重建标签索引..."):
+                rebuilt = tag_index.rebuild(Path(st.session_state.output_dir))
+            st.success(f"✅ 已索引 {rebuilt['documents']} 个结果目录、{rebuilt['pages']} 个带标签的页面，"
+                       f"移除 {rebuilt['removed']} 个已不存在的文档")
+            st.rerun()
+    
+    top_tags = tag_index.top_tags()
+    tag_pages = dict(top_tags)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        picked = st.multiselect(
+            "常用标签",
+            options=list(tag_pages),
+            format_func=lambda tag: f"{tag}（{tag_pages[tag]}页）",
+            key="tag_search_picked"
+        )
+        typed = st.text_input("其他标签", placeholder="多个标签用空格或逗号分隔", key="tag_search_input")
+    with col2:
+        mode = st.radio(
+            "检索方式",
+            options=list(TAG_SEARCH_MODES),
+            format_func=lambda value: TAG_SEARCH_MODES[value],
+            key="tag_search_mode"
+        )
+    
+    tags = picked + [tag for tag in re.split(r"[\s,，、;；]+", typed) if tag]
+    if not tags:
+        if top_tags:
+            st.markdown("#### 📊 标签频次")
+            st.dataframe(pd.DataFrame(top_tags, columns=["标签", "页数"]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("索引中还没有带标签的页面：使用“设计方案分析”“图集识别”等预设解析文档后即可检索")
+        return
+    
+    result = tag_index.search(tags, mode)
+    shown = len(result['hits'])
+    st.caption(f"命中 {describe_total(result)}，用时 {result['elapsed_ms']} ms"
+               + (f"（显示前 {shown} 页）" if shown < result['total'] else ""))
+    if not shown:
+        return
+    st.dataframe(pd.DataFrame([{
+        '文档': hit['name'],
+        '页码': hit['page'],
+        '页面名称': hit['page_name'],
+        '标签': "、".join(hit['tags']),
+        '结果目录': hit['document']
+    } for hit in result['hits']]), use_container_width=True, hide_index=True)
+    
+    # 查看单页的解析结果
+    position = st.selectbox(
+        "查看解析结果",
+        options=range(shown),
+        format_func=lambda i: f"{result['hits'][i]['name']} 第{result['hits'][i]['page']}页 {result['hits'][i]['page_name']}",
+        key="tag_search_preview"
+    )
+    hit = result['hits'][position]
+    content = read_page(Path(hit['document']), hit['page'])
+    if content is None:
+        st.warning("结果文件已不存在，可重建索引")
+    else:
+        st.code(content, language="json")
+
 def render_footer():
     """渲染页脚"""
     st.markdown("---")
@@ -1210,14 +1707,17 @@ def render_footer():
 # 主函数
 def main():
     """主函数"""
+    # 配置了端口时启动本地指标端点（每个进程只启动一次）
+    start_metrics_server()
+    
     # 渲染页面头部
     render_header()
     
     # 渲染侧边栏并获取配置
-    api_key, max_workers, dpi, timeout = render_sidebar()
+    api_key, max_workers, dpi, timeout, perf_options = render_sidebar()
     
     # 主页面选项卡
-    tab1, tab2 = st.tabs(["📄 PDF批量处理", "🖼️ 图片智能解析"])
+    tab1, tab2, tab3 = st.tabs(["📄 PDF批量处理", "🖼️ 图片智能解析", "🏷️ 标签检索"])
     
     with tab1:
         # PDF处理功能
@@ -1254,14 +1754,18 @@ def main():
                     # 创建输出目录
                     Path(st.session_state.output_dir).mkdir(parents=True, exist_ok=True)
                     # 开始处理
-                    process_pdfs(uploaded_files, prompt, api_key, max_workers, dpi, timeout)
+                    process_pdfs(uploaded_files, prompt, api_key, max_workers, dpi, timeout, perf_options)
         
         # 显示处理历史
-        render_processing_history()
+        render_processing_history(api_key, max_workers, timeout, perf_options)
     
     with tab2:
         # 图片处理功能
-        render_image_upload_and_parse()
+        render_image_upload_and_parse(perf_options)
+    
+    with tab3:
+        # 按标签检索已解析的页面
+        render_tag_search()
     
     # 渲染页脚
     render_footer()
@@ -0,0 +1,234 @@
+"""
+PDF智能解析工具 - 逐页性能指标
+
+每个文档的结果目录下追加写入 metrics.jsonl，每页一行：渲染、编码、排队等待、API延迟（流式接收时另有首字延迟）、
+上传字节、token用量、请求次数与最终结果，用于分析时间花在哪里。
+summarize() 汇总延迟分位数（p50/p95/p99）与每分钟页数，写入汇总报告；
+同时累计到进程级的 REGISTRY，可选地以 Prometheus 文本格式在本地HTTP端口 /metrics 暴露，供监控抓取。
+"""
+
+import json
+import math
+import time
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import METRICS_CONFIG
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩法计算分位数（q 取 0-100），没有数据时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def page_outcome(outcome: Dict) -> str:
+    """单页的最终结果分类：success / cached / blank / duplicate / failed"""
+    if outcome.get('page_filter'):
+        return outcome['page_filter']['action']
+    if not outcome['success']:
+        return "failed"
+    return "cached" if outcome.get('cached') else "success"
+
+
+def page_metrics(page_num: int, outcome: Dict, timing: Optional[Dict] = None) -> Dict:
+    """由单页解析结果与流水线计时生成一条指标记录（时间单位为秒，未经过的阶段为None）"""
+    timing = timing or {}
+    upload = outcome.get('upload') or {}
+    usage = outcome.get('usage') or {}
+    sent = not outcome.get('cached') and not outcome.get('page_filter')
+    attempts = outcome.get('attempts', 0)
+    record = {
+        'page': page_num,
+        'time': datetime.now().isoformat(timespec="milliseconds"),
+        'outcome': page_outcome(outcome),
+        'render_s': timing.get('render'),
+        'queue_wait_s': timing.get('queue_wait'),
+        'encode_s': outcome.get('encode_time'),
+        'api_latency_s': outcome.get('latency'),
+        'ttft_s': outcome.get('ttft'),
+        'parse_s': timing.get('parse'),
+        'payload_bytes': upload.get('bytes', 0) * max(1, attempts) if sent else 0,
+        'upload_format': upload.get('format'),
+        'attempts': attempts,
+        'retries': max(0, attempts - 1),
+        'prompt_tokens': usage.get('prompt_tokens', 0),
+        'cached_tokens': usage.get('cached_tokens', 0),
+        'completion_tokens': usage.get('completion_tokens', 0)
+    }
+    for key, value in record.items():
+        if isinstance(value, float):
+            record[key] = round(value, 4)
+    if outcome.get('packed'):
+        record['packed'] = outcome['packed']['size']
+    if outcome.get('validation'):
+        record['validation'] = outcome['validation']['status']
+    if outcome.get('stream'):
+        record['stream_stop'] = outcome['stream']['stop']
+    if outcome.get('text_layer'):
+        record['route'] = outcome['text_layer']['route']
+    if not outcome['success']:
+        record['error'] = (outcome.get('error_info') or {}).get('kind') or "error"
+    return record
+
+
+def summarize(records: List[Dict], elapsed: float) -> Dict:
+    """汇总一组指标记录：结果分布、各阶段耗时分位数（未经过该阶段的页面不计入）与吞吐量"""
+    outcomes = [record['outcome'] for record in records]
+    section = {
+        '页数': len(records),
+        '解析成功': outcomes.count("success"),
+        '缓存命中': outcomes.count("cached"),
+        '过滤跳过': outcomes.count("blank") + outcomes.count("duplicate"),
+        '失败': outcomes.count("failed"),
+        '重试次数': sum(record['retries'] for record in records),
+        '耗时（秒）': round(elapsed, 2),
+        '每分钟页数': round(len(records) / elapsed * 60, 1) if elapsed > 0 else 0
+    }
+    stops = [record['stream_stop'] for record in records if record.get('stream_stop')]
+    if stops:
+        section['流式提前结束'] = f"JSON完整 {stops.count('json_complete')} / 失控截断 {stops.count('runaway')}"
+    for label, key in (("API延迟", 'api_latency_s'), ("首字延迟", 'ttft_s'), ("渲染", 'render_s'), ("排队等待", 'queue_wait_s'),
+                       ("编码", 'encode_s'), ("单页解析", 'parse_s')):
+        values = [record[key] for record in records if record.get(key) is not None]
+        if not values:
+            continue
+        summary = [f"p{q} {percentile(values, q):.3f}" for q in METRICS_CONFIG["percentiles"]]
+        section[f"{label}（秒）"] = " / ".join(summary + [f"平均 {sum(values) / len(values):.3f}"])
+    return section
+
+
+class MetricsRegistry:
+    """进程级累计指标（计数器与直方图），按 Prometheus 文本格式导出（线程安全）"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float):
+        with self.lock:
+            histogram = self.histograms.setdefault(
+                name, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def record_page(self, record: Dict):
+        """累计一条逐页指标记录"""
+        self.inc("pdf_parser_pages_total", outcome=record['outcome'])
+        self.inc("pdf_parser_retries_total", record['retries'])
+        self.inc("pdf_parser_upload_bytes_total", record['payload_bytes'])
+        for kind in ("prompt", "cached", "completion"):
+            self.inc("pdf_parser_tokens_total", record[f"{kind}_tokens"], kind=kind)
+        for name, key in (("pdf_parser_api_latency_seconds", 'api_latency_s'),
+                          ("pdf_parser_ttft_seconds", 'ttft_s'),
+                          ("pdf_parser_render_seconds", 'render_s'),
+                          ("pdf_parser_queue_wait_seconds", 'queue_wait_s'),
+                          ("pdf_parser_encode_seconds", 'encode_s')):
+            if record.get(key) is not None:
+                self.observe(name, record[key])
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        with self.lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for bound, count in zip(self.buckets, histogram['counts']):
+                    lines.append(f'{name}_bucket{{le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {histogram["count"]}')
+                lines.append(f"{name}_sum {histogram['sum']:.6f}")
+                lines.append(f"{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(METRICS_CONFIG["latency_buckets"])
+
+
+class MetricsLog:
+    """单个文档的逐页指标：追加写入 metrics.jsonl，同时累计到 REGISTRY（线程安全）"""
+
+    def __init__(self, output_dir: Path):
+        self.path = Path(output_dir) / METRICS_CONFIG["filename"]
+        self.records: List[Dict] = []
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def record(self, page_num: int, outcome: Dict, timing: Optional[Dict] = None) -> Dict:
+        record = page_metrics(page_num, outcome, timing)
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.records.append(record)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError:
+                pass
+        REGISTRY.record_page(record)
+        return record
+
+    def summary(self) -> Dict:
+        with self.lock:
+            return summarize(list(self.records), time.perf_counter() - self.started)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics 返回 REGISTRY 的 Prometheus 文本"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """静默访问日志"""
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """在后台线程启动本地指标端点（每个进程只启动一次）；端口为0或启动失败时返回None"""
+    global _server
+    port = METRICS_CONFIG["http_port"] if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host or METRICS_CONFIG["http_host"], port), _MetricsHandler)
+            except OSError:
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
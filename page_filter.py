@@ -0,0 +1,190 @@
+"""
+PDF智能解析工具 - 空白页与重复页过滤
+
+解析前为每页计算墨迹覆盖率（与页面底色明显不同的像素占比）和感知哈希（dHash），
+指纹在渲染时直接由pixmap像素算出，随页面一起交给解析流水线：
+空白页（分隔页、纯色页）直接跳过；与同一文档中先前已送解析的页面近乎相同的页面
+（重复的章节分隔页、样板页）不再调用API，沿用该页的解析结果。
+重复判定分两步：哈希汉明距离足够小的候选页，再按全分辨率分块内容哈希比对确认，
+只有极少数小块不同（如页码）才视为重复，避免版式相同、文字不同的页面被误判。
+单页JSON保持预设格式：空白页不写结果，重复页原样复制源页结果；过滤判定记入结果目录的 page_filter.json。
+"""
+
+import io
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from config import PAGE_FILTER_CONFIG
+
+
+# 分块内容哈希的随机权重（固定种子，进程间结果一致）
+_BLOCK_WEIGHTS = np.random.default_rng(0).integers(1, 2 ** 31, PAGE_FILTER_CONFIG["block_size"] ** 2, dtype=np.int64)
+
+
+def ink_coverage(pixels: np.ndarray) -> float:
+    """墨迹覆盖率：页边以内与底色（出现最多的灰度）相差明显的像素占比，纯色页（包括深色底）为0"""
+    height, width = pixels.shape
+    margin_y = int(height * PAGE_FILTER_CONFIG["blank_margin"])
+    margin_x = int(width * PAGE_FILTER_CONFIG["blank_margin"])
+    inner = pixels[margin_y:height - margin_y, margin_x:width - margin_x]
+    background = int(np.bincount(inner.ravel(), minlength=256).argmax())
+    ink = np.count_nonzero(np.abs(inner.astype(np.int16) - background) > PAGE_FILTER_CONFIG["ink_threshold"])
+    return ink / max(1, inner.size)
+
+
+def block_hashes(pixels: np.ndarray) -> np.ndarray:
+    """把整页切成 block_size 见方的小块，逐块计算内容哈希（一次矩阵乘法完成）"""
+    size = PAGE_FILTER_CONFIG["block_size"]
+    height, width = pixels.shape
+    padded = np.pad(pixels, ((0, -height % size), (0, -width % size)))
+    rows, cols = padded.shape[0] // size, padded.shape[1] // size
+    blocks = padded.reshape(rows, size, cols, size).swapaxes(1, 2).reshape(rows * cols, size * size)
+    return blocks.astype(np.int64) @ _BLOCK_WEIGHTS
+
+
+def gray_pixels(samples: np.ndarray) -> np.ndarray:
+    """(高, 宽, 通道) 像素转为灰度（与 PIL 的 L 模式同一公式；单通道或灰度+透明度取第一通道）"""
+    if samples.shape[2] < 3:
+        return np.ascontiguousarray(samples[:, :, 0])
+    rgb = samples[:, :, :3].astype(np.uint32)
+    return ((rgb[:, :, 0] * 299 + rgb[:, :, 1] * 587 + rgb[:, :, 2] * 114 + 500) // 1000).astype(np.uint8)
+
+
+def difference_hash(pixels: np.ndarray) -> int:
+    """dHash：按区域平均缩小到 hash_size × (hash_size+1)，比较相邻列的明暗"""
+    hash_size = PAGE_FILTER_CONFIG["hash_size"]
+    height, width = pixels.shape
+    rows = np.linspace(0, height, hash_size + 1).astype(int)
+    cols = np.linspace(0, width, hash_size + 2).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(pixels, rows[:-1], axis=0, dtype=np.int64), cols[:-1], axis=1)
+    small = sums / np.outer(np.diff(rows), np.diff(cols))
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def pixel_fingerprint(pixels: np.ndarray) -> Dict:
+    """由灰度像素计算页面指纹：墨迹覆盖率、dHash与分块内容哈希（整页numpy向量化）"""
+    return {
+        'ink': ink_coverage(pixels),
+        'dhash': difference_hash(pixels),
+        'shape': pixels.shape,
+        'blocks': block_hashes(pixels)
+    }
+
+
+def pixmap_fingerprint(pix) -> Dict:
+    """渲染时直接由 PyMuPDF pixmap 的原始像素（pix.samples）计算指纹，无需PNG编码后再解码"""
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    samples = samples[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    return pixel_fingerprint(gray_pixels(samples))
+
+
+def page_fingerprint(image_bytes: bytes) -> Dict:
+    """由PNG字节计算指纹（复用磁盘切片等没有渲染时指纹的页面）；PNG无损，结果与 pixmap_fingerprint 一致"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        samples = np.asarray(image.convert("RGB"))
+    return pixel_fingerprint(gray_pixels(samples))
+
+
+def block_diff_ratio(a: Dict, b: Dict) -> float:
+    """两页中内容不同的小块占比（尺寸不同视为完全不同）"""
+    if a['shape'] != b['shape']:
+        return 1.0
+    return np.count_nonzero(a['blocks'] != b['blocks']) / a['blocks'].size
+
+
+def describe_filter(verdict: Dict) -> str:
+    """过滤结果的可读描述（用于汇总报告）"""
+    if verdict['action'] == "blank":
+        return f"空白页（墨迹覆盖率 {verdict['ink']:.3%}），已跳过"
+    return f"与第 {verdict['source_page']} 页重复（差异区块 {verdict['diff_ratio']:.2%}），沿用其结果"
+
+
+class PageFilter:
+    """单个文档内的空白页/重复页识别（线程安全）
+
+    check() 判定每一页；只有真正送去解析的页面才成为后续页面的比对对象。
+    重复页在源页完成前到达时先挂起，源页完成后由 resolve() 取回，沿用其结果。
+    """
+
+    def __init__(self):
+        self.leaders: List[Tuple[int, Dict]] = []   # (页码, 指纹)，已送解析的页面
+        self.outcomes: Dict[int, Dict] = {}         # 源页的解析结果
+        self.waiting: Dict[int, List[Tuple]] = {}   # 源页码 -> [(页码, 图片, 判定)]
+        self.lock = threading.Lock()
+
+    def check(self, page_num: int, image: Union[Path, bytes], fingerprint: Optional[Dict] = None) -> Optional[Dict]:
+        """返回None表示需要解析；否则返回 {'action': 'blank'|'duplicate', ...}
+
+        fingerprint 为渲染时由像素算好的指纹（见 pixmap_fingerprint），没有时才读取并解码图片。
+        """
+        if fingerprint is None:
+            image_bytes = image if isinstance(image, (bytes, bytearray)) else Path(image).read_bytes()
+            fingerprint = page_fingerprint(image_bytes)
+        if fingerprint['ink'] < PAGE_FILTER_CONFIG["blank_max_ink"]:
+            return {'action': "blank", 'ink': round(fingerprint['ink'], 6)}
+
+        with self.lock:
+            for source_page, leader in self.leaders:
+                distance = bin(fingerprint['dhash'] ^ leader['dhash']).count("1")
+                if distance > PAGE_FILTER_CONFIG["max_hash_distance"]:
+                    continue
+                diff_ratio = block_diff_ratio(fingerprint, leader)
+                if diff_ratio <= PAGE_FILTER_CONFIG["max_diff_ratio"]:
+                    return {'action': "duplicate", 'source_page': source_page,
+                            'hash_distance': distance, 'diff_ratio': round(diff_ratio, 6)}
+            self.leaders.append((page_num, fingerprint))
+        return None
+
+    def defer(self, page_num: int, image, verdict: Dict) -> Optional[Dict]:
+        """登记重复页：源页已完成时返回其结果，否则挂起等待 resolve()"""
+        with self.lock:
+            outcome = self.outcomes.get(verdict['source_page'])
+            if outcome is None:
+                self.waiting.setdefault(verdict['source_page'], []).append((page_num, image, verdict))
+            return outcome
+
+    def resolve(self, page_num: int, outcome: Dict) -> List[Tuple]:
+        """源页完成：记录结果，返回等待它的重复页 [(页码, 图片, 判定)]"""
+        with self.lock:
+            self.outcomes[page_num] = outcome
+            return self.waiting.pop(page_num, [])
+
+
+def filtered_outcome(verdict: Dict, source_outcome: Optional[Dict] = None) -> Dict:
+    """被过滤页面的解析结果：空白页视为成功且无内容（不写单页结果）；重复页原样沿用源页结果（源页失败则同样失败）"""
+    if verdict['action'] == "blank":
+        return {'success': True, 'content': "", 'cached': False, 'attempts': 0, 'page_filter': verdict}
+    if source_outcome['success']:
+        content = source_outcome['content']
+    else:
+        content = f"重复页沿用第 {verdict['source_page']} 页的结果，但该页解析失败: {source_outcome['content']}"
+    return {'success': source_outcome['success'], 'content': content, 'cached': False,
+            'attempts': 0, 'page_filter': verdict}
+
+
+def save_filter_record(output_dir: Path, results: Dict[int, Dict]):
+    """把本次处理页面的过滤判定合并写入 output_dir/page_filter.json（{页码: 判定}，续传时保留此前的判定）"""
+    path = Path(output_dir) / PAGE_FILTER_CONFIG["record_file"]
+    try:
+        record = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        record = {}
+    for page_num, result in results.items():
+        if result.get('page_filter'):
+            record[str(page_num)] = result['page_filter']
+        else:
+            record.pop(str(page_num), None)
+    if not record:
+        path.unlink(missing_ok=True)
+        return
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(record.items(), key=lambda item: int(item[0]))), f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
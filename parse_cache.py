@@ -0,0 +1,141 @@
+"""
+PDF智能解析工具 - 解析结果缓存
+
+以 hash(图片字节, 提示词, 模型, 生成参数) 为键，将成功的解析结果持久化到本地SQLite，
+按占用空间做LRU淘汰。同一页面重复解析时直接返回缓存，不再调用视觉API。
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import CACHE_CONFIG
+
+
+class ParseCache:
+    """基于SQLite的解析结果缓存（线程安全，按大小LRU淘汰）"""
+
+    def __init__(self, db_path: Path, max_size_mb: float = 512):
+        self.db_path = Path(db_path)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @staticmethod
+    def make_key(image_bytes: bytes, prompt: str, model: str, params: Dict) -> str:
+        """计算缓存键：图片字节 + 提示词 + 模型 + 生成参数"""
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(image_bytes).digest())
+        for part in (prompt, model, json.dumps(params, sort_keys=True, ensure_ascii=False)):
+            digest.update(b"\0")
+            digest.update(part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，命中时刷新访问时间"""
+        with self.lock:
+            row = self.conn.execute("SELECT content FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        """写入缓存，超出容量时淘汰最久未访问的条目"""
+        size = len(content.encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, content, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now)
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self.conn.commit()
+
+    def _evict(self, target_bytes: int):
+        """按LRU顺序删除条目，直到占用不超过 target_bytes（调用方持有锁）"""
+        cursor = self.conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC")
+        doomed = []
+        for key, size in cursor:
+            if self.total_bytes <= target_bytes:
+                break
+            doomed.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def delete(self, key: str):
+        """删除一条缓存（结果未通过校验时，避免下次命中不合格的内容）"""
+        with self.lock:
+            row = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.conn.commit()
+            self.total_bytes -= row[0]
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.commit()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'size_mb': round(self.total_bytes / 1024 / 1024, 2),
+                'max_size_mb': round(self.max_bytes / 1024 / 1024, 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': f"{(self.hits / lookups * 100 if lookups else 0):.1f}%",
+                'evictions': self.evictions
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """获取进程内共享的缓存实例；未启用缓存时返回None"""
+    global _shared_cache
+    if not CACHE_CONFIG["enabled"]:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ParseCache(Path(CACHE_CONFIG["path"]), CACHE_CONFIG["max_size_mb"])
+        return _shared_cache
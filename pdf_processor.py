@@ -0,0 +1,205 @@
+"""
+PDF智能解析工具 - PDF处理器
+
+基于PyMuPDF逐页渲染PDF（支持多进程并行、内存直传和部分页面），不依赖Streamlit，
+可同时被Web界面和命令行批处理使用。文字层模式为 auto 时，先按页分类：
+文字为主的页面只提取文字不渲染，图文混排页面以较低DPI渲染并附带文字。
+"""
+
+import itertools
+from pathlib import Path
+from datetime import datetime
+
+# 尝试导入PyMuPDF
+try:
+    import fitz  # PyMuPDF - 纯Python库，无需系统依赖
+except ImportError:
+    fitz = None
+
+from config import CONCURRENCY_CONFIG, RENDER_CONFIG, TEXT_LAYER_CONFIG
+from utils import render_page, iter_render_parallel, page_matrix, TextLayerPage
+
+
+def classify_text_layer(page) -> TextLayerPage:
+    """按文字层字数、位图覆盖率和矢量图形数量为单页选择发送方式（不渲染页面，每页约数毫秒）"""
+    text = page.get_text("text").strip()
+    chars = sum(1 for ch in text if not ch.isspace())
+    if chars < TEXT_LAYER_CONFIG["min_chars"]:
+        return TextLayerPage("image", f"文字层仅 {chars} 字（扫描件或纯图片页）")
+    # 字体缺少Unicode映射时提取出的是替换字符或私用区字符
+    garbled = sum(1 for ch in text if ch == "\ufffd" or "\ue000" <= ch <= "\uf8ff") / chars
+    if garbled > TEXT_LAYER_CONFIG["max_garbled_ratio"]:
+        return TextLayerPage("image", f"文字层有 {garbled:.0%} 为无法识别的字符")
+    
+    page_area = page.rect.get_area() or 1
+    image_area = sum(fitz.Rect(info["bbox"]).intersect(page.rect).get_area() for info in page.get_image_info())
+    coverage = min(1.0, image_area / page_area)
+    drawings = len(page.get_cdrawings())
+    if len(text) > TEXT_LAYER_CONFIG["max_text_chars"]:
+        text = text[:TEXT_LAYER_CONFIG["max_text_chars"]] + "\n……（文字过长，已截断）"
+    
+    detail = f"文字 {chars} 字，图片覆盖 {coverage:.0%}，矢量图形 {drawings} 个"
+    if coverage >= TEXT_LAYER_CONFIG["mixed_image_coverage"] or drawings >= TEXT_LAYER_CONFIG["mixed_drawings"]:
+        return TextLayerPage("mixed", detail, text)
+    return TextLayerPage("text", detail, text)
+
+
+class PDFProcessor:
+    """PDF处理器 - 使用PyMuPDF（纯Python实现）"""
+    
+    def __init__(self, dpi: int = 200, render_workers: int = 1, compress_level=None, max_pixels=None,
+                 text_layer=None):
+        """max_pixels 为空时所有页面使用同一DPI；否则为自动分辨率模式：
+        按页面尺寸为每页计算DPI，使像素数不超过 max_pixels，且不高于 dpi。
+        text_layer 为文字层模式（见 TEXT_LAYER_MODES），默认取 TEXT_LAYER_CONFIG["mode"]
+        """
+        if fitz is None:
+            raise ImportError("缺少PyMuPDF库！请确保requirements.txt包含PyMuPDF>=1.23.0")
+        self.dpi = dpi
+        self.max_pixels = max_pixels
+        self.text_layer = text_layer or TEXT_LAYER_CONFIG["mode"]
+        self.render_workers = max(1, render_workers)
+        self.compress_level = RENDER_CONFIG["png_compress_level"] if compress_level is None else compress_level
+    
+    def iter_pdf_images(self, pdf_path: Path, output_dir: Path, progress_callback=None, status_callback=None,
+                        in_memory: bool = False, pages=None, reuse_pages=None, with_fingerprint: bool = False):
+        """逐页渲染PDF，每保存一页即产出 (页码, 图片路径)，供流水线解析使用
+        
+        in_memory=True 时不写入 output_dir，直接产出 (页码, PNG字节)。
+        pages 指定只处理其中的页码（断点续传）；reuse_pages 中的页面直接沿用 output_dir 下已有的切片。
+        文字层模式为 auto 时每页产出 TextLayerPage：仅文字的页面不渲染、最先产出，
+        图文混排页面按 mixed_dpi 渲染，图片本身放在其 image 属性中。
+        with_fingerprint=True 时产出 (页码, 图片, 页面指纹)：渲染时由pixmap像素直接算出页面过滤所需的指纹，
+        不渲染的页面（仅文字、沿用已有切片）指纹为None。
+        """
+        # 打开PDF文件
+        if status_callback:
+            status_callback("📊 正在打开PDF文件...")
+        
+        pdf_document = fitz.open(str(pdf_path))
+        page_iter = None
+        try:
+            total_pages = len(pdf_document)
+            pages = list(pages) if pages is not None else list(range(1, total_pages + 1))
+            plan = self.plan_text_layer(pdf_document, pages, status_callback) if self.text_layer == "auto" else {}
+            text_only = [(page_num, plan[page_num], None) for page_num in pages if plan.get(page_num) and plan[page_num].route == "text"]
+            image_pages = [page_num for page_num in pages if not (plan.get(page_num) and plan[page_num].route == "text")]
+            reuse_pages = set(reuse_pages or ())
+            reused = [(page_num, output_dir / f"{page_num}.png", None) for page_num in image_pages if page_num in reuse_pages]
+            render_pages = [page_num for page_num in image_pages if page_num not in reuse_pages]
+            # 图文混排页面随文字发送，使用较低DPI
+            page_dpi = {
+                page_num: min(self.dpi, TEXT_LAYER_CONFIG["mixed_dpi"])
+                for page_num in render_pages if plan.get(page_num) and plan[page_num].route == "mixed"
+            }
+            
+            if status_callback:
+                if len(pages) < total_pages:
+                    status_callback(f"📄 PDF共有 {total_pages} 页，本次处理 {len(pages)} 页，开始转换...")
+                else:
+                    status_callback(f"📄 PDF共有 {total_pages} 页，开始转换...")
+            
+            if self.render_workers > 1 and len(render_pages) >= CONCURRENCY_CONFIG["parallel_render_min_pages"]:
+                # 多进程渲染：按页区间分片，每个进程打开自己的文档
+                workers = min(self.render_workers, len(render_pages))
+                if status_callback:
+                    status_callback(f"🚀 使用 {workers} 个进程并行渲染...")
+                page_iter = iter_render_parallel(
+                    pdf_path, None if in_memory else output_dir, self.dpi, total_pages, workers,
+                    chunk_size=CONCURRENCY_CONFIG["render_chunk_size"],
+                    compress_level=self.compress_level,
+                    pages=render_pages,
+                    max_pixels=self.max_pixels,
+                    page_dpi=page_dpi,
+                    with_fingerprint=with_fingerprint
+                )
+            else:
+                page_iter = self._iter_render_serial(
+                    pdf_document, None if in_memory else output_dir, render_pages, status_callback, page_dpi,
+                    with_fingerprint
+                )
+            
+            action = "🧠 已渲染" if in_memory else "💾 已保存"
+            # 仅文字的页面与已有切片的页面先行产出，无需渲染
+            for done_count, (page_num, image, fingerprint) in enumerate(itertools.chain(text_only, reused, page_iter), 1):
+                if page_num in plan and plan[page_num].route != "text":
+                    plan[page_num].image = image
+                    image = plan[page_num]
+                
+                # 更新进度
+                if progress_callback:
+                    progress_callback(done_count / len(pages))
+                
+                if status_callback:
+                    status_callback(f"{action}第 {page_num}/{total_pages} 页（完成 {done_count}/{len(pages)}）")
+                
+                yield (page_num, image, fingerprint) if with_fingerprint else (page_num, image)
+        finally:
+            # 提前结束时也要回收渲染进程
+            if page_iter is not None:
+                page_iter.close()
+            # 关闭PDF文档
+            pdf_document.close()
+    
+    def plan_text_layer(self, pdf_document, pages, status_callback=None) -> dict:
+        """为每页分类文字层发送方式，返回 {页码: TextLayerPage}"""
+        plan = {page_num: classify_text_layer(pdf_document[page_num - 1]) for page_num in pages}
+        if status_callback:
+            routes = [page.route for page in plan.values()]
+            status_callback(
+                f"📝 文字层分类：仅文字 {routes.count('text')} 页，图片+文字 {routes.count('mixed')} 页，"
+                f"仅图片 {routes.count('image')} 页"
+            )
+        return plan
+    
+    def _iter_render_serial(self, pdf_document, output_dir, pages, status_callback=None, page_dpi=None,
+                            with_fingerprint=False):
+        """单进程逐页渲染指定页码，产出 (页码, 图片, 页面指纹)（output_dir为None时图片为字节；page_dpi 为个别页面的DPI）"""
+        total_pages = len(pdf_document)
+        
+        # 处理每一页
+        for page_num in pages:
+            if status_callback:
+                status_callback(f"🔄 转换第 {page_num}/{total_pages} 页...")
+            
+            # 计算缩放比例（自动分辨率模式下每页不同）
+            dpi = (page_dpi or {}).get(page_num, self.dpi)
+            mat = page_matrix(pdf_document[page_num - 1], dpi, self.max_pixels)
+            yield (page_num, *render_page(pdf_document, page_num - 1, mat, output_dir, self.compress_level, with_fingerprint))
+    
+    def split_pdf_to_images(self, pdf_path: Path, output_dir: Path, progress_callback=None, status_callback=None,
+                            pages=None, reuse_pages=None):
+        """将PDF拆分为图片，支持进度回调（pages/reuse_pages 含义同 iter_pdf_images，文字层auto模式下返回 TextLayerPage）"""
+        try:
+            # 并行渲染时页面按完成顺序产出，这里按页码排序
+            saved_images = [
+                image_path for _, image_path in
+                sorted(self.iter_pdf_images(
+                    pdf_path, output_dir, progress_callback, status_callback,
+                    pages=pages, reuse_pages=reuse_pages
+                ))
+            ]
+            
+            if status_callback:
+                status_callback(f"✅ 完成！共转换 {len(saved_images)} 页")
+            
+            return saved_images
+            
+        except Exception as e:
+            if status_callback:
+                status_callback(f"❌ 转换失败: {str(e)}")
+            return []
+    
+    def get_pdf_info(self, pdf_path: Path) -> dict:
+        """获取PDF信息"""
+        try:
+            pdf_document = fitz.open(str(pdf_path))
+            info = {
+                'pages': len(pdf_document),
+                'file_size': pdf_path.stat().st_size,
+                'created_time': datetime.fromtimestamp(pdf_path.stat().st_ctime)
+            }
+            pdf_document.close()
+            return info
+        except Exception as e:
+            return {'error': str(e)}
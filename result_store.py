@@ -0,0 +1,254 @@
+"""
+PDF智能解析工具 - 合并结果存储
+
+逐页结果默认写成 summaries/{页码}.json（失败页为 {页码}_error.txt），页数很多时大量小文件会拖慢
+网络存储上的目录列举、备份与下游加载。合并存储把每个文档的结果追加写入同一个 results.jsonl，
+并维护定长槽位的偏移索引 results.idx（第N页位于第N个槽位），按页码随机读取只需两次定位；
+同一页重新解析时追加新行并覆盖槽位，以最后一次写入为准；discard() 追加删除标记并清空槽位。
+写入由每个文档专用的后台线程批量完成，解析线程只需入队；进程中断后重新打开时，
+按数据文件补齐索引（截去未写完的半行）。export_pages() 可导出为原来的逐页文件布局；
+目录中有合并存储时读取以存储为准，导出的逐页文件只是副本。
+"""
+
+import os
+import json
+import queue
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import RESULT_STORE_CONFIG
+
+# 索引槽位：数据偏移、行长度、状态
+_SLOT = struct.Struct("<QII")
+_EMPTY, _SUCCESS, _FAILED = 0, 1, 2
+
+
+def _line_status(record: Dict) -> int:
+    """数据行对应的槽位状态（删除标记对应空槽位）"""
+    if record.get('discarded'):
+        return _EMPTY
+    return _SUCCESS if record['success'] else _FAILED
+
+
+class ResultStore:
+    """单个文档的合并结果存储：results.jsonl + results.idx（读取线程安全，写入经由后台线程）"""
+
+    def __init__(self, directory: Path, writable: bool = True):
+        self.directory = Path(directory)
+        self.data_path = self.directory / RESULT_STORE_CONFIG["data_file"]
+        self.index_path = self.directory / RESULT_STORE_CONFIG["index_file"]
+        self.writable = writable
+        self.read_lock = threading.Lock()
+        self._data_reader = None
+        self._index_reader = None
+        self.queue: "queue.Queue[Optional[Tuple[int, Dict]]]" = queue.Queue()
+        self.error: Optional[str] = None
+        self.thread = None
+        if writable:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._data = open(self.data_path, "ab")
+            self._index = open(self.index_path, "r+b" if self.index_path.exists() else "w+b")
+            self._recover()
+            self.thread = threading.Thread(target=self._write_loop, name=f"result-store-{self.directory.name}",
+                                           daemon=True)
+            self.thread.start()
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        return (Path(directory) / RESULT_STORE_CONFIG["data_file"]).exists()
+
+    # ---- 写入 ----
+
+    def put(self, page_num: int, record: Dict):
+        """提交一页结果（由后台线程写入）；record 须含 success，以及 content（成功）或 error/report（失败）"""
+        if not self.writable:
+            raise RuntimeError("结果存储以只读方式打开")
+        self.queue.put((page_num, record))
+
+    def discard(self, page_num: int):
+        """删除一页结果（如该页重新判定为空白页、不再保存结果）：追加删除标记，槽位置空"""
+        self.put(page_num, {'success': False, 'discarded': True})
+
+    def flush(self):
+        """等待已提交的结果全部写入"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """写完已提交的结果后关闭文件"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            for handle in (self._data, self._index):
+                handle.flush()
+                os.fsync(handle.fileno())
+                handle.close()
+        with self.read_lock:
+            for handle in (self._data_reader, self._index_reader):
+                if handle is not None:
+                    handle.close()
+            self._data_reader = self._index_reader = None
+
+    def _write_loop(self):
+        """后台写入：一次取出队列中已有的全部结果，追加写入后统一刷新，再更新索引槽位"""
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self._write_batch([item for item in batch if item is not None])
+            except OSError as e:
+                self.error = str(e)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, items: List[Tuple[int, Dict]]):
+        if not items:
+            return
+        offset = self._data.tell()
+        slots = []
+        for page_num, record in items:
+            line = json.dumps(
+                {'page': page_num, **record, 'time': datetime.now().isoformat(timespec="seconds")},
+                ensure_ascii=False
+            ).encode("utf-8") + b"\n"
+            self._data.write(line)
+            slots.append((page_num, offset, len(line), _line_status(record)))
+            offset += len(line)
+        # 先落数据再写索引，读取方按索引读到的总是完整的行
+        self._data.flush()
+        for page_num, line_offset, length, status in slots:
+            self._write_slot(page_num, line_offset, length, status)
+        self._index.flush()
+
+    def _write_slot(self, page_num: int, offset: int, length: int, status: int):
+        self._index.seek((page_num - 1) * _SLOT.size)
+        self._index.write(_SLOT.pack(offset, length, status))
+
+    def _recover(self):
+        """补齐索引：数据文件中索引未覆盖的完整行重新登记，末尾未写完的半行截去"""
+        indexed_end = 0
+        self._index.seek(0)
+        while True:
+            chunk = self._index.read(_SLOT.size * 4096)
+            if not chunk:
+                break
+            for offset, length, status in _SLOT.iter_unpack(chunk[:len(chunk) - len(chunk) % _SLOT.size]):
+                if status != _EMPTY:
+                    indexed_end = max(indexed_end, offset + length)
+        size = self.data_path.stat().st_size
+        if size <= indexed_end:
+            return
+        with open(self.data_path, "rb") as f:
+            f.seek(indexed_end)
+            offset = indexed_end
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._write_slot(record['page'], offset, len(line), _line_status(record))
+                offset += len(line)
+        if offset < size:
+            self._data.truncate(offset)
+            self._data.seek(0, os.SEEK_END)
+        self._index.flush()
+
+    # ---- 读取 ----
+
+    def _slot(self, page_num: int) -> Tuple[int, int, int]:
+        """读取第 page_num 页的索引槽位（调用方持有 read_lock）"""
+        if self._index_reader is None:
+            if not self.index_path.exists():
+                return 0, 0, _EMPTY
+            self._index_reader = open(self.index_path, "rb")
+        self._index_reader.seek((page_num - 1) * _SLOT.size)
+        data = self._index_reader.read(_SLOT.size)
+        if len(data) < _SLOT.size:
+            return 0, 0, _EMPTY
+        return _SLOT.unpack(data)
+
+    def get(self, page_num: int) -> Optional[Dict]:
+        """按页码读取最近一次写入的结果（O(1)：读一个索引槽位，再读一行数据）；没有时返回None"""
+        if page_num < 1:
+            return None
+        with self.read_lock:
+            offset, length, status = self._slot(page_num)
+            if status == _EMPTY:
+                return None
+            if self._data_reader is None:
+                self._data_reader = open(self.data_path, "rb")
+            self._data_reader.seek(offset)
+            return json.loads(self._data_reader.read(length))
+
+    def page_numbers(self, success_only: bool = False) -> List[int]:
+        """已保存结果的页码（按页码排序）"""
+        if not self.index_path.exists():
+            return []
+        with self.read_lock, open(self.index_path, "rb") as f:
+            data = f.read()
+        wanted = (_SUCCESS,) if success_only else (_SUCCESS, _FAILED)
+        return [
+            position + 1 for position, (_, _, status) in enumerate(_SLOT.iter_unpack(data[:len(data) - len(data) % _SLOT.size]))
+            if status in wanted
+        ]
+
+    def __iter__(self) -> Iterator[Tuple[int, Dict]]:
+        """按页码顺序遍历各页最近一次写入的结果"""
+        for page_num in self.page_numbers():
+            record = self.get(page_num)
+            if record is not None:
+                yield page_num, record
+
+    def export_pages(self, target_dir: Optional[Path] = None) -> int:
+        """导出为逐页文件布局（{页码}.json / {页码}_error.txt，与原有输出一致），返回导出的页数"""
+        target_dir = Path(target_dir or self.directory)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        count = 0
+        for page_num, record in self:
+            if record['success']:
+                (target_dir / f"{page_num}.json").write_text(record['content'], encoding="utf-8")
+            else:
+                (target_dir / f"{page_num}_error.txt").write_text(record.get('report') or record['error'],
+                                                                   encoding="utf-8")
+            count += 1
+        return count
+
+
+def stored_pages(directory: Path) -> Set[int]:
+    """目录中已保存成功结果的页码：有合并存储时以其为准（逐页文件可能是过时的导出），否则为逐页的 {页码}.json"""
+    directory = Path(directory)
+    if ResultStore.exists(directory):
+        store = ResultStore(directory, writable=False)
+        pages = set(store.page_numbers(success_only=True))
+        store.close()
+        return pages
+    if not directory.is_dir():
+        return set()
+    return {int(path.stem) for path in directory.glob("*.json") if path.stem.isdigit()}
+
+
+def read_page(directory: Path, page_num: int) -> Optional[str]:
+    """读取目录中某页的成功结果：有合并存储时以其为准，否则读取逐页的 {页码}.json；没有时返回None"""
+    directory = Path(directory)
+    if ResultStore.exists(directory):
+        store = ResultStore(directory, writable=False)
+        record = store.get(page_num)
+        store.close()
+        return record['content'] if record and record['success'] else None
+    path = directory / f"{page_num}.json"
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    return None
@@ -0,0 +1,182 @@
+"""
+PDF智能解析工具 - 解析结果校验与本地修复
+
+预设提示词要求模型只返回一行JSON，但模型偶尔会包上代码块标记、在JSON前后附带说明文字、
+在值中直接写双引号，或者漏键、把数组写成字符串。这里按预设的键结构（PRESET_SCHEMAS）校验每页结果，
+能在本地修复的直接修复（不再请求API），修不好的才交由调用方单独重新请求该页。
+"""
+
+import re
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import PRESET_PROMPTS, PRESET_SCHEMAS, VALIDATION_CONFIG
+
+_FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*(.*?)\s*```", re.S)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+_DECODER = json.JSONDecoder(strict=False)
+
+# 校验结果状态
+VALIDATION_STATUSES = {
+    "valid": "直接通过",
+    "repaired": "本地修复",
+    "reasked": "重新请求后通过",
+    "invalid": "未通过"
+}
+
+
+@lru_cache(maxsize=32)
+def schema_for_prompt(prompt: str) -> Optional[Dict[str, type]]:
+    """提示词对应的键结构：与预设完全相同时取该预设的结构，否则取提示词中出现了全部键名的预设（键最多者）"""
+    for name, preset in PRESET_PROMPTS.items():
+        if prompt == preset:
+            return PRESET_SCHEMAS.get(name)
+    matched = [
+        schema for schema in PRESET_SCHEMAS.values()
+        if schema and all(f'"{key}"' in prompt for key in schema)
+    ]
+    return max(matched, key=len) if matched else None
+
+
+def escape_inner_quotes(text: str) -> str:
+    """转义字符串值中未转义的双引号：字符串内的引号后面（跳过空白）不是 , : } ] 时视为值中的引号"""
+    chars = []
+    in_string = escape = False
+    for position, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                following = text[position + 1:].lstrip()[:1]
+                if following and following not in ",:}]":
+                    chars.append('\\"')
+                    continue
+                in_string = False
+        elif char == '"':
+            in_string = True
+        chars.append(char)
+    return "".join(chars)
+
+
+def repair_json(content: str) -> Tuple[Optional[Any], List[str]]:
+    """解析模型输出的JSON，必要时依次尝试本地修复，返回 (解析出的值, 所做的修复)；无法修复时值为None"""
+    text = content.strip()
+    try:
+        return json.loads(text), []
+    except ValueError:
+        pass
+
+    repairs = []
+    fenced = _FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+        repairs.append("去除代码块标记")
+    starts = [position for position in (text.find("{"), text.find("[")) if position >= 0]
+    if not starts:
+        return None, repairs
+    if min(starts) > 0:
+        repairs.append("去除JSON前的多余文字")
+        text = text[min(starts):]
+
+    steps = (
+        (None, lambda value: value),
+        ("转义值中的双引号", escape_inner_quotes),
+        ("去除多余的逗号", lambda value: _TRAILING_COMMA_PATTERN.sub(r"\1", value))
+    )
+    applied = []
+    for label, step in steps:
+        repaired = step(text)
+        if label:
+            if repaired == text:
+                # 这一步没有改动文字：不记入修复，也无需再次解析
+                continue
+            applied.append(label)
+        text = repaired
+        try:
+            value, end = _DECODER.raw_decode(text)
+        except ValueError:
+            continue
+        repairs.extend(applied)
+        if text[end:].strip().strip("`"):
+            repairs.append("去除JSON后的多余文字")
+        return value, repairs
+    return None, repairs
+
+
+def check_schema(value: Any, schema: Dict[str, type]) -> Tuple[Any, List[str], List[str]]:
+    """按键结构检查并规整结果，返回 (规整后的值, 所做的修复, 无法修复的问题)
+
+    多余的键删除、键顺序按模板调整、数组被写成字符串时拆分、数字与null转为字符串；
+    缺少键或值的类型无法转换时记为问题。
+    """
+    if not isinstance(value, dict):
+        return value, [], ["结果不是JSON对象"]
+    if not schema:
+        return value, [], []
+
+    repairs, problems = [], []
+    missing = [key for key in schema if key not in value]
+    if missing:
+        problems.append(f"缺少键: {'、'.join(missing)}")
+    extra = [key for key in value if key not in schema]
+    if extra:
+        repairs.append(f"删除多余的键: {'、'.join(extra)}")
+    if not missing and list(value)[:len(schema)] != list(schema):
+        repairs.append("按模板调整键顺序")
+
+    result = {}
+    for key, expected in schema.items():
+        if key not in value:
+            continue
+        item = value[key]
+        if expected is list and isinstance(item, str):
+            item = [part.strip() for part in re.split(VALIDATION_CONFIG["list_separators"], item) if part.strip()]
+            repairs.append(f"{key} 由字符串拆分为数组")
+        elif expected is list and isinstance(item, list) and not all(isinstance(part, str) for part in item):
+            if any(isinstance(part, (dict, list)) for part in item):
+                problems.append(f"{key} 的元素应为字符串")
+            else:
+                item = ["" if part is None else str(part) for part in item]
+                repairs.append(f"{key} 的元素转为字符串")
+        elif expected is str and (item is None or isinstance(item, (int, float))) and not isinstance(item, bool):
+            item = "" if item is None else str(item)
+            repairs.append(f"{key} 转为字符串")
+        elif not isinstance(item, expected):
+            problems.append(f"{key} 应为{'数组' if expected is list else '字符串'}")
+        result[key] = item
+    return result, repairs, problems
+
+
+def validate_content(content: str, schema: Dict[str, type]) -> Dict:
+    """校验并尽量修复一页结果，返回 {'status', 'content', 'repairs', 'problems'}
+
+    status 为 valid（原样通过）/ repaired（修复后的内容为单行JSON）/ invalid（content 为原始输出）。
+    """
+    value, repairs = repair_json(content or "")
+    if value is None:
+        return {'status': "invalid", 'content': content, 'repairs': repairs, 'problems': ["无法解析为JSON"]}
+    value, schema_repairs, problems = check_schema(value, schema)
+    repairs += schema_repairs
+    if problems:
+        return {'status': "invalid", 'content': content, 'repairs': repairs, 'problems': problems}
+    if not repairs:
+        return {'status': "valid", 'content': content, 'repairs': [], 'problems': []}
+    return {'status': "repaired", 'content': json.dumps(value, ensure_ascii=False), 'repairs': repairs, 'problems': []}
+
+
+def reask_instruction(problems: List[str], schema: Dict[str, type]) -> str:
+    """重新请求时附在对话末尾的纠正说明"""
+    keys = f"，键依次为 {'、'.join(schema)}" if schema else ""
+    return (f"上面的输出未通过校验（{'；'.join(problems)}）。请重新输出本页结果：只输出一行合法的JSON对象{keys}，"
+            f"值中的双引号需要转义，不要输出代码块标记或任何其他文字。")
+
+
+def describe_validation(info: Dict) -> str:
+    """校验信息的简短描述"""
+    label = VALIDATION_STATUSES.get(info['status'], info['status'])
+    details = info.get('problems') or info.get('repairs') or []
+    reasks = f"，重新请求 {info['reasks']} 次" if info.get('reasks') else ""
+    return f"{label}{reasks}" + (f"：{'；'.join(details)}" if details else "")
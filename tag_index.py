@@ -0,0 +1,380 @@
+"""
+PDF智能解析工具 - 标签倒排索引
+
+“设计方案分析”“图集识别”等预设让每页结果带有 tag 数组，用于按标签查找页面。
+这里在本地SQLite中维护 标签 → (文档, 页码) 的倒排索引：解析结果写入时增量更新（同一页重新解析时替换原有标签），
+postings 表以 (标签, 文档, 页码) 为主键，同一标签的页面在B树中连续有序；
+AND 检索从页数最少的标签出发，逐页按主键核对其余标签；OR 检索按 (文档, 页码) 归并各标签的有序列表。
+结果按 (文档, 页码) 分页读取，只需读到所需的位置；命中总数只精确统计到 count_limit 页，超出时给出下限。
+tags、documents 表随写入维护标签与文档的页数，标签频次与索引规模的统计不需要扫描。
+rebuild() 可从已有的输出目录补建索引。
+
+用法（在项目根目录运行）：
+    python tag_index.py rebuild ~/Desktop/PDF解析结果
+    python tag_index.py search 住宅 景观 [--or]
+    python tag_index.py top --limit 30
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import TAG_INDEX_CONFIG, TAG_SEARCH_MODES, OUTPUT_CONFIG, RESULT_STORE_CONFIG, VALIDATION_CONFIG
+from result_store import ResultStore
+from result_validator import repair_json
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_tag(tag) -> str:
+    """标签规整：去除首尾空白、合并连续空白、英文字母转小写"""
+    return _WHITESPACE_PATTERN.sub(" ", str(tag)).strip().lower()
+
+
+def page_tags(content: str) -> Tuple[List[str], str]:
+    """从一页结果中取出规整后的标签（去重并保持顺序）与页面名称；结果不是JSON对象时标签为空"""
+    value, _ = repair_json(content or "")
+    if not isinstance(value, dict):
+        return [], ""
+    raw = value.get("tag") or []
+    if isinstance(raw, str):
+        raw = re.split(VALIDATION_CONFIG["list_separators"], raw)
+    if not isinstance(raw, list):
+        raw = []
+    tags = (normalize_tag(item) for item in raw if isinstance(item, (str, int, float)))
+    return list(dict.fromkeys(tag for tag in tags if tag)), str(value.get("page_name") or "")
+
+
+def document_identity(output_dir: Path) -> Tuple[str, str]:
+    """文档的 (结果目录绝对路径, 显示名称)：PDF的结果目录为 <文档>/summaries，显示名称取文档目录名"""
+    directory = Path(output_dir).resolve()
+    if directory.name == OUTPUT_CONFIG["summaries_subdir"]:
+        return str(directory), directory.parent.name
+    return str(directory), directory.name
+
+
+def result_directories(root: Path) -> List[Path]:
+    """输出目录下保存有逐页结果（{页码}.json）或合并存储的全部结果目录"""
+    root = Path(root)
+    directories = {path.parent for path in root.rglob("*.json") if path.stem.isdigit()}
+    directories.update(path.parent for path in root.rglob(RESULT_STORE_CONFIG["data_file"]))
+    return sorted(directories)
+
+
+def directory_pages(directory: Path) -> Dict[int, str]:
+    """结果目录中各成功页的内容（有合并存储时以其为准，逐页文件可能是过时的导出，与 read_page 一致）"""
+    directory = Path(directory)
+    if ResultStore.exists(directory):
+        store = ResultStore(directory, writable=False)
+        pages = {page_num: record['content'] for page_num, record in store if record['success']}
+        store.close()
+        return pages
+    return {int(path.stem): path.read_text(encoding="utf-8") for path in directory.glob("*.json") if path.stem.isdigit()}
+
+
+class TagIndex:
+    """基于SQLite的标签倒排索引（线程安全）"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+        self._documents: Dict[str, int] = {}
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                pages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER PRIMARY KEY,
+                tag TEXT NOT NULL UNIQUE,
+                pages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_tags_pages ON tags(pages);
+            CREATE TABLE IF NOT EXISTS pages (
+                doc_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                PRIMARY KEY (doc_id, page)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                tag_id INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                PRIMARY KEY (tag_id, doc_id, page)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.conn.commit()
+
+    # ---- 写入（调用方持有 lock 并处于事务中） ----
+
+    def _document_id(self, path: str, name: str) -> int:
+        doc_id = self._documents.get(path)
+        if doc_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO documents (path, name) VALUES (?, ?)", (path, name))
+            doc_id = self.conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()[0]
+            self._documents[path] = doc_id
+        return doc_id
+
+    def _tag_ids(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(tags)
+        self.conn.executemany("INSERT OR IGNORE INTO tags (tag) VALUES (?)", ((tag,) for tag in tags))
+        return {tag: self.conn.execute("SELECT id FROM tags WHERE tag = ?", (tag,)).fetchone()[0] for tag in tags}
+
+    def _remove_pages(self, doc_id: int, pages: Optional[List[int]] = None):
+        """删除文档中指定页（None 表示全部页）的索引，并扣减相应标签的页数"""
+        if pages is None:
+            rows = self.conn.execute("SELECT page, tags FROM pages WHERE doc_id = ?", (doc_id,)).fetchall()
+        else:
+            rows = [
+                row for row in (
+                    self.conn.execute("SELECT page, tags FROM pages WHERE doc_id = ? AND page = ?",
+                                      (doc_id, page)).fetchone() for page in pages
+                ) if row
+            ]
+        if not rows:
+            return
+        removed = [(page, json.loads(tags)) for page, tags in rows]
+        tag_ids = self._tag_ids({tag for _, tags in removed for tag in tags})
+        self.conn.executemany(
+            "DELETE FROM postings WHERE tag_id = ? AND doc_id = ? AND page = ?",
+            ((tag_ids[tag], doc_id, page) for page, tags in removed for tag in tags)
+        )
+        counts = Counter(tag for _, tags in removed for tag in tags)
+        self.conn.executemany("UPDATE tags SET pages = pages - ? WHERE id = ?",
+                              ((count, tag_ids[tag]) for tag, count in counts.items()))
+        self.conn.executemany("DELETE FROM pages WHERE doc_id = ? AND page = ?",
+                              ((doc_id, page) for page, _ in removed))
+        self.conn.execute("UPDATE documents SET pages = pages - ? WHERE id = ?", (len(removed), doc_id))
+
+    def _add_pages(self, doc_id: int, pages: List[Tuple[int, List[str], str]]):
+        """登记各页的标签（只登记带标签的页面）"""
+        pages = [(page, tags, name) for page, tags, name in pages if tags]
+        if not pages:
+            return
+        tag_ids = self._tag_ids({tag for _, tags, _ in pages for tag in tags})
+        self.conn.executemany(
+            "INSERT INTO pages (doc_id, page, name, tags) VALUES (?, ?, ?, ?)",
+            ((doc_id, page, name, json.dumps(tags, ensure_ascii=False)) for page, tags, name in pages)
+        )
+        self.conn.executemany(
+            "INSERT INTO postings (tag_id, doc_id, page) VALUES (?, ?, ?)",
+            ((tag_ids[tag], doc_id, page) for page, tags, _ in pages for tag in tags)
+        )
+        counts = Counter(tag for _, tags, _ in pages for tag in tags)
+        self.conn.executemany("UPDATE tags SET pages = pages + ? WHERE id = ?",
+                              ((count, tag_ids[tag]) for tag, count in counts.items()))
+        self.conn.execute("UPDATE documents SET pages = pages + ? WHERE id = ?", (len(pages), doc_id))
+
+    def index_page(self, output_dir: Path, page_num: int, content: str) -> List[str]:
+        """登记一页结果的标签（替换该页原有的标签），返回登记的标签"""
+        tags, name = page_tags(content)
+        path, document = document_identity(output_dir)
+        with self.lock, self.conn:
+            doc_id = self._document_id(path, document)
+            self._remove_pages(doc_id, [page_num])
+            self._add_pages(doc_id, [(page_num, tags, name)])
+        return tags
+
+    def index_document(self, output_dir: Path, pages: Dict[int, str]) -> int:
+        """以给定的各页结果整体替换文档的索引（单个事务），返回带标签的页数"""
+        entries = [(page_num, *page_tags(content)) for page_num, content in sorted(pages.items())]
+        path, document = document_identity(output_dir)
+        with self.lock, self.conn:
+            doc_id = self._document_id(path, document)
+            self._remove_pages(doc_id)
+            self._add_pages(doc_id, entries)
+        return sum(1 for _, tags, _ in entries if tags)
+
+    def remove_document(self, path: str):
+        """删除文档的全部索引"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return
+            self._remove_pages(row[0])
+            self.conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+            self._documents.pop(path, None)
+
+    def rebuild(self, root: Path) -> Dict:
+        """按输出目录中已保存的结果重建其下全部文档的索引，并删除结果目录已不存在的文档"""
+        root = Path(root).resolve()
+        directories = result_directories(root)
+        pages = sum(self.index_document(directory, directory_pages(directory)) for directory in directories)
+        found = {document_identity(directory)[0] for directory in directories}
+        prefix = str(root) + os.sep
+        with self.lock:
+            known = [path for (path,) in self.conn.execute("SELECT path FROM documents")]
+        stale = [path for path in known if path.startswith(prefix) and path not in found]
+        for path in stale:
+            self.remove_document(path)
+        return {'documents': len(directories), 'pages': pages, 'removed': len(stale)}
+
+    # ---- 检索 ----
+
+    def search(self, tags: Iterable[str], mode: str = "and", limit: Optional[int] = None,
+               offset: int = 0) -> Dict:
+        """按标签检索页面，按 (文档, 页码) 排序，返回 {'total', 'exact', 'hits', 'elapsed_ms'}
+
+        and：同时包含全部标签；or：包含任一标签。命中超过 count_limit 页时 exact 为False，total 为下限。
+        每个命中页为 {'document'（结果目录）, 'name'（文档名称）, 'page', 'page_name', 'tags', 'matched'（命中的标签数）}。
+        """
+        if mode not in TAG_SEARCH_MODES:
+            raise ValueError(f"未知的检索方式: {mode}")
+        started = time.perf_counter()
+        wanted = list(dict.fromkeys(tag for tag in map(normalize_tag, tags) if tag))
+        limit = TAG_INDEX_CONFIG["max_results"] if limit is None else limit
+        with self.lock:
+            found = self.conn.execute(
+                f"SELECT id, pages FROM tags WHERE pages > 0 AND tag IN ({','.join('?' * len(wanted))})", wanted
+            ).fetchall() if wanted else []
+            if not found or (mode == "and" and len(found) < len(wanted)):
+                total, exact, rows = 0, True, []
+            elif mode == "and" or len(found) == 1:
+                total, exact, rows = self._search_all(sorted(found, key=lambda row: row[1]), limit, offset)
+            else:
+                total, exact, rows = self._search_any(found, limit, offset)
+            hits = [self._hit(doc_id, page, set(wanted)) for doc_id, page in rows]
+        return {'total': total, 'exact': exact, 'hits': hits,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+    def _count(self, query: str, params: List) -> Tuple[int, bool]:
+        """统计查询的行数，最多数到 count_limit 行，返回 (行数, 是否精确)"""
+        cap = TAG_INDEX_CONFIG["count_limit"]
+        count = self.conn.execute(f"SELECT COUNT(*) FROM ({query} LIMIT ?)", params + [cap + 1]).fetchone()[0]
+        return (count, True) if count <= cap else (cap, False)
+
+    def _search_all(self, found: List[Tuple[int, int]], limit: int, offset: int) -> Tuple[int, bool, List]:
+        """AND：从页数最少的标签出发（CROSS JOIN 固定连接顺序），其余标签按主键逐页核对"""
+        (first, first_pages), rest = found[0], found[1:]
+        if not rest:
+            rows = self.conn.execute(
+                "SELECT doc_id, page FROM postings WHERE tag_id = ? ORDER BY doc_id, page LIMIT ? OFFSET ?",
+                (first, limit, offset)
+            ).fetchall()
+            return first_pages, True, rows
+        joins = "".join(
+            f" CROSS JOIN postings p{i} ON p{i}.tag_id = ? AND p{i}.doc_id = p0.doc_id AND p{i}.page = p0.page"
+            for i in range(1, len(found))
+        )
+        query = f"SELECT p0.doc_id, p0.page FROM postings p0{joins} WHERE p0.tag_id = ? ORDER BY p0.doc_id, p0.page"
+        params = [tag_id for tag_id, _ in rest] + [first]
+        total, exact = self._count(query, params)
+        rows = self.conn.execute(f"{query} LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        return total, exact, rows
+
+    def _search_any(self, found: List[Tuple[int, int]], limit: int, offset: int) -> Tuple[int, bool, List]:
+        """OR：各标签的有序列表按 (文档, 页码) 归并去重（UNION ... ORDER BY 走归并，读到所需位置即停）"""
+        query = " UNION ".join(["SELECT doc_id, page FROM postings WHERE tag_id = ?"] * len(found)) + " ORDER BY 1, 2"
+        params = [tag_id for tag_id, _ in found]
+        total, exact = self._count(query, params)
+        if not exact:
+            # 命中数至少为其中页数最多的标签的页数
+            total = max(total, max(pages for _, pages in found))
+        rows = self.conn.execute(f"{query} LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        return total, exact, rows
+
+    def _hit(self, doc_id: int, page: int, wanted: set) -> Dict:
+        path, name, page_name, tags = self.conn.execute(
+            "SELECT d.path, d.name, p.name, p.tags FROM pages p JOIN documents d ON d.id = p.doc_id "
+            "WHERE p.doc_id = ? AND p.page = ?", (doc_id, page)
+        ).fetchone()
+        tags = json.loads(tags)
+        return {'document': path, 'name': name, 'page': page, 'page_name': page_name,
+                'tags': tags, 'matched': len(wanted.intersection(tags))}
+
+    def top_tags(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """页数最多的标签及其页数"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT tag, pages FROM tags WHERE pages > 0 ORDER BY pages DESC, tag LIMIT ?",
+                (limit or TAG_INDEX_CONFIG["top_tags"],)
+            ).fetchall()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            documents, pages = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM documents WHERE pages > 0"
+            ).fetchone()
+            tags = self.conn.execute("SELECT COUNT(*) FROM tags WHERE pages > 0").fetchone()[0]
+        return {'documents': documents, 'pages': pages, 'tags': tags}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def describe_total(result: Dict) -> str:
+    """检索结果命中数的描述（超出精确统计上限时为“至少 N 页”）"""
+    return f"{result['total']} 页" if result['exact'] else f"至少 {result['total']} 页"
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_tag_index() -> Optional[TagIndex]:
+    """获取进程内共享的标签索引；未启用时返回None"""
+    global _shared_index
+    if not TAG_INDEX_CONFIG["enabled"]:
+        return None
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = TagIndex(Path(TAG_INDEX_CONFIG["path"]))
+        return _shared_index
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="标签倒排索引：补建索引、按标签检索页面、统计标签频次")
+    parser.add_argument("--db", type=Path, default=Path(TAG_INDEX_CONFIG["path"]), help="索引数据库路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="按输出目录中已保存的结果重建索引")
+    rebuild.add_argument("root", type=Path, help="输出目录")
+    search = commands.add_parser("search", help="按标签检索页面")
+    search.add_argument("tags", nargs="+", help="标签")
+    search.add_argument("--or", dest="mode", action="store_const", const="or", default="and",
+                        help="包含任一标签即可（默认须同时包含全部标签）")
+    search.add_argument("--limit", type=int, default=TAG_INDEX_CONFIG["max_results"], help="最多显示的页数")
+    top = commands.add_parser("top", help="标签频次统计")
+    top.add_argument("--limit", type=int, default=TAG_INDEX_CONFIG["top_tags"], help="显示的标签数")
+    args = parser.parse_args(argv)
+
+    index = TagIndex(args.db)
+    try:
+        if args.command == "rebuild":
+            started = time.perf_counter()
+            result = index.rebuild(args.root)
+            print(f"已索引 {result['documents']} 个结果目录、{result['pages']} 个带标签的页面，"
+                  f"移除 {result['removed']} 个已不存在的文档，用时 {time.perf_counter() - started:.1f} 秒")
+        elif args.command == "search":
+            result = index.search(args.tags, args.mode, args.limit)
+            print(f"{TAG_SEARCH_MODES[args.mode]}：命中 {describe_total(result)}（{result['elapsed_ms']} ms）")
+            for hit in result['hits']:
+                print(f"  {hit['name']} 第{hit['page']}页 {hit['page_name']} [{'、'.join(hit['tags'])}]")
+        else:
+            for tag, pages in index.top_tags(args.limit):
+                print(f"{pages:>8}  {tag}")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,85 +2,937 @@
 PDF智能解析工具 - 工具模块
 """
 
+import io
+import re
+import json
 import os
+import math
+import time
+import queue
+import random
+import asyncio
 import base64
+import hashlib
+import sqlite3
 import threading
 import concurrent.futures
+import multiprocessing
+from collections import deque
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterable, Union
 
 from PIL import Image
-from openai import OpenAI
-import streamlit as st
+import openai
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 
-from config import ARK_API_CONFIG, ERROR_MESSAGES, SUCCESS_MESSAGES
+# openai>=1.x 基于httpx，新版本改为httpx2（接口相同）
+try:
+    import httpx
+except ImportError:
+    import httpx2 as httpx
+
+# 尝试导入PyMuPDF（渲染进程池中使用）
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+from config import (
+    ARK_API_CONFIG, GENERATION_CONFIG, HTTP_CONFIG, ADAPTIVE_CONFIG, RETRY_CONFIG, SCHEDULE_POLICIES,
+    RESOLUTION_CONFIG, UPLOAD_CONFIG, PAGE_FILTER_CONFIG, PACK_CONFIG, PROMPT_LAYOUT_CONFIG, PROMPT_LAYOUTS, METRICS_CONFIG,
+    STREAM_CONFIG, VALIDATION_CONFIG, RESULT_STORE_CONFIG, RESULT_STORE_FORMATS, TEXT_LAYER_ROUTES, ERROR_MESSAGES, SUCCESS_MESSAGES
+)
+from parse_cache import ParseCache, get_parse_cache
+from job_manifest import JobManifest
+from page_filter import PageFilter, filtered_outcome, describe_filter, pixmap_fingerprint, save_filter_record
+from metrics import MetricsLog
+from result_store import ResultStore
+from tag_index import TagIndex, get_tag_index
+from result_validator import schema_for_prompt, validate_content, reask_instruction, describe_validation
+
+
+# 进程内共享的OpenAI客户端池：按 (base_url, api_key, timeout, max_retries) 复用，保留长连接
+_client_pool: Dict[Tuple[str, str, float, int], OpenAI] = {}
+_client_pool_lock = threading.Lock()
+
+
+def get_shared_client(base_url: str, api_key: str, timeout: float, max_retries: int = None) -> OpenAI:
+    """获取共享的OpenAI客户端（线程安全，跨页面、文件和Streamlit会话复用连接）"""
+    if max_retries is None:
+        max_retries = HTTP_CONFIG["sdk_max_retries"]
+    key = (base_url, api_key, float(timeout), max_retries)
+    with _client_pool_lock:
+        client = _client_pool.get(key)
+        if client is None:
+            http_client = DefaultHttpxClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=HTTP_CONFIG["max_connections"],
+                    max_keepalive_connections=HTTP_CONFIG["max_keepalive_connections"],
+                    keepalive_expiry=HTTP_CONFIG["keepalive_expiry"]
+                )
+            )
+            client = OpenAI(
+                base_url=base_url, api_key=api_key, timeout=timeout,
+                max_retries=max_retries, http_client=http_client
+            )
+            _client_pool[key] = client
+        return client
+
+
+def close_shared_clients():
+    """关闭所有共享客户端（用于进程退出前释放连接）"""
+    with _client_pool_lock:
+        for client in _client_pool.values():
+            client.close()
+        _client_pool.clear()
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """解析 Retry-After / retry-after-ms 响应头，返回需要等待的秒数"""
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RunawayOutputError(Exception):
+    """流式接收时模型输出失控（迟迟不出现JSON或超出字数上限），已提前断开"""
+
+
+def classify_api_error(error: Exception) -> Dict:
+    """对API异常分类，返回 {'kind', 'status', 'retry_after', 'overload', 'retryable'}
+    
+    overload 为 True 表示服务端过载信号（429、5xx、超时），自适应并发据此回退；
+    retryable 为 False 的错误（鉴权失败、请求无效等）重试也不会成功，直接判定失败。
+    """
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    retry_after = parse_retry_after(getattr(response, "headers", None))
+    
+    if isinstance(error, RunawayOutputError):
+        kind = "runaway"
+    elif isinstance(error, openai.APITimeoutError):
+        kind = "timeout"
+    elif isinstance(error, openai.APIConnectionError):
+        kind = "connection"
+    elif status == 429:
+        kind = "rate_limit"
+    elif status is not None and status >= 500:
+        kind = "server"
+    elif status in (401, 403):
+        kind = "auth"
+    elif status is not None and 400 <= status < 500:
+        kind = "invalid_request"
+    else:
+        kind = "other"
+    
+    return {
+        'kind': kind,
+        'status': status,
+        'retry_after': retry_after,
+        'overload': kind in ("rate_limit", "server", "timeout"),
+        'retryable': kind in ("rate_limit", "server", "timeout", "connection", "runaway")
+    }
+
+
+def retry_delay(attempt: int, error_info: Dict) -> float:
+    """第 attempt 次失败后的等待时间：指数退避 + 全抖动，服务端给出 Retry-After 时以其为下限"""
+    cap = min(RETRY_CONFIG["max_delay"], RETRY_CONFIG["base_delay"] * 2 ** (attempt - 1))
+    delay = random.uniform(0, cap)
+    retry_after = error_info.get('retry_after')
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_CONFIG["max_delay"]))
+    return delay
+
+
+class RetryBudget:
+    """单个解析任务共享的重试预算，端点持续不可用时避免重试把请求量成倍放大"""
+    
+    def __init__(self, total: int):
+        self.total = total
+        self.used = 0
+        self.denied = 0
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def for_pages(cls, page_count: int) -> "RetryBudget":
+        """按页数计算预算：页数 × budget_ratio，且不少于 min_budget"""
+        return cls(max(RETRY_CONFIG["min_budget"], int(page_count * RETRY_CONFIG["budget_ratio"])))
+    
+    def try_spend(self) -> bool:
+        """消耗一次重试机会；预算用尽时返回False"""
+        with self.lock:
+            if self.used >= self.total:
+                self.denied += 1
+                return False
+            self.used += 1
+            return True
+
+
+class AdaptiveConcurrencyController:
+    """AIMD自适应并发控制器
+    
+    请求健康时每个窗口（约等于当前并发数个成功请求）线性加一；
+    遇到429/5xx/超时或p95延迟明显高于基线时按系数成倍回退，并遵守 Retry-After 暂停发新请求。
+    线程引擎使用 acquire/release，异步引擎使用 acquire_async/release。
+    """
+    
+    def __init__(self, max_limit: int, initial: Optional[int] = None, min_limit: int = 1):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        if initial is None:
+            initial = round(self.max_limit * ADAPTIVE_CONFIG["initial_fraction"])
+        self.limit = float(min(self.max_limit, max(min_limit, initial)))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latencies = deque(maxlen=ADAPTIVE_CONFIG["latency_window"])
+        self.baseline_p95 = None
+        self.window_successes = 0
+        self.last_decrease = 0.0
+        self.started = time.monotonic()
+        self.history = [(0.0, int(self.limit), "初始")]
+        self.cond = threading.Condition()
+    
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+    
+    def _can_start(self) -> bool:
+        return self.in_flight < int(self.limit) and time.monotonic() >= self.paused_until
+    
+    def try_acquire(self) -> bool:
+        """尝试占用一个在途名额（不阻塞）"""
+        with self.cond:
+            if self._can_start():
+                self.in_flight += 1
+                return True
+            return False
+    
+    def acquire(self):
+        """阻塞直到可以发起新请求（线程引擎）"""
+        with self.cond:
+            while not self._can_start():
+                self.cond.wait(timeout=max(0.05, min(1.0, self.paused_until - time.monotonic())))
+            self.in_flight += 1
+    
+    async def acquire_async(self):
+        """等待直到可以发起新请求（异步引擎）"""
+        while not self.try_acquire():
+            await asyncio.sleep(0.05)
+    
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+    
+    def _record(self, reason: str):
+        self.history.append((round(time.monotonic() - self.started, 1), int(self.limit), reason))
+        self.cond.notify_all()
+    
+    def _p95(self) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+    
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self.last_decrease < ADAPTIVE_CONFIG["decrease_cooldown"]:
+            return
+        self.last_decrease = now
+        self.window_successes = 0
+        new_limit = max(self.min_limit, int(self.limit * ADAPTIVE_CONFIG["decrease_factor"]))
+        if new_limit != int(self.limit):
+            self.limit = float(new_limit)
+            self._record(reason)
+    
+    def on_success(self, latency: float):
+        """记录一次成功请求的API耗时"""
+        with self.cond:
+            self.latencies.append(latency)
+            self.window_successes += 1
+            if self.window_successes < max(1, int(self.limit)):
+                return
+            self.window_successes = 0
+            
+            if len(self.latencies) >= min(10, self.latencies.maxlen):
+                p95 = self._p95()
+                if self.baseline_p95 is None or p95 < self.baseline_p95:
+                    self.baseline_p95 = p95
+                elif p95 > self.baseline_p95 * ADAPTIVE_CONFIG["latency_tolerance"]:
+                    self._decrease(f"p95延迟升高({p95:.1f}s)")
+                    return
+            
+            if int(self.limit) < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + ADAPTIVE_CONFIG["increase_step"])
+                self._record("健康增长")
+    
+    def on_error(self, error_info: Dict):
+        """记录一次失败请求，过载类错误触发回退"""
+        with self.cond:
+            retry_after = error_info.get('retry_after')
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if error_info.get('overload'):
+                label = error_info.get('status') or error_info.get('kind')
+                self._decrease(f"过载({label})")
+    
+    def describe(self) -> str:
+        """状态栏中显示的简要信息"""
+        with self.cond:
+            return f"并发上限: {int(self.limit)}/{self.max_limit}（在途 {self.in_flight}）"
+    
+    def to_dict(self) -> Dict:
+        with self.cond:
+            limits = [limit for _, limit, _ in self.history]
+            recent = self.history[-20:]
+            return {
+                '最终并发上限': int(self.limit),
+                '并发上限范围': f"{min(limits)} ~ {max(limits)}（允许 {self.min_limit} ~ {self.max_limit}）",
+                '调整次数': len(self.history) - 1,
+                '基线p95延迟(秒)': round(self.baseline_p95, 2) if self.baseline_p95 is not None else "",
+                '调整历史(秒:上限)': ", ".join(f"{t}s:{limit}({reason})" for t, limit, reason in recent)
+            }
+
+
+def observe_outcome(controller: Optional[AdaptiveConcurrencyController], outcome: Dict):
+    """将单页请求结果反馈给自适应并发控制器（缓存命中不计入）"""
+    if controller is None:
+        return
+    if outcome['success'] and 'latency' in outcome:
+        controller.on_success(outcome['latency'])
+    elif 'error_info' in outcome:
+        controller.on_error(outcome['error_info'])
 
 
 class AIParser:
     """AI解析器"""
     
-    def __init__(self, api_key: str, timeout: int = 60):
+    def __init__(
+        self,
+        api_key: str,
+        timeout: int = 60,
+        bypass_cache: bool = False,
+        cache: Optional[ParseCache] = None,
+        max_retries: Optional[int] = None,
+        upload_format: Optional[str] = None,
+        upload_quality: Optional[int] = None,
+        page_filter: Optional[bool] = None,
+        pack_size: Optional[int] = None,
+        prompt_layout: Optional[str] = None,
+        stream: Optional[bool] = None,
+        validate: Optional[bool] = None,
+        result_store: Optional[str] = None,
+        tag_index: Optional[TagIndex] = None
+    ):
         self.api_key = api_key
         self.timeout = timeout
+        # openai SDK内部重试次数（默认0：重试由 parse_page 按 RETRY_CONFIG 统一处理，自适应并发可感知每一次429/5xx）
+        self.max_retries = HTTP_CONFIG["sdk_max_retries"] if max_retries is None else max_retries
         self.base_url = ARK_API_CONFIG["base_url"]
         self.model = ARK_API_CONFIG["model"]
+        self.generation_params = dict(GENERATION_CONFIG)
+        # 上传编码（见 encode_for_upload）
+        self.upload_format = upload_format or UPLOAD_CONFIG["format"]
+        self.upload_quality = upload_quality or UPLOAD_CONFIG["quality"]
+        # 解析前跳过空白页、重复页沿用先前页面的结果（见 page_filter.py）
+        self.page_filter = PAGE_FILTER_CONFIG["enabled"] if page_filter is None else page_filter
+        # 每个请求合并的页数（>1 时经由流水线合并发送，见 parse_pack）
+        self.pack_size = max(1, pack_size or PACK_CONFIG["pack_size"])
+        # 请求消息布局（见 PROMPT_LAYOUT_CONFIG）
+        self.prompt_layout = prompt_layout or PROMPT_LAYOUT_CONFIG["layout"]
+        # 流式接收，完整JSON到达即断开（见 StreamCollector）
+        self.stream = STREAM_CONFIG["enabled"] if stream is None else stream
+        # 按预设键结构校验并修复结果，修不好的页面单独重新请求（见 result_validator.py）
+        self.validate = VALIDATION_CONFIG["enabled"] if validate is None else validate
+        # 结果存储方式（files：逐页文件；jsonl：合并存储，见 result_store.py）
+        self.result_store = result_store or RESULT_STORE_CONFIG["format"]
+        self._stores: Dict[Path, ResultStore] = {}
+        # bypass_cache=True 时不读取缓存（仍会写入新结果）
+        self.bypass_cache = bypass_cache
+        self.cache = cache if cache is not None else get_parse_cache()
+        # 标签倒排索引，成功结果写入时按 tag 数组增量更新（见 tag_index.py）；未启用时为None
+        self.tag_index = tag_index if tag_index is not None else get_tag_index()
         self.lock = threading.Lock()
     
     def create_client(self) -> OpenAI:
-        """创建OpenAI客户端"""
-        return OpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
-            timeout=self.timeout
-        )
+        """获取OpenAI客户端（来自共享连接池，不再为每页新建连接）"""
+        return get_shared_client(self.base_url, self.api_key, self.timeout, self.max_retries)
     
-    def image_to_base64(self, image_path: Path) -> str:
-        """将图片转换为base64"""
+    def read_image_bytes(self, image_path: Union[Path, bytes]) -> bytes:
+        """读取图片字节（支持文件路径或内存中的图片字节）"""
+        if isinstance(image_path, (bytes, bytearray)):
+            return bytes(image_path)
         with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode('utf-8')
+            return img_file.read()
     
-    def parse_single_image(self, image_path: Path, prompt: str, page_num: int) -> Tuple[bool, str]:
-        """解析单张图片"""
-        try:
-            # 转换图片为base64
-            base64_image = self.image_to_base64(image_path)
-            
-            # 创建客户端
-            client = self.create_client()
-            
-            # 构建消息
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            },
-                        },
-                        {
-                            "type": "text", 
-                            "text": f"这是第{page_num}页的内容。{prompt}"
-                        },
-                    ],
-                }
+    def image_to_base64(self, image_path: Union[Path, bytes]) -> str:
+        """将图片转换为base64（支持文件路径或内存中的图片字节）"""
+        return base64.b64encode(self.read_image_bytes(image_path)).decode('utf-8')
+    
+    def create_async_client(self, concurrency: int) -> AsyncOpenAI:
+        """创建异步客户端（绑定当前事件循环，由异步引擎在结束时关闭）"""
+        http_client = DefaultAsyncHttpxClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=max(HTTP_CONFIG["max_connections"], concurrency),
+                max_keepalive_connections=max(HTTP_CONFIG["max_keepalive_connections"], concurrency),
+                keepalive_expiry=HTTP_CONFIG["keepalive_expiry"]
+            )
+        )
+        return AsyncOpenAI(
+            base_url=self.base_url, api_key=self.api_key, timeout=self.timeout,
+            max_retries=self.max_retries, http_client=http_client
+        )
+    
+    def _lookup_cache(self, image_bytes: Optional[bytes], prompt: str,
+                      text_page: Optional["TextLayerPage"] = None) -> Tuple[Optional[str], Optional[Dict]]:
+        """查询解析缓存，返回 (缓存键, 命中时的结果)；随请求发送的文字层也参与缓存键"""
+        if self.cache is None:
+            return None, None
+        params = self._cache_params()
+        if text_page is not None and text_page.route != "image":
+            params = dict(params, text_layer=text_page.route,
+                          text_sha256=hashlib.sha256(text_page.text.encode("utf-8")).hexdigest())
+        cache_key = ParseCache.make_key(image_bytes or b"", prompt, self.model, params)
+        if not self.bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cache_key, {'success': True, 'content': cached, 'cached': True}
+        return cache_key, None
+    
+    def _cache_params(self) -> Dict:
+        """参与缓存键的参数：生成参数，以及非PNG上传时的编码设置（模型看到的图片不同）"""
+        if self.upload_format == "png":
+            return self.generation_params
+        return dict(self.generation_params, upload_format=self.upload_format, upload_quality=self.upload_quality)
+    
+    def _prepare_upload(self, image_bytes: Optional[bytes],
+                        text_page: Optional["TextLayerPage"] = None) -> Tuple[Optional[bytes], Optional[str], Dict]:
+        """按上传格式编码图片，返回 (上传字节, MIME类型, 上传信息)；仅发送文字的页面没有图片"""
+        if image_bytes is None:
+            return None, None, text_upload_stats(text_page.text)
+        upload_bytes, mime = encode_for_upload(image_bytes, self.upload_format, self.upload_quality)
+        upload = image_upload_stats(upload_bytes)
+        upload['format'] = mime.split("/")[-1]
+        if text_page is not None and text_page.route == "mixed":
+            upload['text_chars'] = len(text_page.text)
+        return upload_bytes, mime, upload
+    
+    @staticmethod
+    def _image_part(image_bytes: bytes, mime: str) -> Dict:
+        """消息中的图片部分（base64 data URL）"""
+        # 转换图片为base64
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{mime};base64,{base64_image}"
+            },
+        }
+    
+    def _build_messages(self, image_bytes: Optional[bytes], prompt: str, page_num: int, intro: Optional[str] = None,
+                        mime: str = "image/png", text_page: Optional["TextLayerPage"] = None) -> List[Dict]:
+        """构建单页请求消息（文字层页面附上提取的文本，仅文字的页面不含图片）
+        
+        system 布局：提示词为系统消息，用户消息为 页码说明+文字层+图片，各页请求共享相同的前缀；
+        inline 布局：用户消息为 图片 + 页码说明+文字层+提示词。
+        """
+        text_note = text_page.prompt_note() if text_page is not None else ""
+        page_text = f"{intro or f'这是第{page_num}页的内容。'}{text_note}"
+        image = [self._image_part(image_bytes, mime)] if image_bytes is not None else []
+        if self.prompt_layout == "system":
+            return [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": [{"type": "text", "text": page_text}] + image}
             ]
-            
-            # 调用API
-            response = client.chat.completions.create(
+        
+        return [
+            {
+                "role": "user",
+                "content": image + [{"type": "text", "text": f"{page_text}{prompt}"}],
+            }
+        ]
+    
+    def _build_pack_messages(self, pages: List[Tuple[int, int, Dict]], prompt: str) -> List[Dict]:
+        """构建多页合并请求：提示词只发送一次，各页图片（及文字层）依次编号，最后要求按顺序输出JSON数组
+        
+        system 布局下提示词同样作为系统消息，与单页请求共享前缀。
+        """
+        if self.prompt_layout == "system":
+            content = [{"type": "text", "text": f"以下共有 {len(pages)} 个页面，请逐页按要求解析。"}]
+        else:
+            content = [{"type": "text", "text": f"以下共有 {len(pages)} 个页面，请逐页按下面的要求解析。\n{prompt}"}]
+        for index, (_, page_num, prepared) in enumerate(pages, 1):
+            text_page = prepared['text_page']
+            text_note = text_page.prompt_note() if text_page is not None else ""
+            content.append({"type": "text", "text": f"【第{index}张】这是第{page_num}页的内容。{text_note}"})
+            if prepared['bytes'] is not None:
+                content.append(self._image_part(prepared['bytes'], prepared['mime']))
+        content.append({
+            "type": "text",
+            "text": f"请把上述 {len(pages)} 个页面的解析结果按【第1张】到【第{len(pages)}张】的顺序放进一个JSON数组输出，"
+                    f"数组恰好 {len(pages)} 个元素，每个元素是对应页面按要求输出的结果；只输出这个数组，不要输出其他文字。"
+        })
+        if self.prompt_layout == "system":
+            return [{"role": "system", "content": prompt}, {"role": "user", "content": content}]
+        return [{"role": "user", "content": content}]
+    
+    def _completion_outcome(self, response, cache_key: Optional[str]) -> Dict:
+        """从API响应生成单页结果，并写入缓存"""
+        content = response.choices[0].message.content
+        if cache_key is not None and content:
+            self.cache.put(cache_key, content)
+        return {'success': True, 'content': content, 'cached': False, 'usage': usage_from_response(response)}
+    
+    @staticmethod
+    def _error_outcome(error: Exception) -> Dict:
+        """API异常对应的单页结果（附带错误分类）"""
+        return {'success': False, 'content': str(error), 'cached': False, 'error_info': classify_api_error(error)}
+    
+    def _should_retry(self, outcome: Dict, attempt: int, retry_budget: Optional[RetryBudget]) -> bool:
+        """失败的请求是否重试：错误可重试、未达次数上限且任务预算充足"""
+        if not RETRY_CONFIG["enabled"] or attempt >= RETRY_CONFIG["max_attempts"]:
+            return False
+        if not outcome['error_info']['retryable']:
+            return False
+        return retry_budget is None or retry_budget.try_spend()
+    
+    def _stream_params(self) -> Dict:
+        """流式请求的额外参数"""
+        if not STREAM_CONFIG["include_usage"]:
+            return {'stream': True}
+        return {'stream': True, 'stream_options': {'include_usage': True}}
+    
+    def _stream_outcome(self, collector: "StreamCollector", cache_key: Optional[str]) -> Dict:
+        """由流式接收的结果生成单页结果（失控时为失败结果），附带首字延迟与结束方式"""
+        if collector.stop == "runaway":
+            outcome = self._error_outcome(RunawayOutputError(collector.describe()))
+        else:
+            content = collector.content()
+            if cache_key is not None and content:
+                self.cache.put(cache_key, content)
+            outcome = {'success': True, 'content': content, 'cached': False, 'usage': collector.usage}
+        outcome['latency'] = time.perf_counter() - collector.start
+        outcome['ttft'] = collector.ttft
+        outcome['stream'] = collector.to_dict()
+        return outcome
+    
+    def _send_messages(self, messages: List[Dict], cache_key: Optional[str], pages: int = 1) -> Dict:
+        """发送一次API请求（不含重试）；流式接收时 pages 为请求包含的页数，用于放大失控判定的字数上限"""
+        try:
+            request_start = time.perf_counter()
+            if self.stream:
+                collector = StreamCollector(request_start, pages)
+                stream = self.create_client().chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    **self.generation_params,
+                    **self._stream_params()
+                )
+                try:
+                    for chunk in stream:
+                        if collector.add(chunk):
+                            break
+                finally:
+                    # 提前结束时关闭连接，服务端随即停止生成
+                    stream.close()
+                return self._stream_outcome(collector, cache_key)
+            response = self.create_client().chat.completions.create(
                 model=self.model,
                 messages=messages,
-                max_tokens=4096,
-                temperature=0.7,
-                top_p=0.9
+                **self.generation_params
             )
-            
-            return True, response.choices[0].message.content
-            
+            outcome = self._completion_outcome(response, cache_key)
+            outcome['latency'] = time.perf_counter() - request_start
+            return outcome
+        except Exception as e:
+            return self._error_outcome(e)
+    
+    async def _send_messages_async(self, client: AsyncOpenAI, messages: List[Dict], cache_key: Optional[str],
+                                   pages: int = 1) -> Dict:
+        """异步发送一次API请求（不含重试）"""
+        try:
+            request_start = time.perf_counter()
+            if self.stream:
+                collector = StreamCollector(request_start, pages)
+                stream = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    **self.generation_params,
+                    **self._stream_params()
+                )
+                try:
+                    async for chunk in stream:
+                        if collector.add(chunk):
+                            break
+                finally:
+                    await stream.close()
+                return self._stream_outcome(collector, cache_key)
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                **self.generation_params
+            )
+            outcome = self._completion_outcome(response, cache_key)
+            outcome['latency'] = time.perf_counter() - request_start
+            return outcome
         except Exception as e:
-            return False, str(e)
+            return self._error_outcome(e)
+    
+    def result_schema(self, prompt: str) -> Optional[Dict]:
+        """提示词要求的结果键结构；未启用校验或提示词不要求JSON时为None"""
+        return schema_for_prompt(prompt) if self.validate else None
+    
+    def _validate_outcome(self, outcome: Dict, schema: Optional[Dict], cache_key: Optional[str]) -> Dict:
+        """校验成功的结果：修复后的内容替换原结果并覆盖缓存，未通过时保留原始输出（等待重新请求）"""
+        if schema is None or not outcome['success']:
+            return outcome
+        report = validate_content(outcome['content'], schema)
+        if report['status'] == "repaired" and cache_key is not None:
+            self.cache.put(cache_key, report['content'])
+        outcome['content'] = report['content']
+        outcome['validation'] = {'status': report['status'], 'repairs': report['repairs'], 'problems': report['problems']}
+        return outcome
+    
+    def _needs_reask(self, outcome: Dict, reasks: int, retry_budget: Optional[RetryBudget]) -> bool:
+        """未通过校验的结果是否重新请求：未达次数上限且任务重试预算充足"""
+        if not outcome['success'] or (outcome.get('validation') or {}).get('status') != "invalid":
+            return False
+        if reasks >= VALIDATION_CONFIG["max_reasks"]:
+            return False
+        return retry_budget is None or retry_budget.try_spend()
+    
+    @staticmethod
+    def _reask_messages(messages: List[Dict], outcome: Dict, schema: Dict) -> List[Dict]:
+        """在原对话后附上未通过的输出与纠正说明（前缀不变，仍可命中提示词缓存）"""
+        return messages + [
+            {"role": "assistant", "content": outcome['content']},
+            {"role": "user", "content": reask_instruction(outcome['validation']['problems'], schema)}
+        ]
+    
+    @staticmethod
+    def _merge_reask(previous: Dict, outcome: Dict, reasks: int) -> Dict:
+        """合并重新请求的结果（请求次数、token用量与延迟累计）；重新请求本身失败时沿用之前未通过的结果"""
+        attempts = previous.get('attempts', 0) + outcome.get('attempts', 0)
+        usage = merge_usage(previous.get('usage'), outcome.get('usage'))
+        if not outcome['success']:
+            outcome = previous
+        elif outcome['validation']['status'] != "invalid":
+            outcome['validation']['status'] = "reasked"
+        if previous is not outcome and previous.get('latency') is not None and outcome.get('latency') is not None:
+            outcome['latency'] += previous['latency']
+        outcome['attempts'] = attempts
+        outcome['usage'] = usage
+        outcome['validation']['reasks'] = reasks
+        return outcome
+    
+    def _reject_invalid(self, outcome: Dict, cache_key: Optional[str]) -> Dict:
+        """仍未通过校验的结果记为失败（保留原始输出供排查），并从缓存中删除"""
+        validation = outcome.get('validation')
+        if not outcome['success'] or not validation or validation['status'] != "invalid":
+            return outcome
+        if cache_key is not None:
+            self.cache.delete(cache_key)
+        validation['raw'] = outcome['content']
+        return dict(
+            outcome, success=False, content=f"结果未通过校验：{'；'.join(validation['problems'])}",
+            error_info={'kind': "invalid_output", 'status': None, 'retry_after': None, 'overload': False, 'retryable': False}
+        )
+    
+    def _send_with_retry(self, messages: List[Dict], cache_key: Optional[str],
+                         retry_budget: Optional[RetryBudget] = None,
+                         controller: Optional[AdaptiveConcurrencyController] = None, pages: int = 1) -> Dict:
+        """发送请求，失败时按重试规则退避重试，结果中的 attempts 为请求次数"""
+        attempt = 0
+        while True:
+            attempt += 1
+            if controller:
+                controller.acquire()
+            try:
+                outcome = self._send_messages(messages, cache_key, pages)
+            finally:
+                if controller:
+                    controller.release()
+            observe_outcome(controller, outcome)
+            if outcome['success'] or not self._should_retry(outcome, attempt, retry_budget):
+                outcome['attempts'] = attempt
+                return outcome
+            time.sleep(retry_delay(attempt, outcome['error_info']))
+    
+    async def _send_with_retry_async(self, client: AsyncOpenAI, messages: List[Dict], cache_key: Optional[str],
+                                     retry_budget: Optional[RetryBudget] = None,
+                                     controller: Optional[AdaptiveConcurrencyController] = None,
+                                     pages: int = 1) -> Dict:
+        """异步发送请求，重试规则与 _send_with_retry 相同"""
+        attempt = 0
+        while True:
+            attempt += 1
+            if controller:
+                await controller.acquire_async()
+            try:
+                outcome = await self._send_messages_async(client, messages, cache_key, pages)
+            finally:
+                if controller:
+                    controller.release()
+            observe_outcome(controller, outcome)
+            if outcome['success'] or not self._should_retry(outcome, attempt, retry_budget):
+                outcome['attempts'] = attempt
+                return outcome
+            await asyncio.sleep(retry_delay(attempt, outcome['error_info']))
+    
+    def _prepare_page(self, image_path: Union[Path, bytes, "TextLayerPage"], prompt: str) -> Dict:
+        """读取页面、查询缓存并按上传格式编码
+        
+        返回的 'outcome' 存在时即为最终结果（缓存命中或读取失败），否则包含上传字节、MIME、上传信息、缓存键与编码耗时。
+        """
+        text_page = image_path if isinstance(image_path, TextLayerPage) else None
+        try:
+            image = text_page.image if text_page else image_path
+            image_bytes = self.read_image_bytes(image) if image is not None else None
+            cache_key, cached = self._lookup_cache(image_bytes, prompt, text_page)
+            if cached:
+                cached = self._validate_outcome(cached, self.result_schema(prompt), cache_key)
+                if (cached.get('validation') or {}).get('status') == "invalid":
+                    # 缓存中的旧结果不合格：按未命中处理，重新请求该页
+                    cached = None
+            if cached:
+                cached['upload'] = image_upload_stats(image_bytes) if image_bytes is not None else text_upload_stats(text_page.text)
+                return {'outcome': with_text_layer(cached, text_page)}
+            encode_start = time.perf_counter()
+            upload_bytes, mime, upload = self._prepare_upload(image_bytes, text_page)
+            encode_time = time.perf_counter() - encode_start
+        except Exception as e:
+            return {'outcome': with_text_layer(self._error_outcome(e), text_page)}
+        return {'text_page': text_page, 'bytes': upload_bytes, 'mime': mime, 'upload': upload,
+                'cache_key': cache_key, 'encode_time': encode_time}
+    
+    async def _prepare_page_async(self, image_path: Union[Path, bytes, "TextLayerPage"], prompt: str) -> Dict:
+        """异步版 _prepare_page：需要读文件或有损编码时放到线程中执行，避免阻塞事件循环"""
+        image = image_path.image if isinstance(image_path, TextLayerPage) else image_path
+        if image is None or (isinstance(image, (bytes, bytearray)) and self.upload_format == "png"):
+            return self._prepare_page(image_path, prompt)
+        return await asyncio.to_thread(self._prepare_page, image_path, prompt)
+    
+    def parse_page(
+        self,
+        image_path: Union[Path, bytes, "TextLayerPage"],
+        prompt: str,
+        page_num: int,
+        intro: Optional[str] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None
+    ) -> Dict:
+        """解析单页，返回 {'success', 'content', 'cached', 'attempts', 'upload'}
+        
+        结果缓存以 图片字节+提示词+模型+生成参数 为键，页码说明（intro）不参与，
+        因此同一页面出现在不同文档、不同位置时同样可以命中。
+        429、5xx、超时和连接错误按指数退避重试（受 retry_budget 限制），鉴权/请求无效等错误直接失败；
+        指定 controller 时每次请求占用一个自适应并发名额，退避等待期间不占用。
+        upload 为实际上传图片的格式、字节数、尺寸与估算的图像token数（见 image_upload_stats）；
+        缓存以原图字节为键，命中时不做上传编码。
+        image_path 为 TextLayerPage 时按其发送方式附带文字层（或只发送文字），结果中的 text_layer 记录方式与原因。
+        """
+        prepared = self._prepare_page(image_path, prompt)
+        if 'outcome' in prepared:
+            return prepared['outcome']
+        return self._parse_prepared(page_num, prepared, prompt, intro, retry_budget, controller)
+    
+    async def parse_page_async(
+        self,
+        client: AsyncOpenAI,
+        image_path: Union[Path, bytes, "TextLayerPage"],
+        prompt: str,
+        page_num: int,
+        intro: Optional[str] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None
+    ) -> Dict:
+        """异步解析单页，返回值与重试规则与 parse_page 相同"""
+        prepared = await self._prepare_page_async(image_path, prompt)
+        if 'outcome' in prepared:
+            return prepared['outcome']
+        return await self._parse_prepared_async(client, page_num, prepared, prompt, intro, retry_budget, controller)
+    
+    def _parse_prepared(self, page_num: int, prepared: Dict, prompt: str, intro: Optional[str] = None,
+                        retry_budget: Optional[RetryBudget] = None,
+                        controller: Optional[AdaptiveConcurrencyController] = None) -> Dict:
+        """为已准备好的单页发送请求（含重试），结果未通过校验且无法本地修复时重新请求"""
+        messages = self._build_messages(prepared['bytes'], prompt, page_num, intro, prepared['mime'], prepared['text_page'])
+        schema, cache_key = self.result_schema(prompt), prepared['cache_key']
+        outcome = self._validate_outcome(
+            self._send_with_retry(messages, cache_key, retry_budget, controller), schema, cache_key
+        )
+        reasks = 0
+        while self._needs_reask(outcome, reasks, retry_budget):
+            reasks += 1
+            retry = self._send_with_retry(self._reask_messages(messages, outcome, schema), cache_key, retry_budget, controller)
+            outcome = self._merge_reask(outcome, self._validate_outcome(retry, schema, cache_key), reasks)
+        outcome = self._reject_invalid(outcome, cache_key)
+        outcome['upload'] = prepared['upload']
+        outcome['encode_time'] = prepared['encode_time']
+        return with_text_layer(outcome, prepared['text_page'])
+    
+    async def _parse_prepared_async(self, client: AsyncOpenAI, page_num: int, prepared: Dict, prompt: str,
+                                    intro: Optional[str] = None, retry_budget: Optional[RetryBudget] = None,
+                                    controller: Optional[AdaptiveConcurrencyController] = None) -> Dict:
+        """异步版 _parse_prepared"""
+        messages = self._build_messages(prepared['bytes'], prompt, page_num, intro, prepared['mime'], prepared['text_page'])
+        schema, cache_key = self.result_schema(prompt), prepared['cache_key']
+        outcome = self._validate_outcome(
+            await self._send_with_retry_async(client, messages, cache_key, retry_budget, controller), schema, cache_key
+        )
+        reasks = 0
+        while self._needs_reask(outcome, reasks, retry_budget):
+            reasks += 1
+            retry = await self._send_with_retry_async(
+                client, self._reask_messages(messages, outcome, schema), cache_key, retry_budget, controller
+            )
+            outcome = self._merge_reask(outcome, self._validate_outcome(retry, schema, cache_key), reasks)
+        outcome = self._reject_invalid(outcome, cache_key)
+        outcome['upload'] = prepared['upload']
+        outcome['encode_time'] = prepared['encode_time']
+        return with_text_layer(outcome, prepared['text_page'])
+    
+    def parse_pack(
+        self,
+        pages: List[Tuple[int, Union[Path, bytes, "TextLayerPage"]]],
+        prompt: str,
+        retry_budget: Optional[RetryBudget] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None
+    ) -> List[Dict]:
+        """多页合并解析：未命中缓存的页面合并为一个请求（提示词只发送一次），返回值与 pages 一一对应
+        
+        模型返回的JSON数组按顺序拆回各页，并以单页缓存键分别写入缓存；请求失败、数组无法解析或个数不符时，
+        这些页面（或数组中为空的页面）回退为单页请求。结果中的 packed 记录合并页数及是否回退。
+        """
+        outcomes: List[Optional[Dict]] = [None] * len(pages)
+        pending = []
+        for index, (page_num, image_path) in enumerate(pages):
+            prepared = self._prepare_page(image_path, prompt)
+            if 'outcome' in prepared:
+                outcomes[index] = prepared['outcome']
+            else:
+                pending.append((index, page_num, prepared))
+        
+        reason, shares = None, [None] * len(pending)
+        if len(pending) > 1:
+            pack_outcome = self._send_with_retry(
+                self._build_pack_messages(pending, prompt), None, retry_budget, controller, len(pending)
+            )
+            reason, shares = self._split_pack_outcome(pack_outcome, pending, outcomes, self.result_schema(prompt))
+        for position, (index, page_num, prepared) in enumerate(pending):
+            if outcomes[index] is None:
+                outcome = self._parse_prepared(page_num, prepared, prompt, retry_budget=retry_budget, controller=controller)
+                outcomes[index] = self._mark_pack_fallback(outcome, len(pending), reason, shares[position])
+        return outcomes
+    
+    async def parse_pack_async(
+        self,
+        client: AsyncOpenAI,
+        pages: List[Tuple[int, Union[Path, bytes, "TextLayerPage"]]],
+        prompt: str,
+        retry_budget: Optional[RetryBudget] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None
+    ) -> List[Dict]:
+        """异步多页合并解析，规则与 parse_pack 相同（回退的单页请求并发发送）"""
+        outcomes: List[Optional[Dict]] = [None] * len(pages)
+        pending = []
+        for index, (page_num, image_path) in enumerate(pages):
+            prepared = await self._prepare_page_async(image_path, prompt)
+            if 'outcome' in prepared:
+                outcomes[index] = prepared['outcome']
+            else:
+                pending.append((index, page_num, prepared))
+        
+        reason, shares = None, [None] * len(pending)
+        if len(pending) > 1:
+            pack_outcome = await self._send_with_retry_async(
+                client, self._build_pack_messages(pending, prompt), None, retry_budget, controller, len(pending)
+            )
+            reason, shares = self._split_pack_outcome(pack_outcome, pending, outcomes, self.result_schema(prompt))
+        fallback = [
+            (position, index, page_num, prepared)
+            for position, (index, page_num, prepared) in enumerate(pending) if outcomes[index] is None
+        ]
+        fallback_outcomes = await asyncio.gather(*(
+            self._parse_prepared_async(client, page_num, prepared, prompt, retry_budget=retry_budget, controller=controller)
+            for _, _, page_num, prepared in fallback
+        ))
+        for (position, index, _, _), outcome in zip(fallback, fallback_outcomes):
+            outcomes[index] = self._mark_pack_fallback(outcome, len(pending), reason, shares[position])
+        return outcomes
+    
+    def _split_pack_outcome(self, pack_outcome: Dict, pending: List[Tuple[int, int, Dict]],
+                            outcomes: List[Optional[Dict]],
+                            schema: Optional[Dict] = None) -> Tuple[Optional[str], List[Optional[Dict]]]:
+        """把合并请求的响应拆回各页写入 outcomes（同时以单页缓存键写入缓存）
+        
+        各页结果按 schema 校验，无法本地修复的页面不写入，与空结果一样回退为单页请求。
+        
+        返回 (需要回退的原因, 各页分摊的token用量)；合并请求的用量按页数平均分摊，未拆出结果的页面的份额计入其单页请求。
+        """
+        shares = split_usage(pack_outcome.get('usage'), len(pending))
+        if not pack_outcome['success']:
+            return f"合并请求失败: {pack_outcome['content']}", shares
+        contents = split_pack_response(pack_outcome['content'], len(pending))
+        if contents is None:
+            return f"合并响应无法拆分为 {len(pending)} 页的JSON数组", shares
+        
+        split_count = 0
+        for position, ((index, _, prepared), content) in enumerate(zip(pending, contents)):
+            if content is None:
+                continue
+            outcome = {
+                'success': True, 'content': content, 'cached': False, 'attempts': pack_outcome['attempts'],
+                'upload': prepared['upload'], 'encode_time': prepared['encode_time'],
+                'latency': pack_outcome.get('latency'), 'ttft': pack_outcome.get('ttft'),
+                'stream': pack_outcome.get('stream'), 'usage': shares[position],
+                'packed': {'size': len(pending), 'index': position + 1}
+            }
+            outcome = self._validate_outcome(outcome, schema, None)
+            if (outcome.get('validation') or {}).get('status') == "invalid":
+                continue
+            if prepared['cache_key'] is not None:
+                self.cache.put(prepared['cache_key'], outcome['content'])
+            outcomes[index] = with_text_layer(outcome, prepared['text_page'])
+            split_count += 1
+        return (None if split_count == len(pending) else "合并响应中该页结果为空或未通过校验"), shares
+    
+    @staticmethod
+    def _mark_pack_fallback(outcome: Dict, pack_size: int, reason: Optional[str], usage_share: Optional[Dict] = None) -> Dict:
+        """记录回退为单页请求的页面（只有一页未命中缓存时不算合并），并计入其在合并请求中的token份额"""
+        if pack_size > 1:
+            outcome['packed'] = {'size': pack_size, 'fallback': True, 'reason': reason or ""}
+            outcome['usage'] = merge_usage(outcome.get('usage'), usage_share)
+        return outcome
+    
+    def parse_single_image(
+        self,
+        image_path: Union[Path, bytes],
+        prompt: str,
+        page_num: int,
+        intro: Optional[str] = None
+    ) -> Tuple[bool, str]:
+        """解析单张图片（image_path 可以是图片路径，也可以是已编码的图片字节）"""
+        outcome = self.parse_page(image_path, prompt, page_num, intro)
+        return outcome['success'], outcome['content']
     
     def parse_images_batch(
         self, 
@@ -89,83 +941,975 @@ class AIParser:
         prompt: str, 
         max_workers: int,
         progress_callback=None,
-        status_callback=None
+        status_callback=None,
+        engine: str = "thread",
+        adaptive: bool = False,
+        page_numbers: Optional[List[int]] = None,
+        manifest: Optional[JobManifest] = None
     ) -> Dict:
-        """批量解析图片"""
+        """批量解析图片（engine="async" 时 max_workers 表示在途请求上限）
+        
+        page_numbers 为各图片对应的页码（默认从1开始连续编号）；指定 manifest 时逐页记录解析状态。
+        异步引擎、自适应并发与多页合并请求经由 parse_images_pipeline 处理。
+        """
+        page_numbers = list(page_numbers or range(1, len(image_paths) + 1))
+        if engine == "async" or adaptive or self.pack_size > 1:
+            return self.parse_images_pipeline(
+                list(zip(page_numbers, image_paths)), len(image_paths), output_dir, prompt, max_workers,
+                progress_callback, status_callback, engine=engine, adaptive=adaptive,
+                page_numbers=page_numbers, manifest=manifest
+            )
+        
         total_pages = len(image_paths)
         completed = 0
         failed = 0
         results = {}
+        retry_budget = RetryBudget.for_pages(total_pages)
+        page_filter = PageFilter() if self.page_filter else None
+        metrics = MetricsLog(output_dir) if METRICS_CONFIG["enabled"] else None
+        errors = []    # 不属于某一页的异常（任务清单、指标、回调），写入汇总报告
+        
+        def note_error(message: str):
+            with self.lock:
+                if message not in errors:
+                    errors.append(message)
         
         def update_progress():
             nonlocal completed, failed
             with self.lock:
                 progress = completed / total_pages if total_pages > 0 else 0
-                if progress_callback:
-                    progress_callback(progress)
-                if status_callback:
-                    status_callback(f"解析进度: {completed}/{total_pages} 页 (失败: {failed})")
+                try:
+                    if progress_callback:
+                        progress_callback(progress)
+                    if status_callback:
+                        status_callback(f"解析进度: {completed}/{total_pages} 页 (失败: {failed})")
+                except Exception as e:
+                    if f"进度回调出错: {e}" not in errors:
+                        errors.append(f"进度回调出错: {e}")
         
-        def process_image(image_path: Path, page_num: int):
+        def process_image(image_path: Path, page_num: int, outcome: Optional[Dict] = None,
+                          submitted: Optional[float] = None):
             nonlocal completed, failed
             
-            success, content = self.parse_single_image(image_path, prompt, page_num)
-            
-            # 保存结果（使用.json扩展名）
-            result_path = output_dir / f"{page_num}.json"
-            
-            if success:
-                # 保存成功结果（纯净JSON格式）
-                with open(result_path, "w", encoding="utf-8") as f:
-                    # 只写入纯净的解析结果，不添加任何标题或时间戳
-                    f.write(content)
-                
-                results[page_num] = {
-                    'success': True,
-                    'content': content,
-                    'file_path': str(result_path)
-                }
-            else:
-                # 保存错误信息
-                error_path = output_dir / f"{page_num}_error.txt"
-                with open(error_path, "w", encoding="utf-8") as f:
-                    f.write(f"页面 {page_num} 解析失败\n")
-                    f.write(f"错误信息: {content}\n")
-                    f.write(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                results[page_num] = {
-                    'success': False,
-                    'error': content,
-                    'file_path': str(error_path)
-                }
-                failed += 1
+            timing = None
+            if outcome is None:
+                parse_start = time.perf_counter()
+                try:
+                    outcome = self.parse_page(image_path, prompt, page_num, retry_budget=retry_budget)
+                except Exception as e:
+                    outcome = self._error_outcome(e)
+                timing = {'queue_wait': parse_start - submitted, 'parse': time.perf_counter() - parse_start}
+            try:
+                record = self._save_page_result(output_dir, page_num, outcome)
+            except Exception as e:
+                # 结果保存失败：该页记为失败（尽量写出错误说明），不影响其他页面
+                outcome = self._error_outcome(OSError(f"结果保存失败: {e}"))
+                try:
+                    record = self._save_page_result(output_dir, page_num, outcome)
+                except Exception:
+                    record = {'success': False, 'error': outcome['content'], 'file_path': None}
+            success = outcome['success']
+            results[page_num] = record
+            try:
+                if manifest:
+                    manifest.mark_page(page_num, record)
+                if metrics:
+                    metrics.record(page_num, outcome, timing)
+            except Exception as e:
+                note_error(f"第 {page_num} 页的任务清单/指标记录失败: {e}")
             
-            completed += 1
+            with self.lock:
+                if not success:
+                    failed += 1
+                completed += 1
             update_progress()
             
+            # 等待本页结果的重复页随之完成
+            if page_filter and 'page_filter' not in outcome:
+                for follower_num, follower_path, verdict in page_filter.resolve(page_num, outcome):
+                    process_image(follower_path, follower_num, filtered_outcome(verdict, outcome))
+            
             return success
         
-        # 使用线程池并发处理
+        # 使用线程池并发处理（页面过滤在提交线程中进行，与解析并行）
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = []
-            for i, image_path in enumerate(image_paths):
-                future = executor.submit(process_image, image_path, i+1)
-                futures.append(future)
+            for page_num, image_path in zip(page_numbers, image_paths):
+                verdict = self._filter_page(page_filter, page_num, image_path)
+                if verdict is None:
+                    futures.append(executor.submit(process_image, image_path, page_num, None, time.perf_counter()))
+                elif verdict['action'] == "blank":
+                    process_image(image_path, page_num, filtered_outcome(verdict))
+                else:
+                    source_outcome = page_filter.defer(page_num, image_path, verdict)
+                    if source_outcome is not None:
+                        process_image(image_path, page_num, filtered_outcome(verdict, source_outcome))
             
             # 等待所有任务完成
             concurrent.futures.wait(futures)
+        store_stats = self.close_result_store(output_dir)
         
         # 创建汇总报告
-        self._create_summary_report(output_dir, total_pages, completed - failed, failed, results)
+        retry_stats = self._retry_section(results, retry_budget)
+        upload_stats = self._upload_section(results)
+        filter_stats = self._filter_section(results)
+        text_layer_stats = self._text_layer_section(results)
+        usage_stats = self._usage_section(results)
+        validation_stats = self._validation_section(results)
+        metrics_summary = metrics.summary() if metrics else None
+        extra_sections = {
+            **self._cache_section(results), "重试统计": retry_stats, "上传统计": upload_stats, "Token用量": usage_stats
+        }
+        if filter_stats is not None:
+            extra_sections["页面过滤"] = filter_stats
+        if text_layer_stats is not None:
+            extra_sections["文字层"] = text_layer_stats
+        if validation_stats is not None:
+            extra_sections["结果校验"] = validation_stats
+        if store_stats is not None:
+            extra_sections["结果存储"] = store_stats
+        if metrics_summary is not None:
+            extra_sections["性能指标"] = metrics_summary
+        if manifest:
+            try:
+                manifest.flush()
+            except OSError as e:
+                note_error(f"任务清单写入失败: {e}")
+            extra_sections["断点续传"] = manifest.summary_section(total_pages)
+        if page_filter:
+            try:
+                save_filter_record(output_dir, results)
+            except OSError as e:
+                note_error(f"页面过滤记录写入失败: {e}")
+        if errors:
+            extra_sections["处理异常"] = {str(i + 1): error for i, error in enumerate(errors)}
+        self._create_summary_report(output_dir, total_pages, completed - failed, failed, results, extra_sections)
         
         return {
             'total_pages': total_pages,
             'successful': completed - failed,
             'failed': failed,
-            'results': results
+            'results': results,
+            'retry_stats': retry_stats,
+            'upload_stats': upload_stats,
+            'filter_stats': filter_stats,
+            'text_layer_stats': text_layer_stats,
+            'usage_stats': usage_stats,
+            'validation_stats': validation_stats,
+            'metrics_summary': metrics_summary,
+            'errors': errors
         }
     
-    def _create_summary_report(self, output_dir: Path, total: int, success: int, failed: int, results: Dict):
+    def parse_images_pipeline(
+        self,
+        page_source: Iterable[Tuple[int, Union[Path, bytes]]],
+        total_pages: int,
+        output_dir: Path,
+        prompt: str,
+        max_workers: int,
+        progress_callback=None,
+        status_callback=None,
+        queue_size: Optional[int] = None,
+        persist_dir: Optional[Path] = None,
+        engine: str = "thread",
+        adaptive: bool = False,
+        page_numbers: Optional[List[int]] = None,
+        manifest: Optional[JobManifest] = None
+    ) -> Dict:
+        """流水线解析：边拆分边解析（单个文档，参见 parse_documents）
+        
+        page_source 每产出一页 (页码, 图片路径或图片字节[, 页面指纹]) 就立即进入有界队列，由解析引擎消费。
+        只处理部分页面时（断点续传），page_numbers 为本次应产出的页码，total_pages 为其数量；
+        指定 manifest 时每完成一页即记录解析状态。
+        """
+        job = DocumentJob(
+            "", page_source, page_numbers or range(1, total_pages + 1), output_dir,
+            manifest=manifest, persist_dir=persist_dir,
+            progress_callback=progress_callback, status_callback=status_callback
+        )
+        return self.parse_documents([job], prompt, max_workers, queue_size=queue_size, engine=engine, adaptive=adaptive)[0]
+    
+    def parse_documents(
+        self,
+        jobs: List["DocumentJob"],
+        prompt: str,
+        max_workers: int,
+        policy: str = "fifo",
+        queue_size: Optional[int] = None,
+        engine: str = "thread",
+        adaptive: bool = False
+    ) -> List[Dict]:
+        """跨文件流水线：所有文档的页面进入同一个有界队列，由同一组解析线程或事件循环消费
+        
+        渲染在调用线程中进行，队列满时渲染阻塞（背压），队列空时解析端等待；文档之间没有空档。
+        policy 决定各文档页面的入队顺序（见 SCHEDULE_POLICIES）："fifo" 按传入顺序，
+        "shortest_first" 页数少的文档先行，"round_robin" 各文档轮流入队一页。
+        engine="thread" 时由 max_workers 个线程各自同步请求；engine="async" 时由一个事件循环线程
+        以信号量控制最多 max_workers 个在途请求，并发数不再受线程数限制。
+        内存直传时驻留内存的页面数不超过 队列容量 + 并发数；文档指定 persist_dir 时，
+        图片字节会在请求发出后由后台线程异步写入 {页码}.png。
+        adaptive=True 时由AIMD控制器在 [1, max_workers] 范围内动态调整在途请求数，重试预算按全部页数计算。
+        启用页面过滤时，渲染线程在入队前判定空白页（直接保存）与同一文档内的重复页（源页完成后沿用其结果）。
+        pack_size > 1 时每个线程（或每个异步并发名额）一次从队列取最多 pack_size 页合并为一个请求（见 parse_pack），
+        凑不满时最多等待 PACK_CONFIG["max_wait"] 秒；同一组可以包含不同文档的页面。
+        某个文档的页面全部完成后立即写入它的汇总报告并调用其 on_complete；
+        解析、保存结果或回调时抛出的异常只记入该页（记为失败）或该文档的 errors，解析线程意外退出时渲染端停止入队，
+        不会因某一页或某个文档出错而使整批任务卡住。
+        返回值与 jobs 一一对应，包含 total_pages、successful、failed、results 及各项统计。
+        """
+        page_queue = queue.Queue(maxsize=queue_size or max(1, max_workers) * 2)
+        engine_label = f"异步（在途上限 {max_workers}）" if engine == "async" else f"线程池（{max_workers} 线程）"
+        if len(jobs) > 1:
+            engine_label += f"，{len(jobs)} 个文档 / {SCHEDULE_POLICIES.get(policy, policy)}"
+        # 异步引擎只有一个取页线程，线程池则有 max_workers 个线程同时等待
+        stats = PipelineStats(page_queue.maxsize, engine_label, 1 if engine == "async" else max_workers)
+        controller = AdaptiveConcurrencyController(max(1, max_workers)) if adaptive else None
+        retry_budget = RetryBudget.for_pages(sum(job.total_pages for job in jobs))
+        # 内存直传模式下异步保存切片图片
+        image_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1) if any(job.persist_dir for job in jobs) else None
+        for job in jobs:
+            job.page_filter = PageFilter() if self.page_filter else None
+            job.metrics = MetricsLog(job.output_dir) if METRICS_CONFIG["enabled"] else None
+        
+        # 解析线程意外退出时置位，渲染端随即停止入队
+        parse_failed = threading.Event()
+        
+        def note_error(job: DocumentJob, message: str):
+            """记录只影响该文档的异常（写入其汇总报告，相同的异常只记一次）"""
+            with self.lock:
+                if message not in job.errors:
+                    job.errors.append(message)
+        
+        def update_progress(job: DocumentJob):
+            with self.lock:
+                progress = job.completed / job.total_pages if job.total_pages > 0 else 0
+                try:
+                    if job.progress_callback:
+                        job.progress_callback(progress)
+                    if job.status_callback:
+                        job.status_callback(
+                            f"解析进度: {job.completed}/{job.total_pages} 页 (失败: {job.failed}) | "
+                            f"已渲染: {job.rendered} | {stats.describe(page_queue.qsize())}"
+                            + (f" | {controller.describe()}" if controller else "")
+                        )
+                except Exception as e:
+                    if f"进度回调出错: {e}" not in job.errors:
+                        job.errors.append(f"进度回调出错: {e}")
+        
+        def take_page(job: DocumentJob, page_num: int):
+            """解析端取出一页时记录排队等待时间"""
+            timing = job.timings.get(page_num)
+            if timing is not None:
+                timing['dequeued'] = time.perf_counter()
+                timing['queue_wait'] = timing['dequeued'] - timing['enqueued']
+        
+        def finish_page(job: DocumentJob, page_num: int, image_path, outcome: Dict):
+            """保存单页结果、记录性能指标并更新进度（两种引擎共用）"""
+            image = image_path.image if isinstance(image_path, TextLayerPage) else image_path
+            if image_writer and job.persist_dir and isinstance(image, (bytes, bytearray)):
+                image_writer.submit(save_image_bytes, job.persist_dir / f"{page_num}.png", image)
+            try:
+                record = self._save_page_result(job.output_dir, page_num, outcome)
+            except Exception as e:
+                # 结果保存失败：该页记为失败（尽量写出错误说明），不影响其他页面
+                outcome = self._error_outcome(OSError(f"结果保存失败: {e}"))
+                try:
+                    record = self._save_page_result(job.output_dir, page_num, outcome)
+                except Exception:
+                    record = {'success': False, 'error': outcome['content'], 'file_path': None}
+            try:
+                if job.manifest:
+                    job.manifest.mark_page(page_num, record)
+                timing = job.timings.pop(page_num, None)
+                if job.metrics:
+                    if timing and 'dequeued' in timing:
+                        timing['parse'] = time.perf_counter() - timing['dequeued']
+                    job.metrics.record(page_num, outcome, timing)
+            except Exception as e:
+                note_error(job, f"第 {page_num} 页的任务清单/指标记录失败: {e}")
+            
+            with self.lock:
+                job.results[page_num] = record
+                if not outcome['success']:
+                    job.failed += 1
+                job.completed += 1
+                done = job.completed == job.total_pages
+            update_progress(job)
+            if done:
+                finish_document(job)
+            # 等待本页结果的重复页随之完成
+            if job.page_filter and 'page_filter' not in outcome:
+                for follower_num, follower_image, verdict in job.page_filter.resolve(page_num, outcome):
+                    finish_page(job, follower_num, follower_image, filtered_outcome(verdict, outcome))
+        
+        def finish_document(job: DocumentJob):
+            """文档结束：补记未渲染的页面、写汇总报告并通知调用方（每个文档只执行一次）"""
+            with self.lock:
+                if job.finished:
+                    return
+                job.finished = True
+            # 渲染中断时，未产出的页面视为失败
+            for page_num in job.page_numbers:
+                if page_num not in job.results:
+                    job.results[page_num] = {
+                        'success': False,
+                        'error': job.render_error or "页面未渲染",
+                        'file_path': None
+                    }
+                    job.failed += 1
+            
+            successful = sum(1 for r in job.results.values() if r['success'])
+            store_stats = self.close_result_store(job.output_dir)
+            retry_stats = self._retry_section(job.results, retry_budget)
+            upload_stats = self._upload_section(job.results)
+            filter_stats = self._filter_section(job.results)
+            text_layer_stats = self._text_layer_section(job.results)
+            pack_stats = self._pack_section(job.results)
+            usage_stats = self._usage_section(job.results)
+            validation_stats = self._validation_section(job.results)
+            metrics_summary = job.metrics.summary() if job.metrics else None
+            extra_sections = {
+                "流水线统计": stats.to_dict(), **self._cache_section(job.results),
+                "重试统计": retry_stats, "上传统计": upload_stats, "Token用量": usage_stats
+            }
+            if filter_stats is not None:
+                extra_sections["页面过滤"] = filter_stats
+            if text_layer_stats is not None:
+                extra_sections["文字层"] = text_layer_stats
+            if pack_stats is not None:
+                extra_sections["合并请求"] = pack_stats
+            if validation_stats is not None:
+                extra_sections["结果校验"] = validation_stats
+            if store_stats is not None:
+                extra_sections["结果存储"] = store_stats
+            if metrics_summary is not None:
+                extra_sections["性能指标"] = metrics_summary
+            if controller:
+                extra_sections["自适应并发"] = controller.to_dict()
+            if job.manifest:
+                try:
+                    job.manifest.flush()
+                except OSError as e:
+                    note_error(job, f"任务清单写入失败: {e}")
+                extra_sections["断点续传"] = job.manifest.summary_section(job.total_pages)
+            if self.page_filter:
+                try:
+                    save_filter_record(job.output_dir, job.results)
+                except OSError as e:
+                    note_error(job, f"页面过滤记录写入失败: {e}")
+            if job.errors:
+                extra_sections["处理异常"] = {str(i + 1): error for i, error in enumerate(job.errors)}
+            try:
+                self._create_summary_report(job.output_dir, job.total_pages, successful, job.failed, job.results,
+                                            extra_sections)
+            except Exception as e:
+                note_error(job, f"汇总报告写入失败: {e}")
+            
+            job.result = {
+                'total_pages': job.total_pages,
+                'successful': successful,
+                'failed': job.failed,
+                'results': job.results,
+                'pipeline_stats': stats.to_dict(),
+                'retry_stats': retry_stats,
+                'upload_stats': upload_stats,
+                'filter_stats': filter_stats,
+                'text_layer_stats': text_layer_stats,
+                'pack_stats': pack_stats,
+                'usage_stats': usage_stats,
+                'validation_stats': validation_stats,
+                'metrics_summary': metrics_summary,
+                'adaptive_stats': controller.to_dict() if controller else None,
+                'errors': job.errors
+            }
+            if job.on_complete:
+                try:
+                    job.on_complete(job.result)
+                except Exception as e:
+                    note_error(job, f"完成回调出错: {e}")
+        
+        def schedule():
+            """按调度策略交错各文档的页面来源，产出 (文档, 页码, 图片, 渲染耗时, 页面指纹)；单个文档渲染失败不影响其他文档"""
+            order = sorted(jobs, key=lambda job: job.total_pages) if policy == "shortest_first" else list(jobs)
+            active = [(job, iter(job.page_source)) for job in order]
+            while active:
+                for entry in list(active if policy == "round_robin" else active[:1]):
+                    job, iterator = entry
+                    render_start = time.perf_counter()
+                    try:
+                        page_num, image_path, *extra = next(iterator)
+                    except StopIteration:
+                        active.remove(entry)
+                        continue
+                    except Exception as e:
+                        job.render_error = str(e)
+                        if job.status_callback:
+                            try:
+                                job.status_callback(f"❌ 页面渲染失败: {job.render_error}")
+                            except Exception as callback_error:
+                                note_error(job, f"状态回调出错: {callback_error}")
+                        active.remove(entry)
+                        continue
+                    finally:
+                        render_time = time.perf_counter() - render_start
+                        stats.add_render_busy(render_time)
+                    yield job, page_num, image_path, render_time, extra[0] if extra else None
+        
+        def worker():
+            while True:
+                wait_start = time.perf_counter()
+                item = page_queue.get()
+                if item is not None and self.pack_size > 1:
+                    pack, stop = self._take_pack(page_queue, item)
+                    stats.add_parse_idle(time.perf_counter() - wait_start)
+                    for job, page_num, _ in pack:
+                        take_page(job, page_num)
+                    parse_start = time.perf_counter()
+                    try:
+                        outcomes = self.parse_pack(
+                            [(page_num, image_path) for _, page_num, image_path in pack], prompt,
+                            retry_budget=retry_budget, controller=controller
+                        )
+                    except Exception as e:
+                        outcomes = [self._error_outcome(e) for _ in pack]
+                    stats.add_parse_busy(time.perf_counter() - parse_start)
+                    for (job, page_num, image_path), outcome in zip(pack, outcomes):
+                        finish_page(job, page_num, image_path, outcome)
+                    if stop:
+                        break
+                    continue
+                stats.add_parse_idle(time.perf_counter() - wait_start)
+                if item is None:
+                    break
+                
+                job, page_num, image_path = item
+                take_page(job, page_num)
+                parse_start = time.perf_counter()
+                try:
+                    outcome = self.parse_page(image_path, prompt, page_num, retry_budget=retry_budget,
+                                              controller=controller)
+                except Exception as e:
+                    outcome = self._error_outcome(e)
+                stats.add_parse_busy(time.perf_counter() - parse_start)
+                finish_page(job, page_num, image_path, outcome)
+        
+        def async_worker():
+            asyncio.run(self._consume_pages_async(
+                page_queue, max(1, max_workers), prompt, stats, finish_page, retry_budget, controller, take_page
+            ))
+        
+        def run_worker(target):
+            """解析线程入口：意外退出时通知渲染端停止入队"""
+            try:
+                target()
+            except BaseException as e:
+                with self.lock:
+                    for job in jobs:
+                        job.render_error = job.render_error or f"解析线程异常退出: {e}"
+                parse_failed.set()
+                raise
+        
+        def enqueue(item) -> bool:
+            """放入队列（队列满时阻塞等待），返回是否放入
+            
+            页面：解析线程意外退出后放弃；结束标记（None）：只要还有存活的解析线程就继续等待。
+            """
+            while (item is None or not parse_failed.is_set()) and any(thread.is_alive() for thread in workers):
+                try:
+                    page_queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        if engine == "async":
+            workers = [threading.Thread(target=run_worker, args=(async_worker,), name="parse-event-loop", daemon=True)]
+        else:
+            workers = [
+                threading.Thread(target=run_worker, args=(worker,), name=f"parse-worker-{i + 1}", daemon=True)
+                for i in range(max(1, max_workers))
+            ]
+        for thread in workers:
+            thread.start()
+        
+        # 生产者：在调用线程中逐页渲染并入队
+        try:
+            for job, page_num, image_path, render_time, fingerprint in schedule():
+                job.timings[page_num] = {'render': render_time}
+                filter_start = time.perf_counter()
+                verdict = self._filter_page(job.page_filter, page_num, image_path, fingerprint)
+                stats.add_render_busy(time.perf_counter() - filter_start)
+                if verdict is not None:
+                    # 空白页与重复页不进入解析队列
+                    with self.lock:
+                        job.rendered += 1
+                    if verdict['action'] == "blank":
+                        finish_page(job, page_num, image_path, filtered_outcome(verdict))
+                    else:
+                        source_outcome = job.page_filter.defer(page_num, image_path, verdict)
+                        if source_outcome is not None:
+                            finish_page(job, page_num, image_path, filtered_outcome(verdict, source_outcome))
+                    continue
+                
+                put_start = time.perf_counter()
+                job.timings[page_num]['enqueued'] = put_start
+                if not enqueue((job, page_num, image_path)):
+                    break
+                stats.add_render_idle(time.perf_counter() - put_start)
+                stats.sample_depth(page_queue.qsize())
+                
+                with self.lock:
+                    job.rendered += 1
+                update_progress(job)
+        except Exception as e:
+            for job in jobs:
+                job.render_error = job.render_error or str(e)
+        finally:
+            for _ in workers:
+                if not enqueue(None):
+                    break
+            for thread in workers:
+                thread.join()
+            if image_writer:
+                image_writer.shutdown(wait=True)
+            # 取消或中断时也写回各文档清单中尚未保存的页面状态
+            for job in jobs:
+                if job.manifest:
+                    try:
+                        job.manifest.flush()
+                    except OSError as e:
+                        note_error(job, f"任务清单写入失败: {e}")
+        
+        stats.finish()
+        # 渲染中断或没有待处理页面的文档在这里收尾
+        for job in jobs:
+            finish_document(job)
+        return [job.result for job in jobs]
+    
+    async def _consume_pages_async(self, page_queue: queue.Queue, concurrency: int, prompt: str,
+                                   stats: "PipelineStats", finish_page,
+                                   retry_budget: Optional[RetryBudget] = None,
+                                   controller: Optional[AdaptiveConcurrencyController] = None,
+                                   take_page=None):
+        """异步引擎：从队列取页并发处理，处理中的页面数不超过 concurrency
+        
+        启用自适应并发时，实际在途请求数再由控制器的当前上限约束（退避等待中的页面不占请求名额）。
+        pack_size > 1 时按组取页，每组占用一个名额。take_page 在每页出队时调用（记录排队等待）。
+        finish_page（写结果文件、任务清单、指标、标签索引与汇总报告）在单独的写入线程中按完成顺序执行，
+        网络存储上的文件读写不会阻塞事件循环中其他在途的请求；写完后才释放并发名额。
+        """
+        loop = asyncio.get_running_loop()
+        client = self.create_async_client(concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = set()
+        writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse-writer")
+        
+        def finish_pack(pack: List[Tuple], outcomes: List[Dict]):
+            for (job, page_num, image_path), outcome in zip(pack, outcomes):
+                finish_page(job, page_num, image_path, outcome)
+        
+        async def handle(job: "DocumentJob", page_num: int, image_path):
+            try:
+                parse_start = time.perf_counter()
+                try:
+                    outcome = await self.parse_page_async(
+                        client, image_path, prompt, page_num, retry_budget=retry_budget, controller=controller
+                    )
+                except Exception as e:
+                    outcome = self._error_outcome(e)
+                stats.add_parse_busy(time.perf_counter() - parse_start)
+                await loop.run_in_executor(writer, finish_page, job, page_num, image_path, outcome)
+            finally:
+                semaphore.release()
+        
+        async def handle_pack(pack: List[Tuple]):
+            try:
+                parse_start = time.perf_counter()
+                try:
+                    outcomes = await self.parse_pack_async(
+                        client, [(page_num, image_path) for _, page_num, image_path in pack], prompt,
+                        retry_budget=retry_budget, controller=controller
+                    )
+                except Exception as e:
+                    outcomes = [self._error_outcome(e) for _ in pack]
+                stats.add_parse_busy(time.perf_counter() - parse_start)
+                await loop.run_in_executor(writer, finish_pack, pack, outcomes)
+            finally:
+                semaphore.release()
+        
+        # 队列的阻塞读取放到单独线程，避免阻塞事件循环
+        getter = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse-queue")
+        try:
+            while True:
+                # 先占用并发名额再取页：名额用满时停止取页，队列积满后渲染端自然阻塞
+                await semaphore.acquire()
+                wait_start = time.perf_counter()
+                item = await loop.run_in_executor(getter, page_queue.get)
+                if item is not None and self.pack_size > 1:
+                    # 合并请求：一组页面占用一个并发名额
+                    pack, stop = await loop.run_in_executor(getter, self._take_pack, page_queue, item)
+                    stats.add_parse_idle(time.perf_counter() - wait_start)
+                    if take_page:
+                        for job, page_num, _ in pack:
+                            take_page(job, page_num)
+                    task = asyncio.create_task(handle_pack(pack))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    if stop:
+                        break
+                    continue
+                stats.add_parse_idle(time.perf_counter() - wait_start)
+                if item is None:
+                    semaphore.release()
+                    break
+                if take_page:
+                    take_page(item[0], item[1])
+                task = asyncio.create_task(handle(*item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            getter.shutdown(wait=False)
+            # 已提交的结果全部写完再返回
+            writer.shutdown(wait=True)
+            await client.close()
+    
+    def _take_pack(self, page_queue: queue.Queue, first_item: Tuple) -> Tuple[List[Tuple], bool]:
+        """从队列再取最多 pack_size-1 页与 first_item 组成一组，返回 (页面列表, 是否已取到结束标记)
+        
+        凑满前最多等待 PACK_CONFIG["max_wait"] 秒；取到结束标记（None）时立即发送已取到的页面。
+        """
+        pack = [first_item]
+        deadline = time.perf_counter() + PACK_CONFIG["max_wait"]
+        while len(pack) < self.pack_size:
+            try:
+                item = page_queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is None:
+                return pack, True
+            pack.append(item)
+        return pack, False
+    
+    def _save_page_result(self, output_dir: Path, page_num: int, outcome: Dict) -> Dict:
+        """保存单页解析结果（逐页文件或合并存储），返回结果记录
+        
+        空白页不保存单页结果（过滤判定另记入 page_filter.json），只清除该页此前留下的结果。
+        """
+        content = outcome['content']
+        upload = outcome.get('upload')
+        store = self._result_store(output_dir)
+        if outcome['success']:
+            if (outcome.get('page_filter') or {}).get('action') == "blank":
+                if store is not None:
+                    store.discard(page_num)
+                self._remove_page_files(output_dir, page_num)
+                result_path = None
+            elif store is not None:
+                store.put(page_num, {'success': True, 'content': content})
+                result_path = store.data_path
+                # 此前导出或逐页模式留下的文件已过时（读取时逐页文件不再优先，这里一并清除）
+                self._remove_page_files(output_dir, page_num)
+            else:
+                # 保存成功结果（纯净JSON格式，使用.json扩展名）
+                result_path = output_dir / f"{page_num}.json"
+                with open(result_path, "w", encoding="utf-8") as f:
+                    # 只写入纯净的解析结果，不添加任何标题或时间戳
+                    f.write(content)
+                # 续传/重试失败页成功后，删除此前留下的错误说明
+                (output_dir / f"{page_num}_error.txt").unlink(missing_ok=True)
+            self._index_page_tags(output_dir, page_num, content)
+            
+            return {
+                'success': True,
+                'content': content,
+                'file_path': str(result_path) if result_path else None,
+                'cached': outcome.get('cached', False),
+                'attempts': outcome.get('attempts', 0),
+                'upload': upload,
+                'page_filter': outcome.get('page_filter'),
+                'text_layer': outcome.get('text_layer'),
+                'packed': outcome.get('packed'),
+                'usage': outcome.get('usage'),
+                'latency': outcome.get('latency'),
+                'ttft': outcome.get('ttft'),
+                'stream': outcome.get('stream'),
+                'validation': outcome.get('validation')
+            }
+        
+        # 保存错误信息
+        report = self._error_report(page_num, outcome)
+        if store is not None:
+            store.put(page_num, {'success': False, 'error': content, 'report': report})
+            error_path = store.data_path
+            self._remove_page_files(output_dir, page_num)
+        else:
+            error_path = output_dir / f"{page_num}_error.txt"
+            with open(error_path, "w", encoding="utf-8") as f:
+                f.write(report)
+            # 重新解析失败时删除旧的结果文件，目录中每页只保留一种结果
+            (output_dir / f"{page_num}.json").unlink(missing_ok=True)
+        # 该页已没有成功结果，从标签索引中移除
+        self._index_page_tags(output_dir, page_num, "")
+        
+        return {
+            'success': False,
+            'error': content,
+            'file_path': str(error_path),
+            'attempts': outcome.get('attempts', 0),
+            'upload': upload,
+            'page_filter': outcome.get('page_filter'),
+            'text_layer': outcome.get('text_layer'),
+            'packed': outcome.get('packed'),
+            'usage': outcome.get('usage'),
+            'latency': outcome.get('latency'),
+            'ttft': outcome.get('ttft'),
+            'stream': outcome.get('stream'),
+            'validation': outcome.get('validation')
+        }
+    
+    @staticmethod
+    def _remove_page_files(output_dir: Path, page_num: int):
+        """删除某页的逐页结果文件（{页码}.json / {页码}_error.txt）"""
+        (output_dir / f"{page_num}.json").unlink(missing_ok=True)
+        (output_dir / f"{page_num}_error.txt").unlink(missing_ok=True)
+    
+    def _index_page_tags(self, output_dir: Path, page_num: int, content: str):
+        """将成功结果的标签登记到倒排索引（索引出错不影响结果保存）"""
+        if self.tag_index is None:
+            return
+        try:
+            self.tag_index.index_page(output_dir, page_num, content)
+        except sqlite3.Error:
+            # 索引可随时由 TagIndex.rebuild() 按已保存的结果补建
+            pass
+    
+    @staticmethod
+    def _error_report(page_num: int, outcome: Dict) -> str:
+        """失败页面的错误说明（{页码}_error.txt 的内容）"""
+        upload = outcome.get('upload')
+        lines = [
+            f"页面 {page_num} 解析失败",
+            f"错误信息: {outcome['content']}",
+            f"请求次数: {outcome.get('attempts', 0)}"
+        ]
+        if upload:
+            lines.append(f"图片: {describe_upload(upload)}")
+        if outcome.get('page_filter'):
+            lines.append(f"页面过滤: {describe_filter(outcome['page_filter'])}")
+        if outcome.get('text_layer'):
+            lines.append(f"发送方式: {describe_text_layer(outcome['text_layer'])}")
+        if outcome.get('packed'):
+            lines.append(f"合并请求: {describe_pack(outcome['packed'])}")
+        if outcome.get('stream'):
+            lines.append(f"流式接收: {describe_stream(outcome['stream'])}")
+        if outcome.get('validation'):
+            lines.append(f"结果校验: {describe_validation(outcome['validation'])}")
+            if outcome['validation'].get('raw'):
+                lines.append(f"模型原始输出: {outcome['validation']['raw']}")
+        lines.append(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        return "\n".join(lines)
+    
+    def _result_store(self, output_dir: Path) -> Optional[ResultStore]:
+        """文档的合并结果存储（每个输出目录一个，首次写入时打开）；逐页文件模式下为None
+        
+        目录中已有合并存储时（此前以合并存储模式解析过），逐页文件模式也继续写入存储，保证读取以存储为准时结果最新。
+        """
+        key = Path(output_dir)
+        if self.result_store != "jsonl" and not ResultStore.exists(key):
+            return None
+        with self.lock:
+            store = self._stores.get(key)
+            if store is None:
+                store = self._stores[key] = ResultStore(key)
+            return store
+    
+    def close_result_store(self, output_dir: Path) -> Optional[Dict]:
+        """写完并关闭文档的合并结果存储（文档解析结束时调用），返回汇总报告中的存储信息；逐页文件模式下为None"""
+        with self.lock:
+            store = self._stores.pop(Path(output_dir), None)
+        if store is None:
+            return None
+        store.close()
+        return {
+            '存储方式': RESULT_STORE_FORMATS["jsonl"],
+            '数据文件': store.data_path.name,
+            '索引文件': store.index_path.name,
+            '写入错误': store.error or "无"
+        }
+    
+    def close_result_stores(self):
+        """关闭全部已打开的合并结果存储（中断退出时确保已提交的结果写入磁盘）"""
+        for output_dir in list(self._stores):
+            self.close_result_store(output_dir)
+    
+    def _filter_page(self, page_filter: Optional[PageFilter], page_num: int, image_path,
+                     fingerprint: Optional[Dict] = None) -> Optional[Dict]:
+        """页面过滤判定（优先使用渲染时算好的指纹）；未启用、仅发送文字的页面或判定出错时返回None（照常解析）"""
+        if isinstance(image_path, TextLayerPage):
+            image_path = image_path.image
+        if page_filter is None or image_path is None:
+            return None
+        try:
+            return page_filter.check(page_num, image_path, fingerprint)
+        except Exception:
+            return None
+    
+    def _cache_section(self, results: Dict) -> Dict[str, Dict]:
+        """汇总报告中的缓存统计"""
+        if self.cache is None:
+            return {}
+        hits = sum(1 for r in results.values() if r.get('cached'))
+        filtered = sum(1 for r in results.values() if r.get('page_filter'))
+        return {
+            "缓存统计": {
+                '缓存命中页数': hits,
+                '调用API页数': len(results) - hits - filtered,
+                '跳过缓存读取': "是" if self.bypass_cache else "否"
+            }
+        }
+    
+    def _upload_section(self, results: Dict) -> Dict:
+        """汇总报告中的上传统计：实际上传字节（含重试）与估算图像token，逐页列出图片尺寸和大小"""
+        uploads = {
+            page_num: result for page_num, result in sorted(results.items())
+            if result.get('upload')
+        }
+        sent = [r for r in uploads.values() if not r.get('cached')]
+        total_bytes = sum(r['upload']['bytes'] * max(1, r.get('attempts', 1)) for r in sent)
+        total_tokens = sum(r['upload']['tokens'] for r in sent)
+        section = {
+            '上传页数': len(sent),
+            '上传总量': format_file_size(total_bytes),
+            '平均每页': format_file_size(total_bytes // len(sent)) if sent else "0 B",
+            '估算图像token总数': total_tokens,
+            '平均每页图像token': round(total_tokens / len(sent)) if sent else 0
+        }
+        for page_num, result in uploads.items():
+            section[f"第 {page_num} 页"] = describe_upload(result['upload']) + ("（缓存命中，未上传）" if result.get('cached') else "")
+        return section
+    
+    def _filter_section(self, results: Dict) -> Optional[Dict]:
+        """汇总报告中的页面过滤统计，逐页列出跳过的空白页与沿用结果的重复页（未启用时返回None）"""
+        if not self.page_filter:
+            return None
+        filtered = {
+            page_num: result['page_filter'] for page_num, result in sorted(results.items())
+            if result.get('page_filter')
+        }
+        actions = [verdict['action'] for verdict in filtered.values()]
+        section = {
+            '空白页': actions.count("blank"),
+            '重复页': actions.count("duplicate"),
+            '节省API调用': len(filtered)
+        }
+        for page_num, verdict in filtered.items():
+            section[f"第 {page_num} 页"] = describe_filter(verdict)
+        return section
+    
+    def _text_layer_section(self, results: Dict) -> Optional[Dict]:
+        """汇总报告中的文字层统计：各发送方式的页数，逐页列出选择的方式与原因（未使用文字层时返回None）"""
+        routed = {
+            page_num: result['text_layer'] for page_num, result in sorted(results.items())
+            if result.get('text_layer')
+        }
+        if not routed:
+            return None
+        routes = [info['route'] for info in routed.values()]
+        section = {f"{label}页数": routes.count(route) for route, label in TEXT_LAYER_ROUTES.items()}
+        for page_num, info in routed.items():
+            section[f"第 {page_num} 页"] = describe_text_layer(info)
+        return section
+    
+    def _usage_section(self, results: Dict) -> Dict:
+        """汇总报告中的token用量：输入/输出token、命中服务端前缀缓存的输入token及平均请求延迟
+        
+        调用了API但接口未返回用量的页面（如流式接收在JSON完整后提前断开）单独计数，不计入token合计。
+        """
+        used = [result['usage'] for result in results.values() if result.get('usage')]
+        latencies = [result['latency'] for result in results.values() if result.get('latency') is not None]
+        missing = sum(
+            1 for result in results.values()
+            if result.get('latency') is not None and not result.get('cached') and not result.get('usage')
+        )
+        total = merge_usage(*used) or {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+        section = {
+            '消息布局': PROMPT_LAYOUTS.get(self.prompt_layout, self.prompt_layout),
+            '计费页数': len(used),
+            '未返回用量页数': missing,
+            '输入token': total['prompt_tokens'],
+            '其中缓存命中token': total['cached_tokens'],
+            '输入缓存命中率': f"{total['cached_tokens'] / total['prompt_tokens']:.1%}" if total['prompt_tokens'] else "0.0%",
+            '输出token': total['completion_tokens'],
+            '平均每页输入token': round(total['prompt_tokens'] / len(used)) if used else 0,
+            '平均请求延迟（秒）': round(sum(latencies) / len(latencies), 3) if latencies else 0
+        }
+        if missing:
+            section['说明'] = f"{missing} 页已调用API但未返回token用量（流式提前断开等），以上token合计不含这些页面，实际用量更高"
+        return section
+    
+    def _pack_section(self, results: Dict) -> Optional[Dict]:
+        """汇总报告中的合并请求统计，逐页列出回退为单页请求的页面及原因（未启用合并时返回None）"""
+        if self.pack_size <= 1:
+            return None
+        packed = {page_num: result['packed'] for page_num, result in sorted(results.items()) if result.get('packed')}
+        fallback = {page_num: info for page_num, info in packed.items() if info.get('fallback')}
+        section = {
+            '每个请求合并页数': self.pack_size,
+            '合并发送页数': len(packed) - len(fallback),
+            '回退单页请求页数': len(fallback)
+        }
+        for page_num, info in fallback.items():
+            section[f"第 {page_num} 页"] = describe_pack(info)
+        return section
+    
+    def _validation_section(self, results: Dict) -> Optional[Dict]:
+        """汇总报告中的结果校验统计，逐页列出经过修复、重新请求或未通过的页面；未做校验时为None"""
+        checked = {
+            page_num: result['validation'] for page_num, result in sorted(results.items()) if result.get('validation')
+        }
+        if not checked:
+            return None
+        statuses = [info['status'] for info in checked.values()]
+        section = {
+            '校验页数': len(checked),
+            '直接通过': statuses.count("valid"),
+            '本地修复': statuses.count("repaired"),
+            '重新请求后通过': statuses.count("reasked"),
+            '未通过': statuses.count("invalid")
+        }
+        for page_num, info in checked.items():
+            if info['status'] != "valid":
+                section[f"第 {page_num} 页"] = describe_validation(info)
+        return section
+    
+    def _retry_section(self, results: Dict, retry_budget: RetryBudget) -> Dict:
+        """汇总报告中的重试统计，逐页列出发生过重试的页面及最终请求次数"""
+        retried = {
+            page_num: result for page_num, result in sorted(results.items())
+            if result.get('attempts', 0) > 1
+        }
+        section = {
+            '重试页数': len(retried),
+            '重试总次数': sum(r['attempts'] - 1 for r in retried.values()),
+            '重试预算(已用/总数)': f"{retry_budget.used}/{retry_budget.total}",
+            '预算用尽未重试': retry_budget.denied
+        }
+        for page_num, result in retried.items():
+            section[f"第 {page_num} 页"] = f"共请求 {result['attempts']} 次，最终{'成功' if result['success'] else '失败'}"
+        return section
+    
+    def _create_summary_report(
+        self,
+        output_dir: Path,
+        total: int,
+        success: int,
+        failed: int,
+        results: Dict,
+        extra_sections: Optional[Dict[str, Dict]] = None
+    ):
         """创建汇总报告"""
         summary_path = output_dir / "_summary.txt"
         
@@ -175,15 +1919,356 @@ class AIParser:
             f.write(f"总页数: {total}\n")
             f.write(f"成功解析: {success} 页\n")
             f.write(f"解析失败: {failed} 页\n")
-            f.write(f"成功率: {(success/total*100):.1f}%\n")
+            f.write(f"成功率: {(success/total*100 if total else 0):.1f}%\n")
             f.write(f"解析时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
             
             if failed > 0:
                 f.write("失败页面详情:\n")
                 f.write("-" * 30 + "\n")
-                for page_num, result in results.items():
+                for page_num, result in sorted(results.items()):
                     if not result['success']:
                         f.write(f"第 {page_num} 页: {result['error']}\n")
+            
+            # 附加统计（流水线等）
+            for title, section in (extra_sections or {}).items():
+                f.write(f"\n{title}:\n")
+                f.write("-" * 30 + "\n")
+                for label, value in section.items():
+                    f.write(f"{label}: {value}\n")
+
+
+class DocumentJob:
+    """跨文件调度中的一个文档：页面来源、输出位置、进度回调与解析结果
+    
+    page_source 逐页产出 (页码, 图片路径或图片字节)，也可以附带渲染时算好的页面指纹：(页码, 图片, 指纹)。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        page_source: Iterable[Tuple],
+        page_numbers: Iterable[int],
+        output_dir: Path,
+        manifest: Optional[JobManifest] = None,
+        persist_dir: Optional[Path] = None,
+        progress_callback=None,
+        status_callback=None,
+        on_complete=None
+    ):
+        self.name = name
+        self.page_source = page_source
+        self.page_numbers = list(page_numbers)
+        self.total_pages = len(self.page_numbers)
+        self.output_dir = output_dir
+        self.manifest = manifest
+        self.persist_dir = persist_dir
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.on_complete = on_complete
+        self.page_filter = None
+        self.metrics = None
+        self.timings = {}    # 页码 -> 流水线各阶段计时（渲染、入队、出队）
+        self.results = {}
+        self.completed = 0
+        self.failed = 0
+        self.rendered = 0
+        self.render_error = None
+        self.errors = []     # 本文档范围内的异常（结果保存、回调、汇总报告），不影响其他文档
+        self.finished = False
+        self.result = None
+
+
+class TextLayerPage:
+    """附带PDF文字层的页面（由 PDFProcessor 按页分类产出）
+    
+    route 为发送方式：text 只发送提取的文字（image为None），mixed 发送低DPI图片和文字，image 只发送图片；
+    reason 为分类依据，随解析结果写入报告。
+    """
+    
+    def __init__(self, route: str, reason: str, text: str = "", image: Optional[Union[Path, bytes]] = None):
+        self.route = route
+        self.reason = reason
+        self.text = text
+        self.image = image
+    
+    def prompt_note(self) -> str:
+        """附在提示词前的文字层说明"""
+        if self.route == "text":
+            return f"本页为PDF文字页，未附图片，以下是从PDF文字层提取的文本：\n{self.text}\n\n"
+        if self.route == "mixed":
+            return f"另附从该页PDF文字层提取的文本，图片中难以辨认的文字以此为准：\n{self.text}\n\n"
+        return ""
+    
+    def to_dict(self) -> Dict:
+        return {'route': self.route, 'reason': self.reason, 'chars': len(self.text)}
+
+
+def with_text_layer(outcome: Dict, text_page: Optional[TextLayerPage]) -> Dict:
+    """在单页结果中记录文字层的发送方式与原因"""
+    if text_page is not None:
+        outcome['text_layer'] = text_page.to_dict()
+    return outcome
+
+
+def describe_pack(info: Dict) -> str:
+    """合并请求信息的可读描述"""
+    if info.get('fallback'):
+        return f"未能从 {info['size']} 页合并请求中取得结果，改为单页请求：{info['reason']}"
+    return f"{info['size']} 页合并请求中的第 {info['index']} 张"
+
+
+def describe_stream(info: Dict) -> str:
+    """流式接收信息的简短描述"""
+    label = STREAM_STOP_REASONS.get(info['stop'], info['stop'])
+    ttft = f"，首字 {info['ttft']:.2f}s" if info.get('ttft') is not None else ""
+    return f"{label}（已接收 {info['chars']} 字{ttft}）"
+
+
+def describe_text_layer(info: Dict) -> str:
+    """报告中单页发送方式的描述"""
+    return f"{TEXT_LAYER_ROUTES.get(info['route'], info['route'])}：{info['reason']}"
+
+
+class PipelineStats:
+    """流水线统计：各阶段忙碌/空闲时间与队列深度"""
+    
+    def __init__(self, queue_capacity: int, engine_label: str = "", parse_waiters: int = 1):
+        self.queue_capacity = queue_capacity
+        self.engine_label = engine_label
+        # 同时等待取页的解析线程数：parse_idle 是它们的累计值，比较瓶颈前需折算为单线程
+        self.parse_waiters = max(1, parse_waiters)
+        self.render_busy = 0.0
+        self.render_idle = 0.0
+        self.parse_busy = 0.0
+        self.parse_idle = 0.0
+        self.max_depth = 0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+    
+    def add_render_busy(self, seconds: float):
+        with self.lock:
+            self.render_busy += seconds
+    
+    def add_render_idle(self, seconds: float):
+        """渲染阶段因队列已满而阻塞的时间（解析是瓶颈）"""
+        with self.lock:
+            self.render_idle += seconds
+    
+    def add_parse_busy(self, seconds: float):
+        with self.lock:
+            self.parse_busy += seconds
+    
+    def add_parse_idle(self, seconds: float):
+        """解析线程因队列为空而等待的时间（渲染是瓶颈）"""
+        with self.lock:
+            self.parse_idle += seconds
+    
+    def sample_depth(self, depth: int):
+        with self.lock:
+            self.max_depth = max(self.max_depth, depth)
+            self.depth_samples += 1
+            self.depth_total += depth
+    
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+    
+    def bottleneck(self) -> str:
+        """根据空闲时间判断瓶颈阶段（渲染只有一个线程，解析空闲按线程数取平均后再比较）"""
+        parse_idle = self.parse_idle / self.parse_waiters
+        if self.render_idle > parse_idle:
+            return "AI解析"
+        if parse_idle > self.render_idle:
+            return "PDF渲染"
+        return "无明显瓶颈"
+    
+    def describe(self, current_depth: int) -> str:
+        """状态栏中显示的简要信息"""
+        with self.lock:
+            return (
+                f"队列: {current_depth}/{self.queue_capacity} | "
+                f"渲染等待: {self.render_idle:.1f}s | 解析空闲: {self.parse_idle:.1f}s"
+            )
+    
+    def to_dict(self) -> Dict:
+        with self.lock:
+            avg_depth = self.depth_total / self.depth_samples if self.depth_samples else 0
+            return {
+                '解析引擎': self.engine_label,
+                '总耗时(秒)': round(self.elapsed or time.perf_counter() - self.started, 2),
+                '渲染耗时(秒)': round(self.render_busy, 2),
+                '渲染等待队列(秒)': round(self.render_idle, 2),
+                '解析累计耗时(秒)': round(self.parse_busy, 2),
+                '解析线程空闲(秒)': round(self.parse_idle, 2),
+                '解析线程平均空闲(秒)': round(self.parse_idle / self.parse_waiters, 2),
+                '队列容量': self.queue_capacity,
+                '最大队列深度': self.max_depth,
+                '平均队列深度': round(avg_depth, 2),
+                '瓶颈阶段': self.bottleneck()
+            }
+
+
+def normalize_image_bytes(image_bytes: bytes, max_size_mb: float = 10) -> Tuple[bytes, Dict]:
+    """统一为RGB PNG，超过 max_size_mb 的图片按比例缩小；返回 (PNG字节, 文件信息)"""
+    original_size_mb = len(image_bytes) / (1024 * 1024)
+    image = Image.open(io.BytesIO(image_bytes))
+    image_format = image.format or "未知"
+
+    # 转换为RGB模式（透明背景填充为白色）
+    if image.mode in ['RGBA', 'P']:
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    file_info = {
+        'original_size_mb': round(original_size_mb, 2),
+        'original_dimensions': image.size,
+        'format': image_format,
+        'compressed': False,
+        'compression_ratio': 1.0
+    }
+
+    compressed = original_size_mb > max_size_mb
+    if compressed:
+        # 保守压缩：按面积比例缩小，最多缩到0.8倍边长
+        scale_factor = min(0.8, (max_size_mb / original_size_mb) ** 0.5)
+        image = image.resize(
+            (int(image.size[0] * scale_factor), int(image.size[1] * scale_factor)),
+            Image.Resampling.LANCZOS
+        )
+        file_info.update({
+            'compressed': True,
+            'new_dimensions': image.size,
+            'scale_factor': round(scale_factor, 3)
+        })
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True, compress_level=9 if compressed else 6)
+    processed_bytes = buffer.getvalue()
+    processed_size_mb = len(processed_bytes) / (1024 * 1024)
+    file_info.update({
+        'processed_size_mb': round(processed_size_mb, 2),
+        'compression_ratio': round(original_size_mb / processed_size_mb, 2) if processed_size_mb > 0 else 1.0
+    })
+    return processed_bytes, file_info
+
+
+class ImageBatchParser:
+    """图片批量解析：后台线程池并发预处理与解析，结果写入 results/errors，由界面轮询读取
+
+    解析进度不依赖Streamlit脚本重跑驱动；界面定期调用 snapshot() 显示进度、take_results() 合并新结果。
+    所有图片共享一个重试预算；cancel() 后尚未开始的图片不再解析，进行中的请求自然结束。
+    """
+
+    def __init__(self, ai_parser: "AIParser", images: List[Tuple[str, bytes]], prompt: str,
+                 max_workers: int, max_size_mb: float = 10):
+        self.ai_parser = ai_parser
+        self.images = images
+        self.prompt = prompt
+        self.max_workers = max(1, max_workers)
+        self.max_size_mb = max_size_mb
+        self.total = len(images)
+        self.results = {}
+        self.new_results = {}
+        self.errors = {}
+        self.in_flight = set()
+        self.cached = 0
+        self.completed = 0
+        self.skipped = 0
+        self.retry_budget = RetryBudget.for_pages(self.total)
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.executor = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self) -> "ImageBatchParser":
+        self.started = time.perf_counter()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="image-parse"
+        )
+        for index, (name, image_bytes) in enumerate(self.images, 1):
+            future = self.executor.submit(self._parse_one, index, name, image_bytes)
+            future.add_done_callback(self._on_done)
+        # 不等待：线程池在全部任务完成后自行退出
+        self.executor.shutdown(wait=False)
+        return self
+
+    def cancel(self):
+        """停止解析：丢弃排队中的图片"""
+        self.cancel_event.set()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _parse_one(self, index: int, name: str, image_bytes: bytes):
+        if self.cancel_event.is_set():
+            return None
+        with self.lock:
+            self.in_flight.add(name)
+        try:
+            processed_bytes, _ = normalize_image_bytes(image_bytes, self.max_size_mb)
+            outcome = self.ai_parser.parse_page(
+                processed_bytes, self.prompt, index,
+                intro=f"这是第{index}张图片。", retry_budget=self.retry_budget
+            )
+        except Exception as e:
+            outcome = {'success': False, 'content': f"图片处理失败: {str(e)}", 'cached': False}
+
+        with self.lock:
+            self.in_flight.discard(name)
+            if outcome['success']:
+                self.results[name] = outcome['content']
+                self.new_results[name] = outcome['content']
+                if outcome.get('cached'):
+                    self.cached += 1
+            else:
+                self.errors[name] = outcome['content']
+        return outcome
+
+    def _on_done(self, future: concurrent.futures.Future):
+        with self.lock:
+            if future.cancelled() or future.result() is None:
+                self.skipped += 1
+            else:
+                self.completed += 1
+            if self.completed + self.skipped == self.total:
+                self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def finished(self) -> bool:
+        with self.lock:
+            return self.completed + self.skipped == self.total
+
+    def take_results(self) -> Dict[str, str]:
+        """取出上次调用以来新完成的解析结果（界面据此增量合并）"""
+        with self.lock:
+            new_results, self.new_results = self.new_results, {}
+        return new_results
+
+    def snapshot(self) -> Dict:
+        """当前进度与结果副本（供界面轮询）"""
+        with self.lock:
+            finished = self.completed + self.skipped == self.total
+            elapsed = self.elapsed if finished else time.perf_counter() - (self.started or time.perf_counter())
+            return {
+                'total': self.total,
+                'completed': self.completed,
+                'failed': len(self.errors),
+                'skipped': self.skipped,
+                'cached': self.cached,
+                'in_flight': sorted(self.in_flight),
+                'errors': dict(self.errors),
+                'finished': finished,
+                'cancelled': self.cancel_event.is_set(),
+                'elapsed': elapsed,
+                'rate': self.completed / elapsed if elapsed > 0 else 0.0
+            }
 
 
 class FileManager:
@@ -215,6 +2300,7 @@ class FileManager:
                 f.write(uploaded_file.getvalue())
             return True
         except Exception as e:
+            import streamlit as st  # 仅Web界面使用，核心模块不在加载时依赖Streamlit
             st.error(f"文件保存失败: {str(e)}")
             return False
     
@@ -238,6 +2324,7 @@ class ProgressTracker:
     
     def create_progress_bar(self, key: str, label: str = ""):
         """创建进度条"""
+        import streamlit as st  # 仅Web界面使用
         if key not in self.progress_bars:
             self.progress_bars[key] = st.progress(0)
             if label:
@@ -258,6 +2345,427 @@ class ProgressTracker:
                 self.status_texts[key].text("✅ 完成")
 
 
+# ==================== PDF页面渲染 ====================
+# 渲染函数放在本模块（而非main_app.py）中，保证渲染子进程导入时没有界面副作用
+
+def encode_pixmap(pix, compress_level: int = 6) -> bytes:
+    """将pixmap的原始像素一次性编码为PNG
+    
+    直接从 pix.samples 构建图像并只编码一次，避免 PNG编码→解码→optimize重编码 的往返。
+    compress_level 取 0-9，数值越小编码越快、文件越大。
+    """
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[pix.n]
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def render_page(pdf_document, page_index: int, matrix, output_dir: Optional[Path] = None, compress_level: int = 6,
+                with_fingerprint: bool = False) -> Tuple[Union[Path, bytes], Optional[Dict]]:
+    """渲染单页，返回 (图片, 页面指纹)
+    
+    output_dir为None时图片为PNG字节，否则保存为 {页码}.png 并返回路径；
+    with_fingerprint=True 时趁pixmap还在内存中算出页面过滤所需的指纹（见 page_filter.pixmap_fingerprint），否则为None。
+    """
+    # 渲染页面为图片
+    pix = pdf_document[page_index].get_pixmap(matrix=matrix)
+    fingerprint = pixmap_fingerprint(pix) if with_fingerprint else None
+    image_bytes = encode_pixmap(pix, compress_level)
+    
+    # 释放pixmap内存
+    pix = None
+    
+    if output_dir is None:
+        return image_bytes, fingerprint
+    return save_image_bytes(output_dir / f"{page_index + 1}.png", image_bytes), fingerprint
+
+
+def render_page_to_bytes(pdf_document, page_index: int, matrix, compress_level: int = 6) -> bytes:
+    """渲染单页并返回PNG字节（不落盘）"""
+    return render_page(pdf_document, page_index, matrix, None, compress_level)[0]
+
+
+def save_image_bytes(image_path: Path, image_bytes: bytes) -> Path:
+    """将已编码的图片字节写入文件"""
+    with open(image_path, "wb") as f:
+        f.write(image_bytes)
+    return image_path
+
+
+def render_page_to_file(pdf_document, page_index: int, matrix, output_dir: Path, compress_level: int = 6) -> Path:
+    """渲染单页并保存为 {页码}.png，返回图片路径"""
+    return render_page(pdf_document, page_index, matrix, output_dir, compress_level)[0]
+
+
+# 流式接收的结束方式
+STREAM_STOP_REASONS = {
+    "json_complete": "JSON完整后提前断开",
+    "finished": "模型正常结束",
+    "runaway": "输出失控已截断"
+}
+
+
+class JsonStreamScanner:
+    """增量扫描模型输出，找出第一个完整的顶层JSON值（对象或数组）
+    
+    只跟踪括号深度与字符串/转义状态，不做完整解析；JSON之前的文字（如代码块标记）被跳过。
+    """
+    
+    def __init__(self):
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.length = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+    
+    def feed(self, text: str) -> bool:
+        """追加一段输出，顶层JSON值已完整时返回True"""
+        offset = self.length
+        self.length += len(text)
+        if self.end is not None:
+            return True
+        for position, char in enumerate(text, offset):
+            if self.start is None:
+                if char in "{[":
+                    self.start, self.depth = position, 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = position + 1
+                    return True
+        return False
+
+
+class StreamCollector:
+    """逐块收集流式响应：记录首字延迟，迟迟不出现JSON或超出字数上限时判为失控
+    
+    顶层JSON完整后继续接收收尾的空白、代码块标记与流末尾的用量，一旦出现多余文字或总字数超出上限立即结束
+    （提前结束时收不到流末尾的用量，汇总报告中计为“未返回用量”）。
+    """
+    
+    def __init__(self, start: float, pages: int = 1):
+        self.start = start
+        self.max_chars = STREAM_CONFIG["max_chars"] * max(1, pages)
+        self.scanner = JsonStreamScanner()
+        self.parts: List[str] = []
+        self.ttft: Optional[float] = None
+        self.usage: Optional[Dict] = None
+        self.stop = "finished"
+    
+    def add(self, chunk) -> bool:
+        """处理一个响应块，返回True表示可以停止接收"""
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = usage_from_response(chunk)
+        if not chunk.choices:
+            return False
+        text = chunk.choices[0].delta.content
+        if not text:
+            return False
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+        offset = self.scanner.length
+        self.parts.append(text)
+        if self.scanner.feed(text):
+            # JSON完整后只容许收尾的空白与代码块标记，且总字数仍受上限约束（防止无休止的空白或代码块标记）
+            if text[max(0, self.scanner.end - offset):].strip().strip("`") or self.scanner.length > self.max_chars:
+                self.stop = "json_complete"
+                return True
+            return False
+        lead_limit = STREAM_CONFIG["max_lead_chars"]
+        if self.scanner.length > self.max_chars or (self.scanner.start is None and self.scanner.length > lead_limit):
+            self.stop = "runaway"
+            return True
+        return False
+    
+    def content(self) -> str:
+        """完整的JSON值；未得到完整JSON时为已接收的全部文字"""
+        text = "".join(self.parts)
+        if self.scanner.end is None:
+            return text
+        return text[self.scanner.start:self.scanner.end]
+    
+    def describe(self) -> str:
+        if self.scanner.start is None:
+            return f"模型输出 {self.scanner.length} 字仍未出现JSON，已截断"
+        return f"模型输出超过 {self.max_chars} 字仍未得到完整JSON，已截断"
+    
+    def to_dict(self) -> Dict:
+        return {
+            'stop': self.stop,
+            'chars': self.scanner.length,
+            'ttft': round(self.ttft, 4) if self.ttft is not None else None
+        }
+
+
+def usage_from_response(response) -> Optional[Dict]:
+    """读取响应中的token用量：输入、输出及命中服务端前缀缓存的输入token（接口未返回时为None）"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        'prompt_tokens': usage.prompt_tokens or 0,
+        'completion_tokens': usage.completion_tokens or 0,
+        'cached_tokens': (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    }
+
+
+def merge_usage(*usages: Optional[Dict]) -> Optional[Dict]:
+    """累加多份token用量（忽略None，全部为None时返回None）"""
+    usages = [usage for usage in usages if usage]
+    if not usages:
+        return None
+    return {key: sum(usage[key] for usage in usages) for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens')}
+
+
+def split_usage(usage: Optional[Dict], count: int) -> List[Optional[Dict]]:
+    """把一次合并请求的token用量平均分摊到各页（余数计入靠前的页面）"""
+    if not usage:
+        return [None] * count
+    shares = [{} for _ in range(count)]
+    for key, value in usage.items():
+        base, extra = divmod(value, count)
+        for position, share in enumerate(shares):
+            share[key] = base + (1 if position < extra else 0)
+    return shares
+
+
+def split_pack_response(content: Optional[str], page_count: int) -> Optional[List[Optional[str]]]:
+    """把合并请求的响应拆为逐页结果：去掉代码块标记后取最外层JSON数组，元素个数须与页数一致
+    
+    每个元素重新序列化为单页JSON；为 null 或空的元素返回 None（该页单独回退）。无法拆分时返回 None。
+    """
+    if not content:
+        return None
+    text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", content.strip())
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return None
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(items, list) or len(items) != page_count:
+        return None
+    return [
+        json.dumps(item, ensure_ascii=False) if item not in (None, "", {}, []) else None
+        for item in items
+    ]
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """估算图片占用的图像token数（按 token_patch_size 像素见方的图块计）"""
+    patch = RESOLUTION_CONFIG["token_patch_size"]
+    return math.ceil(width / patch) * math.ceil(height / patch)
+
+
+def image_upload_stats(image_bytes: bytes) -> Dict:
+    """图片上传信息：字节数、尺寸与估算的图像token数（只读取图片头，不解码像素）"""
+    try:
+        width, height = Image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        width = height = 0
+    return {'bytes': len(image_bytes), 'width': width, 'height': height, 'tokens': estimate_image_tokens(width, height)}
+
+
+def text_upload_stats(text: str) -> Dict:
+    """仅发送文字的页面的上传信息（没有图片，图像token为0）"""
+    return {'format': "text", 'bytes': len(text.encode("utf-8")), 'width': 0, 'height': 0, 'tokens': 0,
+            'text_chars': len(text)}
+
+
+def describe_upload(upload: Dict) -> str:
+    """报告中单页图片的简要描述"""
+    if upload.get('format') == "text":
+        return f"仅文字 {upload['text_chars']} 字，{format_file_size(upload['bytes'])}"
+    label = f"{upload['format'].upper()} " if upload.get('format') else ""
+    text_label = f" + 文字层 {upload['text_chars']} 字" if upload.get('text_chars') else ""
+    return (f"{label}{upload['width']}×{upload['height']}，{format_file_size(upload['bytes'])}，"
+            f"约 {upload['tokens']} 图像token{text_label}")
+
+
+# 上传编码使用的MIME类型（按PIL识别出的图片格式）
+_IMAGE_MIME = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "GIF": "image/gif", "BMP": "image/bmp"}
+
+
+def is_photographic(image: Image.Image) -> bool:
+    """照片/扫描件判断：缩略图中颜色种类占比高；线稿与文字页面只有背景色和少量抗锯齿灰阶"""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    factor = max(1, max(image.size) // UPLOAD_CONFIG["classify_size"])
+    thumb = image.reduce(factor) if factor > 1 else image
+    pixels = thumb.width * thumb.height
+    colors = thumb.getcolors(pixels)
+    return len(colors) / pixels > UPLOAD_CONFIG["photo_color_ratio"]
+
+
+def encode_for_upload(image_bytes: bytes, upload_format: str = "png", quality: Optional[int] = None) -> Tuple[bytes, str]:
+    """按上传格式编码图片，返回 (图片字节, MIME类型)
+    
+    png 直接上传原图；jpeg/webp 按 quality 有损编码；auto 对照片类页面使用有损格式、线稿和文字保持无损。
+    有损编码结果反而更大时仍上传原图。
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    original_mime = _IMAGE_MIME.get(image.format, "image/png")
+    if upload_format == "auto":
+        upload_format = UPLOAD_CONFIG["auto_lossy_format"] if is_photographic(image) else "png"
+    if upload_format not in ("jpeg", "webp"):
+        return image_bytes, original_mime
+    
+    # JPEG不支持透明通道，统一转为RGB
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, upload_format.upper(), quality=quality or UPLOAD_CONFIG["quality"])
+    encoded = buffer.getvalue()
+    if len(encoded) >= len(image_bytes):
+        return image_bytes, original_mime
+    return encoded, f"image/{upload_format}"
+
+
+def resolution_pixel_budget(max_pixels: Optional[int] = None, max_image_tokens: Optional[int] = None) -> int:
+    """auto模式下每页的像素预算：像素上限与图像token上限（换算为像素）取较小值"""
+    max_pixels = max_pixels or RESOLUTION_CONFIG["max_pixels"]
+    max_image_tokens = RESOLUTION_CONFIG["max_image_tokens"] if max_image_tokens is None else max_image_tokens
+    if max_image_tokens:
+        max_pixels = min(max_pixels, max_image_tokens * RESOLUTION_CONFIG["token_patch_size"] ** 2)
+    return int(max_pixels)
+
+
+def page_render_dpi(width_pt: float, height_pt: float, dpi: float, max_pixels: Optional[int] = None) -> float:
+    """单页渲染DPI：未指定 max_pixels 时即固定DPI；否则按页面尺寸（点）使像素数不超过预算，且不高于 dpi"""
+    if not max_pixels:
+        return dpi
+    # 渲染尺寸约为 页面尺寸×缩放+1 像素：解 (w·z+1)(h·z+1) = max_pixels 得到缩放比例 z
+    area = max(1.0, width_pt * height_pt)
+    perimeter = width_pt + height_pt
+    zoom = (math.sqrt(perimeter ** 2 + 4 * area * (max_pixels - 1)) - perimeter) / (2 * area)
+    return max(RESOLUTION_CONFIG["min_dpi"], min(dpi, 72.0 * zoom))
+
+
+def page_matrix(page, dpi: float, max_pixels: Optional[int] = None):
+    """单页渲染矩阵（PyMuPDF默认72 DPI）"""
+    zoom = page_render_dpi(page.rect.width, page.rect.height, dpi, max_pixels) / 72.0
+    return fitz.Matrix(zoom, zoom)
+
+
+def split_page_chunks(page_indices: List[int], chunk_size: int) -> List[List[int]]:
+    """将页面索引按顺序切分为小块，用于分发给渲染进程"""
+    chunk_size = max(1, chunk_size)
+    return [page_indices[start:start + chunk_size] for start in range(0, len(page_indices), chunk_size)]
+
+
+# 渲染进程内的状态（每个进程各自打开一份文档）
+_render_worker_state = {}
+
+
+def _init_render_worker(pdf_path: str, dpi: int, output_dir: Optional[str], compress_level: int, done_queue,
+                        max_pixels: Optional[int] = None, page_dpi: Optional[Dict[int, float]] = None,
+                        with_fingerprint: bool = False):
+    """渲染进程初始化：打开本进程自己的fitz文档（output_dir为None时通过队列回传图片字节）"""
+    _render_worker_state.update({
+        'document': fitz.open(pdf_path),
+        'dpi': dpi,
+        'max_pixels': max_pixels,
+        'page_dpi': page_dpi or {},
+        'output_dir': Path(output_dir) if output_dir else None,
+        'compress_level': compress_level,
+        'with_fingerprint': with_fingerprint,
+        'done_queue': done_queue
+    })
+
+
+def _render_page_chunk(page_indices: List[int]) -> int:
+    """渲染一组页面（0起始索引），每完成一页通过队列回报主进程"""
+    state = _render_worker_state
+    for page_index in page_indices:
+        dpi = state['page_dpi'].get(page_index + 1, state['dpi'])
+        matrix = page_matrix(state['document'][page_index], dpi, state['max_pixels'])
+        image, fingerprint = render_page(
+            state['document'], page_index, matrix, state['output_dir'], state['compress_level'], state['with_fingerprint']
+        )
+        state['done_queue'].put((page_index + 1, str(image) if isinstance(image, Path) else image, fingerprint))
+    return len(page_indices)
+
+
+def iter_render_parallel(
+    pdf_path: Path,
+    output_dir: Optional[Path],
+    dpi: int,
+    total_pages: int,
+    workers: int,
+    chunk_size: int = 4,
+    compress_level: int = 6,
+    pages: Optional[List[int]] = None,
+    max_pixels: Optional[int] = None,
+    page_dpi: Optional[Dict[int, float]] = None,
+    with_fingerprint: bool = False
+):
+    """多进程渲染PDF，按完成顺序逐页产出 (页码, 图片路径, 页面指纹)；output_dir为None时产出图片字节
+    
+    pages 指定只渲染其中的页码（从1开始），默认渲染全部 total_pages 页；
+    指定 max_pixels 时按页面尺寸为每页计算DPI（见 page_render_dpi）；page_dpi 为个别页面的DPI（页码 -> DPI）。
+    with_fingerprint=True 时由渲染进程顺带计算页面指纹（见 render_page），否则指纹为None。
+    """
+    page_indices = [page_num - 1 for page_num in pages] if pages is not None else list(range(total_pages))
+    context = multiprocessing.get_context("spawn")
+    done_queue = context.Queue()
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_render_worker,
+        initargs=(str(pdf_path), dpi, str(output_dir) if output_dir else None, compress_level, done_queue,
+                  max_pixels, page_dpi, with_fingerprint)
+    )
+    futures = []
+    try:
+        futures = [
+            executor.submit(_render_page_chunk, chunk)
+            for chunk in split_page_chunks(page_indices, chunk_size)
+        ]
+        received = 0
+        while received < len(page_indices):
+            try:
+                page_num, image, fingerprint = done_queue.get(timeout=0.2)
+            except queue.Empty:
+                # 检查渲染进程是否出错
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+                continue
+            received += 1
+            yield page_num, Path(image) if isinstance(image, str) else image, fingerprint
+    finally:
+        # 出错或提前结束时不再启动尚未开始的分块
+        for future in futures:
+            future.cancel()
+        # 提前结束（调用方关闭生成器或渲染出错）时，已在运行的分块仍会向结果队列写入页面：
+        # 一边丢弃一边等待进程池关闭，否则渲染进程的队列写入线程无法退出，shutdown 会一直阻塞
+        closer = threading.Thread(target=executor.shutdown, kwargs={'wait': True, 'cancel_futures': True},
+                                  name="render-pool-shutdown", daemon=True)
+        closer.start()
+        while closer.is_alive():
+            try:
+                done_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        done_queue.close()
+
+
 def format_file_size(size_bytes: int) -> str:
     """格式化文件大小"""
     if size_bytes < 1024: